@@ -11,6 +11,8 @@ from alembic import context
 from backend.app.db.base import Base
 from backend.app.models.user import User  # noqa
 from backend.app.models.transaction import Transaction  # noqa
+from backend.app.models.analytics import TransactionRollup  # noqa
+from backend.app.models.shadow import ShadowScore  # noqa
 from backend.app.core.config import settings
 
 # this is the Alembic Config object, which provides
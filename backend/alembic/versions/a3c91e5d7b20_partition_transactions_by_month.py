@@ -0,0 +1,100 @@
+"""Partition transactions by month
+
+Revision ID: a3c91e5d7b20
+Revises: feb7f90d1eff
+Create Date: 2026-10-18 14:20:51.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91e5d7b20'
+down_revision: Union[str, Sequence[str], None] = 'feb7f90d1eff'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Recreated on the partitioned table (index names are schema-wide, so the old ones go first)
+INDEXES = {
+    'ix_transactions_id': ['id'],
+    'ix_transactions_timestamp_id': ['timestamp', 'id'],
+    'ix_transactions_risk_level_timestamp_id': ['risk_level', 'timestamp', 'id'],
+    'ix_transactions_is_flagged_timestamp_id': ['is_flagged', 'timestamp', 'id'],
+    'ix_transactions_merchant_id_timestamp_id': ['merchant_id', 'timestamp', 'id'],
+}
+# Monthly partitions created ahead of the current month (the retention job keeps extending them)
+MONTHS_AHEAD = 3
+
+
+def _recreate_indexes():
+    for name, columns in INDEXES.items():
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+        op.create_index(name, 'transactions', columns, unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Declarative partitioning is PostgreSQL only; SQLite (local development) keeps one table
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('ALTER TABLE transactions RENAME TO transactions_unpartitioned')
+    op.execute('ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey')
+    # A partitioned table's primary key must include the partition key; IDs stay unique on
+    # their own because they are ULIDs (backend/app/core/ids.py)
+    op.execute('''
+        CREATE TABLE transactions (
+            LIKE transactions_unpartitioned INCLUDING DEFAULTS,
+            PRIMARY KEY (id, "timestamp"),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) PARTITION BY RANGE ("timestamp")
+    ''')
+    op.execute('CREATE TABLE transactions_default PARTITION OF transactions DEFAULT')
+    # One partition per month from the oldest stored row to a few months ahead
+    op.execute(f'''
+        DO $$
+        DECLARE
+            month timestamptz;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', COALESCE((SELECT min("timestamp") FROM transactions_unpartitioned), now())),
+                    date_trunc('month', now()) + interval '{MONTHS_AHEAD} months',
+                    interval '1 month'
+                )
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                    'transactions_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                    month, month + interval '1 month'
+                );
+            END LOOP;
+        END $$
+    ''')
+    # The partition key cannot be NULL (the column had a server default, so these are rare)
+    op.execute('UPDATE transactions_unpartitioned SET "timestamp" = now() WHERE "timestamp" IS NULL')
+    op.execute('INSERT INTO transactions SELECT * FROM transactions_unpartitioned')
+    _recreate_indexes()
+    op.execute('DROP TABLE transactions_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('ALTER TABLE transactions RENAME TO transactions_partitioned')
+    op.execute('ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey')
+    op.execute('''
+        CREATE TABLE transactions (
+            LIKE transactions_partitioned INCLUDING DEFAULTS,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    op.execute('ALTER TABLE transactions ALTER COLUMN "timestamp" DROP NOT NULL')
+    op.execute('INSERT INTO transactions SELECT * FROM transactions_partitioned')
+    op.execute('ALTER TABLE transactions ADD PRIMARY KEY (id)')
+    _recreate_indexes()
+    # Dropping the parent drops every partition
+    op.execute('DROP TABLE transactions_partitioned')
@@ -0,0 +1,37 @@
+"""Add keyset pagination indexes to Transaction
+
+Revision ID: b41d7c9e2a55
+Revises: f078048e9f7e
+Create Date: 2026-10-18 09:12:44.318220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7c9e2a55'
+down_revision: Union[str, Sequence[str], None] = 'f078048e9f7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_transactions_timestamp_id', 'transactions', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_transactions_risk_level_timestamp_id', 'transactions', ['risk_level', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_transactions_is_flagged_timestamp_id', 'transactions', ['is_flagged', 'timestamp', 'id'], unique=False)
+    # Superseded by the composite index (merchant_id is its leading column)
+    op.drop_index(op.f('ix_transactions_merchant_id'), table_name='transactions')
+    op.create_index('ix_transactions_merchant_id_timestamp_id', 'transactions', ['merchant_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_merchant_id_timestamp_id', table_name='transactions')
+    op.create_index(op.f('ix_transactions_merchant_id'), 'transactions', ['merchant_id'], unique=False)
+    op.drop_index('ix_transactions_is_flagged_timestamp_id', table_name='transactions')
+    op.drop_index('ix_transactions_risk_level_timestamp_id', table_name='transactions')
+    op.drop_index('ix_transactions_timestamp_id', table_name='transactions')
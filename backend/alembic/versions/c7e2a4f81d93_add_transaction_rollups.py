@@ -0,0 +1,40 @@
+"""Add hourly transaction rollups
+
+Revision ID: c7e2a4f81d93
+Revises: b41d7c9e2a55
+Create Date: 2026-10-18 11:02:17.560431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2a4f81d93'
+down_revision: Union[str, Sequence[str], None] = 'b41d7c9e2a55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_rollups',
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('flagged', sa.Integer(), nullable=False),
+    sa.Column('allow_count', sa.Integer(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('deny_count', sa.Integer(), nullable=False),
+    sa.Column('amount_sum', sa.Float(), nullable=False),
+    sa.Column('risk_score_sum', sa.Float(), nullable=False),
+    sa.Column('risk_score_histogram', sa.String(), nullable=False),
+    sa.Column('amount_histogram', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket_start')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('transaction_rollups')
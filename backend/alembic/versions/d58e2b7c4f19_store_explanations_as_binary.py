@@ -0,0 +1,159 @@
+"""Store explanations as packed binary records indexed by top feature
+
+Revision ID: d58e2b7c4f19
+Revises: a3c91e5d7b20
+Create Date: 2026-10-18 16:05:37.918244
+
+"""
+import json
+import struct
+from datetime import timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd58e2b7c4f19'
+down_revision: Union[str, Sequence[str], None] = 'a3c91e5d7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# One explanation factor as stored by backend/app/db/explanations.py:
+# feature id (uint16), impact (float32), input value (float64), little-endian
+FACTOR = struct.Struct('<Hfd')
+BATCH_SIZE = 5000
+
+transactions = sa.table(
+    'transactions',
+    sa.column('id', sa.String), sa.column('timestamp', sa.DateTime),
+    sa.column('rule_violations', sa.String),
+    sa.column('explanation', sa.LargeBinary), sa.column('top_feature', sa.Integer),
+)
+features = sa.table('explanation_features', sa.column('id', sa.Integer), sa.column('name', sa.String))
+rollups = sa.table('transaction_rollups', sa.column('bucket_start', sa.DateTime), sa.column('feature_attribution', sa.String))
+
+
+def _feature_id(bind, ids, name):
+    if name not in ids:
+        bind.execute(features.insert().values(name=name))
+        ids[name] = bind.execute(sa.select(features.c.id).where(features.c.name == name)).scalar_one()
+    return ids[name]
+
+
+def _hour(timestamp):
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('explanation_features',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.add_column('transactions', sa.Column('explanation', sa.LargeBinary(), nullable=True))
+    op.add_column('transactions', sa.Column('top_feature', sa.Integer(), nullable=True))
+    op.add_column('transaction_rollups', sa.Column('feature_attribution', sa.String(), nullable=True))
+
+    # Pack the JSON explanations, and count them into the hourly rollups at the same time
+    bind = op.get_bind()
+    ids = {}
+    attribution = {}
+    after = None
+    while True:
+        query = (
+            sa.select(transactions.c.id, transactions.c.timestamp, transactions.c.rule_violations)
+            .where(transactions.c.rule_violations.isnot(None))
+            .order_by(transactions.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if after is not None:
+            query = query.where(transactions.c.id > after)
+        rows = bind.execute(query).all()
+        if not rows:
+            break
+        updates = []
+        for transaction_id, timestamp, rule_violations in rows:
+            explanation = json.loads(rule_violations)
+            factors = [(_feature_id(bind, ids, item['feature']), item['impact'], item['value']) for item in explanation]
+            updates.append({
+                'key': transaction_id,
+                'packed': b''.join(FACTOR.pack(*factor) for factor in factors),
+                'top': factors[0][0] if factors else None,
+            })
+            if timestamp is None:
+                continue
+            hour = attribution.setdefault(_hour(timestamp), {})
+            for rank, (feature, impact, _) in enumerate(factors):
+                counters = hour.setdefault(str(feature), [0, 0, 0.0, 0.0])
+                counters[0] += rank == 0
+                counters[1] += 1
+                counters[2] += impact
+                counters[3] += abs(impact)
+        bind.execute(
+            transactions.update().where(transactions.c.id == sa.bindparam('key')).values(
+                explanation=sa.bindparam('packed'), top_feature=sa.bindparam('top')
+            ),
+            updates
+        )
+        after = rows[-1][0]
+    # Hours without a rollup row were never rolled up (scored before the rollups existed)
+    for bucket, counters in attribution.items():
+        bind.execute(
+            rollups.update().where(rollups.c.bucket_start == bucket).values(feature_attribution=json.dumps(counters))
+        )
+
+    op.create_index('ix_transactions_top_feature_timestamp_id', 'transactions', ['top_feature', 'timestamp', 'id'], unique=False)
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_column('rule_violations')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('rule_violations', sa.String(), nullable=True))
+
+    bind = op.get_bind()
+    names = dict(bind.execute(sa.select(features.c.id, features.c.name)).all())
+    after = None
+    while True:
+        query = (
+            sa.select(transactions.c.id, transactions.c.explanation)
+            .where(transactions.c.explanation.isnot(None))
+            .order_by(transactions.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if after is not None:
+            query = query.where(transactions.c.id > after)
+        rows = bind.execute(query).all()
+        if not rows:
+            break
+        updates = [
+            {
+                'key': transaction_id,
+                'unpacked': json.dumps([
+                    {'feature': names[feature], 'impact': impact, 'value': value}
+                    for feature, impact, value in FACTOR.iter_unpack(explanation)
+                ]),
+            }
+            for transaction_id, explanation in rows
+        ]
+        bind.execute(
+            transactions.update().where(transactions.c.id == sa.bindparam('key')).values(
+                rule_violations=sa.bindparam('unpacked')
+            ),
+            updates
+        )
+        after = rows[-1][0]
+
+    op.drop_index('ix_transactions_top_feature_timestamp_id', table_name='transactions')
+    op.drop_column('transaction_rollups', 'feature_attribution')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_column('top_feature')
+        batch_op.drop_column('explanation')
+    op.drop_table('explanation_features')
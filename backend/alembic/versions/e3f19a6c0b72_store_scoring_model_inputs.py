@@ -0,0 +1,29 @@
+"""Store the model input of transactions that are not explained yet
+
+Revision ID: e3f19a6c0b72
+Revises: d58e2b7c4f19
+Create Date: 2026-10-18 18:12:04.530711
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3f19a6c0b72'
+down_revision: Union[str, Sequence[str], None] = 'd58e2b7c4f19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # On PostgreSQL this also adds the column to every monthly partition
+    op.add_column('transactions', sa.Column('model_input', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transactions', 'model_input')
@@ -1,12 +1,14 @@
-from typing import Generator, AsyncGenerator
+from typing import Generator, AsyncGenerator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import ValidationError
 from backend.app.core import security
+from backend.app.core.cache import user_cache
 from backend.app.core.config import settings
-from backend.app.db.session import get_db
+from backend.app.core.metrics import metrics
+from backend.app.db.session import get_db, SessionLocal
 from backend.app.models.user import User
 from backend.app.schemas.user import TokenPayload
 from sqlalchemy import select
@@ -15,23 +17,35 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
+optional_oauth2 = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/login/access-token",
+    auto_error=False
+)
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(reusable_oauth2)
 ) -> User:
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
-    except (JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
-        )
-    
-    result = await db.execute(select(User).where(User.id == int(token_data.sub)))
-    user = result.scalars().first()
+    # JWT decoding plus the (usually cached) user lookup
+    with metrics.time("auth"):
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+            token_data = TokenPayload(**payload)
+        except (JWTError, ValidationError):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+        
+        user_id = int(token_data.sub)
+        user = await user_cache.get(user_id) if user_cache else None
+        if user is None:
+            result = await db.execute(select(User).where(User.id == user_id))
+            user = result.scalars().first()
+            if user and user_cache:
+                await user_cache.set(user)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -39,6 +53,23 @@ async def get_current_user(
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
+async def get_current_stream_user(
+    header_token: Optional[str] = Depends(optional_oauth2),
+    token: Optional[str] = None
+) -> User:
+    """
+    Authentication for long-lived streams. Browsers' EventSource cannot send an
+    Authorization header, so the token may also come as ?token=. The session is
+    closed before returning instead of being held for the lifetime of the stream.
+    """
+    if not (header_token or token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+    async with SessionLocal() as db:
+        return await get_current_user(db=db, token=header_token or token)
+
 def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
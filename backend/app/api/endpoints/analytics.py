@@ -0,0 +1,47 @@
+from typing import Any, Optional
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.app.api import deps
+from backend.app.api.endpoints import analyze
+from backend.app.schemas.analytics import AnalyticsResponse, FeatureAttributionResponse
+
+router = APIRouter()
+
+@router.get("/", response_model=AnalyticsResponse)
+async def read_analytics(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    current_user: Any = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Dashboard metrics (verdict counts, fraud rate per hour, risk score and amount histograms)
+    over [start_time, end_time), by default the last 24 hours.
+    Served from the hourly rollups, never by scanning transactions.
+    """
+    if not analyze.analytics:
+        raise HTTPException(status_code=503, detail="Analytics not ready")
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time - timedelta(hours=24)
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="start_time must be before end_time")
+    return await analyze.analytics.summarize(start_time, end_time)
+
+@router.get("/features", response_model=FeatureAttributionResponse)
+async def read_feature_attribution(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    current_user: Any = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Which features drive the SHAP explanations over [start_time, end_time), by default the last
+    24 hours: per feature, how often it was the strongest factor and its mean impact, plus the
+    top-factor counts of every hour. Served from the hourly rollups like the dashboard metrics.
+    """
+    if not analyze.analytics:
+        raise HTTPException(status_code=503, detail="Analytics not ready")
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time - timedelta(hours=24)
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="start_time must be before end_time")
+    return await analyze.analytics.feature_attribution(start_time, end_time)
@@ -1,11 +1,17 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Dict, List, Optional, Tuple, Union
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.cache import IdempotencyConflict, fingerprint, result_cache
+from backend.app.core.config import settings
+from backend.app.core.ids import new_transaction_id, new_transaction_ids
+from backend.app.core.metrics import metrics
+from backend.app.db.explanations import explanation_columns
 from backend.app.db.session import get_db
 from backend.app.schemas.transaction import TransactionCreate, RiskAssessment
 from backend.app.api.deps import get_current_user
 from backend.app.models.user import User
 from backend.app.models.transaction import Transaction as TransactionModel
+import logging
 import time
 from datetime import datetime
 
@@ -16,74 +22,363 @@ from datetime import datetime
 # A cleaner way is to have the app state hold the predictor.
 
 import os
+from backend.app.services.inference import InferenceBacklogFull
+from backend.app.services.persistence import WriteBufferFull
+from backend.app.services.stream import transaction_event
 from backend.ml_engine.predictor import FraudPredictor
+from backend.ml_engine.records import RECORD_DTYPE, decode_records, records_to_dicts, validate_records
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Content type of /analyze/records bodies: packed fixed-width records (backend/ml_engine/records.py)
+RECORDS_MEDIA_TYPE = "application/vnd.aegisflow.records.v1"
 
 # Global predictor instance (to be initialized on startup)
 predictor = None
 
+# Worker pool that runs the CPU-bound predictor calls off the event loop (to be initialized on startup)
+executor = None
+
+# Coalesces concurrent single-transaction calls into one predict_batch (to be initialized on startup)
+batcher = None
+
+# Background SHAP worker for the "deferred" explanation policy (to be initialized on startup)
+explanation_worker = None
+
+# Write-behind buffer that bulk-inserts scored rows off the request path (to be initialized on startup)
+write_buffer = None
+
+# Fan-out hub feeding the live transaction stream (to be initialized on startup)
+stream_hub = None
+
+# Incremental hourly rollups behind /analytics (to be initialized on startup)
+analytics = None
+
+# Extends the monthly partitions and archives old months (to be initialized on startup)
+retention = None
+
+# Scores a sample of traffic with candidate models in the background (to be initialized on startup)
+shadow_scorer = None
+
+# Owns the active model version and swaps predictor/executor above on a reload (to be initialized on startup)
+model_manager = None
+
 def get_predictor():
     if not predictor:
         raise HTTPException(status_code=503, detail="ML Model not ready")
     return predictor
 
+async def run_inference(method: str, *args: Any) -> Any:
+    """Runs predictor.<method>(*args) on the inference executor, shedding load with a 503 when it is backed up."""
+    if not executor:
+        raise HTTPException(status_code=503, detail="ML Model not ready")
+    try:
+        return await executor.run(method, *args)
+    except InferenceBacklogFull:
+        raise HTTPException(status_code=503, detail="Inference backlog full, retry later")
+
+async def predict_transaction(data: dict) -> dict:
+    """Scores one transaction, through the micro-batcher when it is enabled."""
+    if batcher:
+        return await batcher.submit(data)
+    return await run_inference("predict", data)
+
+# Map verdict to risk level
+RISK_LEVEL_MAP = {
+    "ALLOW": "LOW",
+    "REVIEW": "HIGH",
+    "DENY": "CRITICAL"
+}
+
+def ready_explanation(result: dict) -> Optional[List[dict]]:
+    """The explanation to store with a scored transaction; None when the policy skipped or deferred SHAP for it."""
+    return result["explanation"] if result["explanation_status"] == "ready" else None
+
+def build_transaction_record(transaction_id: str, data: Dict[str, Any], result: dict,
+                             explanation: Dict[str, Any]) -> TransactionModel:
+    """
+    Build the Transaction row persisted for a scored transaction.
+    `data` is the transaction as scored (TransactionCreate.model_dump() or records_to_dicts()),
+    `explanation` holds its explanation columns (see backend/app/db/explanations.py).
+    The packed model input of an unexplained result moves from the result into the row.
+    """
+    return TransactionModel(
+        id=transaction_id,
+        amount=data["amount"],
+        oldbalanceOrg=data["oldbalanceOrg"],
+        newbalanceOrig=data["newbalanceOrig"],
+        oldbalanceDest=data["oldbalanceDest"],
+        newbalanceDest=data["newbalanceDest"],
+        type=data["type"],
+        
+        # Risk Info
+        risk_score=result["risk_score"],
+        risk_level=RISK_LEVEL_MAP.get(result["verdict"], "MEDIUM"),
+        is_flagged=result["anomaly_detected"] or result["verdict"] == "DENY",
+        
+        # Metadata
+        timestamp=datetime.now(),
+        
+        # Packed top SHAP factors; NULL when the explanation policy skipped or deferred SHAP for this row
+        explanation=explanation["explanation"],
+        top_feature=explanation["top_feature"],
+        model_input=result.pop("model_input", None)
+    )
+
+async def persist_transactions(db: AsyncSession, records: List[TransactionModel]):
+    """
+    Hands scored rows to the write-behind buffer (or commits them inline when it is disabled)
+    and publishes them to live stream subscribers and the analytics rollups.
+    """
+    if write_buffer:
+        try:
+            write_buffer.add(records)
+        except WriteBufferFull:
+            raise HTTPException(status_code=503, detail="Database backlog full, retry later")
+    else:
+        with metrics.time("db_commit"):
+            db.add_all(records)
+            await db.commit()
+    if stream_hub:
+        stream_hub.publish([transaction_event(record) for record in records])
+    if analytics:
+        analytics.record(records)
+
+async def store_scored_batch(db: AsyncSession, batch: List[dict], results: List[dict]):
+    """
+    Persists a scored batch and hands it to the background consumers (deferred SHAP, shadow models).
+    Fills in the transaction_id and timestamp of each result.
+    """
+    for transaction_id, result in zip(new_transaction_ids(len(results)), results):
+        result["transaction_id"] = transaction_id
+    with metrics.time("persist"):
+        explanations = await explanation_columns(db, [ready_explanation(result) for result in results])
+        records = [
+            build_transaction_record(result["transaction_id"], item, result, explanation)
+            for item, result, explanation in zip(batch, results, explanations)
+        ]
+        # Bulk insert every scored row (in a single commit when written inline)
+        await persist_transactions(db, records)
+
+    for record, item, result in zip(records, batch, results):
+        result["timestamp"] = record.timestamp
+        queue_deferred_explanation(record, result)
+    queue_shadow_scoring([result["transaction_id"] for result in results], batch, results)
+
+def queue_deferred_explanation(record: TransactionModel, result: dict):
+    """Hands a scored transaction (its stored model input) to the background SHAP worker when its explanation was deferred."""
+    if result["explanation_status"] == "deferred" and explanation_worker:
+        explanation_worker.submit(record.id, record.model_input, record.timestamp)
+
+def queue_shadow_scoring(transaction_ids: List[str], data: List[dict], results: List[dict]):
+    """Hands a sample of scored transactions to the shadow models (never waits for them)."""
+    if shadow_scorer:
+        shadow_scorer.submit(transaction_ids, data, results)
+
+def cache_key(current_user: User, payload: Union[dict, bytes], idempotency_key: Optional[str]) -> Tuple[Optional[str], str]:
+    """(result cache key, payload fingerprint) of a submission; the key is None when the cache is off."""
+    if not result_cache:
+        return None, ""
+    payload_fingerprint = fingerprint(payload)
+    return result_cache.key(getattr(current_user, "id", None), payload_fingerprint, idempotency_key), payload_fingerprint
+
 @router.post("/", response_model=RiskAssessment)
 async def analyze_transaction(
     *,
     transaction: TransactionCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user), # Require Auth
     predictor_instance: FraudPredictor = Depends(get_predictor)
 ) -> Any:
     """
     Analyze a transaction in real-time for fraud risk.
+    A retry (same Idempotency-Key header or idempotency_key field; with RESULT_CACHE_BY_CONTENT,
+    also the same payload) within RESULT_CACHE_TTL_SECONDS gets the stored result and transaction id back, marked with an
+    Idempotent-Replayed header, instead of being scored and stored again.
     """
+    started = time.perf_counter()
     try:
         # Convert Pydantic model to dict
-        data = transaction.model_dump()
-        
-        # Make prediction
-        result = predictor_instance.predict(data)
-        
-        # Persist to Database
-        import json
-        
-        # Map verdict to risk level
-        risk_level_map = {
-            "ALLOW": "LOW",
-            "REVIEW": "HIGH",
-            "DENY": "CRITICAL"
-        }
-        
-        db_transaction = TransactionModel(
-            id=f"txn_{int(time.time()*1000)}", # Simple ID generation
-            amount=transaction.amount,
-            oldbalanceOrg=transaction.oldbalanceOrg,
-            newbalanceOrig=transaction.newbalanceOrig,
-            oldbalanceDest=transaction.oldbalanceDest,
-            newbalanceDest=transaction.newbalanceDest,
-            type=transaction.type,
-            
-            # Risk Info
-            risk_score=result["risk_score"],
-            risk_level=risk_level_map.get(result["verdict"], "MEDIUM"),
-            is_flagged=result["anomaly_detected"] or result["verdict"] == "DENY",
-            
-            # Metadata
-            timestamp=datetime.now(),
+        data = transaction.model_dump(exclude={"idempotency_key"})
+
+        async def score() -> dict:
+            # Make prediction (on the inference executor, not the event loop)
+            with metrics.time("inference"):
+                result = await predict_transaction(data)
             
-            # Explanation stored as JSON string in rule_violations (repurposing the column)
-            rule_violations=json.dumps(result["explanation"])
+            # Persist to Database
+            transaction_id = new_transaction_id()
+            with metrics.time("persist"):
+                explanation, = await explanation_columns(db, [ready_explanation(result)])
+                db_transaction = build_transaction_record(transaction_id, data, result, explanation)
+                await persist_transactions(db, [db_transaction])
+
+            result["transaction_id"] = transaction_id
+            result["timestamp"] = db_transaction.timestamp
+            queue_deferred_explanation(db_transaction, result)
+            queue_shadow_scoring([transaction_id], [data], [result])
+            return result
+
+        key, payload_fingerprint = cache_key(
+            current_user, transaction.model_dump(mode="json", exclude={"idempotency_key"}),
+            idempotency_key or transaction.idempotency_key
         )
+        if key:
+            result, replayed = await result_cache.get_or_compute(key, payload_fingerprint, score)
+        else:
+            result, replayed = await score(), False
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
         
-        db.add(db_transaction)
-        await db.commit()
-        await db.refresh(db_transaction)
-        
+        metrics.observe_stage("analyze", time.perf_counter() - started)
         return result
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        print(f"Prediction Error: {e}")
+        metrics.count_error("analyze")
+        logger.exception("Prediction error")
         # Return error but don't crash standard flow validation if possible, 
         # but here we throw 500
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch", response_model=List[RiskAssessment])
+async def analyze_transactions_batch(
+    *,
+    transactions: List[TransactionCreate],
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user), # Require Auth
+    predictor_instance: FraudPredictor = Depends(get_predictor)
+) -> Any:
+    """
+    Analyze a burst of transactions in one vectorized pass.
+    Results are returned in the same order as the submitted transactions.
+    Transactions submitted before within the retry window (per item idempotency_key, the
+    Idempotency-Key header plus the item's position, or the same payload with RESULT_CACHE_BY_CONTENT)
+    are not scored again:
+    their stored results are returned (Idempotent-Replayed lists their positions).
+    """
+    if len(transactions) > settings.ANALYZE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {settings.ANALYZE_BATCH_MAX_SIZE} transactions)"
+        )
+    if not transactions:
+        return []
+
+    started = time.perf_counter()
+    try:
+        data = [t.model_dump(exclude={"idempotency_key"}) for t in transactions]
+
+        async def score(rows: List[int]) -> List[dict]:
+            batch = [data[row] for row in rows]
+            with metrics.time("inference"):
+                results = await run_inference("predict_batch", batch)
+            await store_scored_batch(db, batch, results)
+            return results
+
+        keys, fingerprints = [], []
+        for position, transaction in enumerate(transactions):
+            item_key = transaction.idempotency_key or (f"{idempotency_key}:{position}" if idempotency_key else None)
+            key, payload_fingerprint = cache_key(
+                current_user, transaction.model_dump(mode="json", exclude={"idempotency_key"}), item_key
+            )
+            keys.append(key)
+            fingerprints.append(payload_fingerprint)
+        if result_cache:
+            results, replayed = await result_cache.get_or_compute_many(keys, fingerprints, score)
+        else:
+            results, replayed = await score(list(range(len(transactions)))), []
+        if any(replayed):
+            response.headers["Idempotent-Replayed"] = ",".join(str(row) for row, hit in enumerate(replayed) if hit)
+        
+        metrics.observe_stage("analyze_batch", time.perf_counter() - started)
+        return results
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        metrics.count_error("analyze_batch")
+        logger.exception("Batch prediction error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/records", response_model=List[RiskAssessment])
+async def analyze_transaction_records(
+    *,
+    body: bytes = Body(..., media_type=RECORDS_MEDIA_TYPE),
+    response: Response,
+    content_type: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user), # Require Auth
+    predictor_instance: FraudPredictor = Depends(get_predictor)
+) -> Any:
+    """
+    Analyze transactions sent as packed fixed-width binary records instead of JSON
+    (Content-Type: application/vnd.aegisflow.records.v1, layout in backend/ml_engine/records.py).
+    The body is viewed as a NumPy array and preprocessed column by column: no JSON parsing and no
+    pydantic models per transaction. One record scores a single transaction.
+    Results, limits and replays work as in /analyze/batch (the Idempotency-Key header plus the
+    record's position, or the same record bytes with RESULT_CACHE_BY_CONTENT).
+    """
+    if (content_type or "").split(";")[0].strip().lower() != RECORDS_MEDIA_TYPE:
+        raise HTTPException(status_code=415, detail=f"Expected Content-Type {RECORDS_MEDIA_TYPE}")
+    if len(body) > settings.ANALYZE_BATCH_MAX_SIZE * RECORD_DTYPE.itemsize:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {settings.ANALYZE_BATCH_MAX_SIZE} transactions)"
+        )
+    try:
+        records = decode_records(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    problems = validate_records(records)
+    if problems:
+        raise HTTPException(status_code=422, detail=[
+            {"loc": ["body", row, field], "msg": message, "type": "value_error"} for row, field, message in problems
+        ])
+    if not len(records):
+        return []
+
+    started = time.perf_counter()
+    try:
+        async def score(rows: List[int]) -> List[dict]:
+            batch = records[rows]
+            with metrics.time("inference"):
+                results = await run_inference("predict_records", batch)
+            # Rows are only materialized for what still needs them (persistence, background consumers)
+            await store_scored_batch(db, records_to_dicts(batch), results)
+            return results
+
+        keys, fingerprints = [], []
+        for position in range(len(records)):
+            key, payload_fingerprint = cache_key(
+                current_user, body[position * RECORD_DTYPE.itemsize:(position + 1) * RECORD_DTYPE.itemsize],
+                f"{idempotency_key}:{position}" if idempotency_key else None
+            )
+            keys.append(key)
+            fingerprints.append(payload_fingerprint)
+        if result_cache:
+            results, replayed = await result_cache.get_or_compute_many(keys, fingerprints, score)
+        else:
+            results, replayed = await score(list(range(len(records)))), []
+        if any(replayed):
+            response.headers["Idempotent-Replayed"] = ",".join(str(row) for row, hit in enumerate(replayed) if hit)
+
+        metrics.observe_stage("analyze_records", time.perf_counter() - started)
+        return results
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        metrics.count_error("analyze_records")
+        logger.exception("Record batch prediction error")
+        raise HTTPException(status_code=500, detail=str(e))
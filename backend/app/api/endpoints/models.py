@@ -0,0 +1,76 @@
+from typing import Any, Optional
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.app.api import deps
+from backend.app.api.endpoints import analyze
+from backend.app.schemas.models import ModelsResponse, ReloadRequest, ReloadResponse, ShadowSummaryResponse
+from backend.app.services.models import ModelReloadInProgress
+
+router = APIRouter()
+
+def get_model_manager():
+    if not analyze.model_manager:
+        raise HTTPException(status_code=503, detail="Model manager not ready")
+    return analyze.model_manager
+
+@router.get("/", response_model=ModelsResponse)
+async def read_models(
+    current_user: Any = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Model versions in the registry, the one being served and the state of the last reload.
+    """
+    manager = get_model_manager()
+    versions = []
+    for version in manager.registry.versions():
+        manifest = manager.registry.manifest(version)
+        metadata = {key: value for key, value in manifest.items() if key not in ("version", "created_at", "files")}
+        versions.append({
+            "version": version,
+            "created_at": manifest.get("created_at"),
+            "active": version == manager.active_version,
+            "metadata": metadata,
+        })
+    return {"active_version": manager.active_version, "versions": versions, "reload": manager.reload_status}
+
+@router.post("/reload", response_model=ReloadResponse, status_code=202)
+async def reload_model(
+    request: ReloadRequest,
+    current_user: Any = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Loads a model version (the latest by default) in the background and swaps it in once warmed up.
+    Requests keep being served by the current version meanwhile; poll GET / for the outcome.
+    """
+    manager = get_model_manager()
+    try:
+        version = manager.reload_in_background(request.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ModelReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"version": version, "reload": manager.reload_status}
+
+@router.get("/shadow", response_model=ShadowSummaryResponse)
+async def read_shadow_summary(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    current_user: Any = Depends(deps.get_current_user),
+) -> Any:
+    """
+    How each shadow model compared with the primary one on the sampled traffic of
+    [start_time, end_time), by default the last 24 hours.
+    """
+    if not analyze.shadow_scorer:
+        raise HTTPException(status_code=503, detail="Shadow scoring not ready")
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time - timedelta(hours=24)
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="start_time must be before end_time")
+    return {
+        "start_time": start_time,
+        "end_time": end_time,
+        "sample_rate": analyze.shadow_scorer.sample_rate,
+        "shadows": await analyze.shadow_scorer.summarize(start_time, end_time),
+    }
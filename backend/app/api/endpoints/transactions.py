@@ -1,11 +1,24 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends
+import asyncio
+import base64
+import binascii
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, tuple_
 
 from backend.app.api import deps
-from backend.app.db.session import get_db
+from backend.app.api.endpoints import analyze
+from backend.app.core.config import settings
+from backend.app.db.explanations import decode_explanation, explanation_columns, feature_catalog, feature_ids
+from backend.app.db.session import get_db, SessionLocal
 from backend.app.models.transaction import Transaction
+from backend.app.schemas.transaction import TransactionExplanation
+from backend.app.services.retention import COLUMN_NAMES, iter_archive, iter_table_rows
+from backend.app.services.stream import LAGGED, transaction_event
 # We can repurpose the schema or create a new one for list response
 # For simplicity using dict or create a Response Schema
 from pydantic import BaseModel
@@ -22,19 +35,282 @@ class TransactionList(BaseModel):
     class Config:
         from_attributes = True
 
+class TransactionPage(BaseModel):
+    items: List[TransactionList]
+    # Pass back as ?cursor= to get the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
 router = APIRouter()
 
-@router.get("/", response_model=List[TransactionList])
+def encode_cursor(timestamp: datetime, transaction_id: str) -> str:
+    """Opaque cursor pointing just past the (timestamp, id) of the last row on a page."""
+    raw = json.dumps([timestamp.isoformat(), transaction_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, transaction_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(transaction_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/", response_model=TransactionPage)
 async def read_transactions(
     db: AsyncSession = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    is_flagged: Optional[bool] = None,
+    merchant_id: Optional[str] = None,
+    top_feature: Optional[str] = None, # Feature that was the strongest SHAP factor
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
     current_user: Any = Depends(deps.get_current_user),
 ) -> Any:
     """
-    Retrieve transactions.
+    Retrieve transactions, newest first.
+    Keyset paginated on (timestamp, id): every page is an index range scan, however deep.
     """
-    query = select(Transaction).order_by(desc(Transaction.timestamp)).offset(skip).limit(limit)
+    query = select(Transaction)
+    # Each equality filter is the leading column of a (filter, timestamp, id) index
+    if risk_level is not None:
+        query = query.where(Transaction.risk_level == risk_level)
+    if is_flagged is not None:
+        query = query.where(Transaction.is_flagged == is_flagged)
+    if merchant_id is not None:
+        query = query.where(Transaction.merchant_id == merchant_id)
+    if top_feature is not None:
+        feature_id = await feature_catalog(db).find(db, top_feature)
+        if feature_id is None:
+            # Never the top factor of anything
+            return {"items": [], "next_cursor": None}
+        query = query.where(Transaction.top_feature == feature_id)
+    if start_time is not None:
+        query = query.where(Transaction.timestamp >= start_time)
+    if end_time is not None:
+        query = query.where(Transaction.timestamp < end_time)
+    if cursor:
+        query = query.where(tuple_(Transaction.timestamp, Transaction.id) < decode_cursor(cursor))
+
+    # One extra row tells us whether there is a next page
+    query = query.order_by(desc(Transaction.timestamp), desc(Transaction.id)).limit(limit + 1)
     result = await db.execute(query)
     transactions = result.scalars().all()
-    return transactions
+
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return {"items": transactions, "next_cursor": next_cursor}
+
+def format_event(event: Dict[str, Any]) -> str:
+    """One server-sent event; its id is the listing cursor of the transaction."""
+    cursor = encode_cursor(datetime.fromisoformat(event["timestamp"]), event["id"])
+    return f"id: {cursor}\nevent: transaction\ndata: {json.dumps(event)}\n\n"
+
+async def read_missed_events(resume_from: Tuple[datetime, str]) -> List[Dict[str, Any]]:
+    """Transactions scored after `resume_from`, oldest first (at most STREAM_RESUME_MAX_ROWS)."""
+    # Recently scored rows may still be waiting in the write-behind buffer
+    if analyze.write_buffer:
+        await analyze.write_buffer.flush()
+    async with SessionLocal() as db:
+        query = (
+            select(Transaction)
+            .where(tuple_(Transaction.timestamp, Transaction.id) > resume_from)
+            .order_by(Transaction.timestamp, Transaction.id)
+            .limit(settings.STREAM_RESUME_MAX_ROWS)
+        )
+        result = await db.execute(query)
+        return [transaction_event(t) for t in result.scalars().all()]
+
+@router.get("/stream")
+async def stream_transactions(
+    cursor: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    current_user: Any = Depends(deps.get_current_stream_user),
+) -> Any:
+    """
+    Server-sent events stream of newly scored transactions (replaces polling the listing).
+    Every event id is a listing cursor: on reconnect the browser sends the last one back as
+    Last-Event-ID (or pass ?cursor=) and the transactions scored in between are replayed first.
+    """
+    hub = analyze.stream_hub
+    if not hub:
+        raise HTTPException(status_code=503, detail="Transaction stream not ready")
+    resume_cursor = last_event_id or cursor
+    resume_from = decode_cursor(resume_cursor) if resume_cursor else None
+
+    # Subscribe before reading the backlog so nothing is scored in between unseen
+    subscription = hub.subscribe()
+
+    async def events():
+        # Streams are recycled after STREAM_MAX_SECONDS: the client reconnects and resumes
+        # losslessly, and a graceful server shutdown never waits longer than that for them
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.STREAM_MAX_SECONDS
+        try:
+            yield f"retry: {settings.STREAM_RETRY_MS}\n\n"
+            replayed = set()
+            if resume_from:
+                for event in await read_missed_events(resume_from):
+                    replayed.add(event["id"])
+                    yield format_event(event)
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), timeout=min(settings.STREAM_KEEPALIVE_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is LAGGED:
+                    # Fell behind: end the stream; the client reconnects from its last event id
+                    yield "event: lagged\ndata: {}\n\n"
+                    return
+                if event["id"] in replayed:
+                    continue
+                yield format_event(event)
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+EXPORT_CHUNK_SIZE = 5000
+# Every stored column but the scoring-time model input, which is internal to explanations
+EXPORT_COLUMNS = [name for name in COLUMN_NAMES if name != "model_input"]
+
+async def readable_explanations(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Replaces the packed explanation columns of exported rows with feature names and explanation
+    items, and drops the packed model input.
+    """
+    blobs = [row.get("explanation") for row in batch]
+    async with SessionLocal() as db:
+        names = await feature_catalog(db).lookup(db, feature_ids(blobs))
+    for row, blob in zip(batch, blobs):
+        if row.get("top_feature") is not None:
+            row["top_feature"] = names.get(row["top_feature"])
+        if blob is not None:
+            row["explanation"] = decode_explanation(blob, names)
+        row.pop("model_input", None)
+    return batch
+
+async def export_rows(start_time: Optional[datetime], end_time: Optional[datetime]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Archived rows first (month by month), then the rows still in the database, oldest first."""
+    archive = iter_archive(settings.RETENTION_ARCHIVE_PATH, start_time, end_time, batch_size=EXPORT_CHUNK_SIZE)
+    while True:
+        # Parquet decoding is CPU work: keep it off the event loop
+        batch = await asyncio.to_thread(next, archive, None)
+        if batch is None:
+            break
+        yield await readable_explanations(batch)
+    async for batch in iter_table_rows(SessionLocal, start_time, end_time, chunk_size=EXPORT_CHUNK_SIZE):
+        yield await readable_explanations(batch)
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+async def export_ndjson(rows: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[str]:
+    async for batch in rows:
+        yield "".join(json.dumps({key: _json_value(value) for key, value in row.items()}) + "\n" for row in batch)
+
+def _csv_value(value: Any) -> Any:
+    # Explanations go in one cell, as JSON
+    return json.dumps(value) if isinstance(value, list) else _json_value(value)
+
+async def export_csv(rows: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    async for batch in rows:
+        writer.writerows({key: _csv_value(value) for key, value in row.items()} for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():
+        # Nothing exported: just the header
+        yield buffer.getvalue()
+
+@router.get("/export")
+async def export_transactions(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: Any = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Bulk export of every transaction with start_time <= timestamp < end_time, including months
+    the retention job moved to Parquet archives. Streamed in chunks, so any range can be exported.
+    """
+    rows = export_rows(start_time, end_time)
+    if format == "csv":
+        return StreamingResponse(export_csv(rows), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="transactions.csv"'})
+    return StreamingResponse(export_ndjson(rows), media_type="application/x-ndjson")
+
+@router.get("/{transaction_id}/explanation", response_model=TransactionExplanation)
+async def read_transaction_explanation(
+    transaction_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Any = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Retrieve the SHAP explanation of a scored transaction.
+    Explanations skipped by the explanation policy are computed on demand and stored.
+    """
+    transaction = await db.get(Transaction, transaction_id)
+    if not transaction and analyze.write_buffer:
+        # Freshly scored rows may not have been flushed yet
+        await analyze.write_buffer.flush()
+        transaction = await db.get(Transaction, transaction_id)
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    if transaction.explanation is not None:
+        names = await feature_catalog(db).lookup(db, feature_ids([transaction.explanation]))
+        return {"transaction_id": transaction_id, "status": "ready",
+                "explanation": decode_explanation(transaction.explanation, names)}
+
+    worker = analyze.explanation_worker
+    if worker and worker.is_pending(transaction_id):
+        return {"transaction_id": transaction_id, "status": "pending", "explanation": []}
+
+    explanation = None
+    if transaction.model_input is not None:
+        try:
+            # Explain the input exactly as it was scored (transaction time, velocity state)
+            explanation = (await analyze.run_inference("explain_model_inputs", [transaction.model_input]))[0]
+        except ValueError:
+            # Scored by a model version with other features
+            pass
+    if explanation is None:
+        # Rows without a stored input: rebuild it from the row. The original transaction_time
+        # and account are not stored, so the hour comes from the scoring timestamp and the
+        # velocity features are those of an anonymous transaction.
+        data = {
+            "amount": transaction.amount,
+            "oldbalanceOrg": transaction.oldbalanceOrg,
+            "newbalanceOrig": transaction.newbalanceOrig,
+            "oldbalanceDest": transaction.oldbalanceDest,
+            "newbalanceDest": transaction.newbalanceDest,
+            "type": transaction.type,
+            "transaction_time": transaction.timestamp,
+        }
+        explanation = (await analyze.run_inference("explain_transactions", [data]))[0]
+
+    values, = await explanation_columns(db, [explanation])
+    transaction.explanation, transaction.top_feature = values["explanation"], values["top_feature"]
+    transaction.model_input = None
+    await db.commit()
+    if analyze.analytics:
+        analyze.analytics.record_explanations([(transaction.timestamp, values["explanation"])])
+    return {"transaction_id": transaction_id, "status": "ready", "explanation": explanation}
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from backend.app.api import deps
+from backend.app.core.cache import user_cache
 from backend.app.core.security import get_password_hash
 from backend.app.db.session import get_db
 from backend.app.models.user import User
@@ -54,4 +55,8 @@ async def update_user_me(
     db.add(user)
     await db.commit()
     await db.refresh(user)
+
+    # The cached copy used for authentication is stale now
+    if user_cache:
+        await user_cache.invalidate(user.id)
     return user
@@ -0,0 +1,366 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from backend.app.core.config import settings
+from backend.app.models.user import User
+
+# What authentication (active flag, role) and the /users/me response need. Never the password
+# hash: snapshots are written to Redis as plain JSON
+_USER_COLUMNS = ["id", "email", "full_name", "role", "is_active", "created_at"]
+
+
+class TTLCache:
+    """
+    Small in-process LRU cache whose entries also expire `ttl_seconds` after they were stored.
+    Not thread safe; it is only used from the event loop.
+    """
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 60, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Any, value: Any):
+        self._entries[key] = (value, self.clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Any):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _snapshot(user: User) -> Dict[str, Any]:
+    return {key: getattr(user, key) for key in _USER_COLUMNS}
+
+
+def _to_user(snapshot: Dict[str, Any]) -> User:
+    # A detached, partial User (no password hash): fine for auth checks and response
+    # serialization, never added to a session
+    return User(**snapshot)
+
+
+def _encode(snapshot: Dict[str, Any]) -> str:
+    return json.dumps(snapshot, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+
+def _decode(raw: str) -> Dict[str, Any]:
+    # Entries written by earlier versions may carry more columns
+    snapshot = {key: value for key, value in json.loads(raw).items() if key in _USER_COLUMNS}
+    if snapshot.get("created_at"):
+        snapshot["created_at"] = datetime.fromisoformat(snapshot["created_at"])
+    return snapshot
+
+
+class UserCache:
+    """
+    Cache of active-user records keyed by user id, used by deps.get_current_user.
+
+    Lookups go to the in-process TTL/LRU cache first, then to Redis when REDIS_URL is set, and
+    only then to the database. Entries are invalidated when a user is updated; other API
+    processes drop their local copy at the latest after the TTL.
+    """
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 60, redis_url: Optional[str] = None):
+        self.local = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.ttl = ttl_seconds
+        self.redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self.redis = redis.from_url(redis_url, decode_responses=True)
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"aegisflow:user:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[User]:
+        snapshot = self.local.get(user_id)
+        if snapshot is not None:
+            return _to_user(snapshot)
+        if self.redis is None:
+            return None
+
+        try:
+            raw = await self.redis.get(self._redis_key(user_id))
+        except Exception as e:
+            # Redis is only an optimization: fall back to the database
+            self.redis_errors += 1
+            print(f"User Cache Redis Error: {e}")
+            return None
+        if raw is None:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        snapshot = _decode(raw)
+        self.local.set(user_id, snapshot)
+        return _to_user(snapshot)
+
+    async def set(self, user: User):
+        if not user.is_active:
+            return
+        snapshot = _snapshot(user)
+        self.local.set(user.id, snapshot)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self._redis_key(user.id), _encode(snapshot), ex=int(self.ttl))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"User Cache Redis Error: {e}")
+
+    async def invalidate(self, user_id: int):
+        self.local.delete(user_id)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self._redis_key(user_id))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"User Cache Redis Error: {e}")
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.local.stats()
+        stats["redis"] = {
+            "hits": self.redis_hits,
+            "misses": self.redis_misses,
+            "errors": self.redis_errors,
+        } if self.redis is not None else None
+        return stats
+
+
+def fingerprint(payload: Union[Dict[str, Any], bytes]) -> str:
+    """
+    Content hash of a request payload (canonical JSON: key order and formatting don't matter).
+    Binary payloads (packed transaction records) are hashed as they are.
+    """
+    raw = payload if isinstance(payload, bytes) else json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+# Marks cache keys derived from the payload alone (see ResultCache.key)
+_CONTENT_KEY = ":content:"
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for a different payload."""
+
+
+class ResultCache:
+    """
+    Results of /analyze submissions, so that gateway retries and duplicate submissions get the
+    stored RiskAssessment (with the id of the Transaction row already written) instead of being
+    scored, explained and inserted again.
+
+    Entries are keyed by the caller's idempotency key and expire after `ttl_seconds` (the retry
+    window); the content hash of the payload only tells a retry from a key reused for another
+    transaction. Distinct transactions can have identical payloads (repeated amounts, velocity
+    bursts), so matching by content alone (`by_content`) is opt-in. Same tiers as UserCache:
+    in-process TTL/LRU, then Redis when REDIS_URL is set, so a retry that lands on another API
+    process is answered too. A submission that arrives while an identical one is still being
+    scored in this process waits for that result rather than scoring it a second time.
+    """
+    def __init__(self, max_size: int = 100000, ttl_seconds: float = 300, redis_url: Optional[str] = None,
+                 by_content: bool = False):
+        self.local = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.ttl = ttl_seconds
+        self.by_content = by_content
+        self.redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self.redis = redis.from_url(redis_url, decode_responses=True)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+
+    def key(self, user_id: Any, payload_fingerprint: str, idempotency_key: Optional[str] = None) -> Optional[str]:
+        """Cache key of a submission (per caller), or None when it must not be deduplicated."""
+        if idempotency_key:
+            return f"aegisflow:result:{user_id}:key:{idempotency_key}"
+        if self.by_content:
+            return f"aegisflow:result:{user_id}{_CONTENT_KEY}{payload_fingerprint}"
+        return None
+
+    async def get(self, key: str, payload_fingerprint: str) -> Optional[Dict[str, Any]]:
+        entry = self.local.get(key)
+        if entry is None and self.redis is not None:
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                # Redis is only an optimization: score the submission
+                self.redis_errors += 1
+                print(f"Result Cache Redis Error: {e}")
+                raw = None
+            if raw is None:
+                self.redis_misses += 1
+            else:
+                self.redis_hits += 1
+                entry = json.loads(raw)
+                self.local.set(key, entry)
+        if entry is None:
+            return None
+        if entry["fingerprint"] != payload_fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict("Idempotency key already used for a different transaction")
+        return entry["result"]
+
+    async def set(self, key: str, payload_fingerprint: str, result: Dict[str, Any]):
+        entry = {"fingerprint": payload_fingerprint, "result": result}
+        self.local.set(key, entry)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, _encode(entry), ex=max(int(self.ttl), 1))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Result Cache Redis Error: {e}")
+
+    async def get_or_compute_many(
+        self,
+        keys: List[Optional[str]],
+        fingerprints: List[str],
+        compute: Callable[[List[int]], Awaitable[List[Dict[str, Any]]]]
+    ) -> Tuple[List[Dict[str, Any]], List[bool]]:
+        """
+        Results of a batch of submissions: stored ones are replayed, the others are computed with
+        one compute(indexes) call and stored. An idempotency key repeated within the batch is computed
+        once; submissions without a key, or that only share content, are each computed.
+        Returns (results, replayed flags).
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        replayed = [False] * len(keys)
+        while True:
+            in_flight = set()
+            for i, key in enumerate(keys):
+                if key is None or results[i] is not None:
+                    continue
+                cached = await self.get(key, fingerprints[i])
+                if cached is not None:
+                    results[i], replayed[i] = cached, True
+                elif key in self._in_flight:
+                    in_flight.add(self._in_flight[key])
+            if not in_flight:
+                break
+            # Identical submissions are being scored right now: wait for them, then look again
+            self.waited += len(in_flight)
+            await asyncio.gather(*(asyncio.shield(future) for future in in_flight))
+
+        owners: Dict[str, int] = {}
+        todo = []
+        for i, key in enumerate(keys):
+            if results[i] is not None:
+                continue
+            if key is not None and _CONTENT_KEY not in key:
+                if key in owners:
+                    if fingerprints[owners[key]] != fingerprints[i]:
+                        self.conflicts += 1
+                        raise IdempotencyConflict("Idempotency key used for two different transactions")
+                    continue
+                owners[key] = i
+            todo.append(i)
+
+        loop = asyncio.get_running_loop()
+        claimed = {key: loop.create_future() for key in owners}
+        self._in_flight.update(claimed)
+        try:
+            for i, result in zip(todo, await compute(todo) if todo else []):
+                results[i] = result
+                if keys[i] is not None:
+                    await self.set(keys[i], fingerprints[i], result)
+        finally:
+            # Waiters look the results up again (and compute them themselves if this failed)
+            for key, future in claimed.items():
+                self._in_flight.pop(key, None)
+                future.set_result(None)
+
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                # Idempotency key repeated within the batch
+                results[i], replayed[i] = results[owners[key]], True
+        self.replayed += sum(replayed)
+        return results, replayed
+
+    async def get_or_compute(
+        self, key: Optional[str], payload_fingerprint: str, compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Single-submission get_or_compute_many(). Returns (result, replayed)."""
+        async def compute_one(_):
+            return [await compute()]
+
+        results, replayed = await self.get_or_compute_many([key], [payload_fingerprint], compute_one)
+        return results[0], replayed[0]
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.local.stats()
+        stats.update(replayed=self.replayed, waited=self.waited, conflicts=self.conflicts, in_flight=len(self._in_flight))
+        stats["redis"] = {
+            "hits": self.redis_hits,
+            "misses": self.redis_misses,
+            "errors": self.redis_errors,
+        } if self.redis is not None else None
+        return stats
+
+
+user_cache: Optional[UserCache] = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    redis_url=settings.REDIS_URL
+) if settings.USER_CACHE_ENABLED else None
+
+result_cache: Optional[ResultCache] = ResultCache(
+    max_size=settings.RESULT_CACHE_MAX_SIZE,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    redis_url=settings.REDIS_URL,
+    by_content=settings.RESULT_CACHE_BY_CONTENT
+) if settings.RESULT_CACHE_ENABLED else None
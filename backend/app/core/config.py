@@ -12,18 +12,99 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = "fraud_detection"
     DATABASE_URL: Optional[str] = None
+    REDIS_URL: Optional[str] = None  # e.g. redis://localhost:6379/0 (optional shared cache tier)
+
+    # Database connection pool and driver (pool settings are ignored for in-memory SQLite)
+    DB_ECHO: bool = False  # Log every SQL statement (debugging only, costly on the hot path)
+    DB_POOL_SIZE: int = 10  # Connections kept open
+    DB_MAX_OVERFLOW: int = 20  # Extra connections opened under bursts, closed once returned
+    DB_POOL_TIMEOUT_SECONDS: float = 30  # Longest a caller waits for a free connection
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Connections older than this are reopened (server/proxy idle timeouts)
+    DB_POOL_PRE_PING: bool = True  # Check a connection is alive before handing it out
+    DB_STATEMENT_CACHE_SIZE: int = 500  # asyncpg prepared statements per connection (0 behind pgbouncer transaction pooling)
+    DB_BULK_COPY: bool = True  # Bulk-insert scored rows with COPY on PostgreSQL (plain INSERT elsewhere)
 
     # Security
     SECRET_KEY: str = "CHANGE_THIS_TO_A_STRONG_SECRET_IN_PROD"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Authenticated-user cache (skips the users lookup on every request)
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: float = 60
+    USER_CACHE_MAX_SIZE: int = 10000
+
+    # Results of /analyze submissions, replayed to retries with the same Idempotency-Key
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL_SECONDS: float = 300  # Retry window: resubmissions within it get the stored result
+    RESULT_CACHE_MAX_SIZE: int = 100000
+    # Also treat identical payloads without an idempotency key as retries. Off: distinct transactions
+    # can have the same payload and would be dropped
+    RESULT_CACHE_BY_CONTENT: bool = False
+
+    # Scoring
+    MODEL_VERSION: Optional[str] = None  # Registry version served at startup (e.g. "v2"); latest when unset
+    MODEL_FORMAT: str = "auto"  # "auto" (memory-mapped bundle when present), "bundle" or "pickle"
+    ANALYZE_BATCH_MAX_SIZE: int = 1000
+    FEATURE_MODE: str = "numpy"  # "numpy" fast path or "pandas" DataFrame path
+    INFERENCE_ENGINE: str = "compiled"  # "compiled" NumPy trees or "native" xgboost/sklearn wrappers
+    INFERENCE_EXECUTOR: str = "thread"  # "thread" pool or "process" pool (one model copy per process)
+    INFERENCE_WORKERS: int = 4
+    INFERENCE_MAX_BACKLOG: int = 256  # Calls in flight beyond this are rejected with 503
+
+    # Shadow scoring of candidate models (off the response path)
+    SHADOW_MODEL_VERSIONS: str = ""  # Comma separated registry versions, e.g. "v2,v3" (empty disables)
+    SHADOW_SAMPLE_RATE: float = 0.1  # Fraction of scored transactions the shadows also score
+    SHADOW_QUEUE_SIZE: int = 10000  # Sampled transactions waiting for the shadows; more are dropped
+    SHADOW_EXECUTOR: str = "process"  # "process" (idle-priority workers, own model copy) or "thread"
+    SHADOW_WORKERS: int = 1  # Size of the shadow pool (separate from the inference executor)
+
+    # Per-account velocity features (used when the loaded models were trained with them)
+    VELOCITY_MAX_KEYS: int = 100000  # Accounts tracked; least recently seen are evicted
+    VELOCITY_CHECKPOINT_SECONDS: float = 60  # Redis snapshot interval (needs REDIS_URL, 0 disables)
+
+    # Micro-batching of concurrent single-transaction /analyze calls
+    MICROBATCH_ENABLED: bool = True
+    MICROBATCH_MAX_WAIT_MS: float = 2.0  # Longest a request waits for others to join its group
+    MICROBATCH_MAX_SIZE: int = 64  # Group is dispatched as soon as it reaches this size
+
+    # Write-behind persistence of scored transactions
+    WRITE_BEHIND_ENABLED: bool = True
+    WRITE_BEHIND_MAX_BATCH: int = 500  # Flush as soon as this many rows are buffered
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: float = 200  # ...or at least this often
+    # Unflushed rows, replayed on startup. Each process adds its pid (transactions.<pid>.jsonl); rows the
+    # database rejects go to transactions.dead_letter.jsonl
+    WRITE_BEHIND_SPILL_PATH: str = "write_behind/transactions.jsonl"
+    WRITE_BEHIND_MAX_BUFFERED: int = 100000  # Rows waiting for the database before /analyze answers 503
+    WRITE_BEHIND_FSYNC: bool = False  # fsync every append (survives power loss, costs latency)
+
+    # Live transaction stream (server-sent events)
+    STREAM_SUBSCRIBER_QUEUE_SIZE: int = 1000  # Events a slow client may lag behind before it is cut off
+    STREAM_KEEPALIVE_SECONDS: float = 15
+    STREAM_RETRY_MS: int = 1000  # Client reconnect delay
+    STREAM_MAX_SECONDS: float = 30  # Streams are closed (and resumed by the client) after this long
+    STREAM_RESUME_MAX_ROWS: int = 1000  # Most missed transactions replayed on reconnect
+
+    # Hot/cold tiering of the transactions table (monthly partitions on PostgreSQL)
+    RETENTION_HOT_DAYS: int = 0  # Months that ended this many days ago move to Parquet archives (0 keeps everything)
+    RETENTION_ARCHIVE_PATH: str = "archive"  # Archive root (<path>/transactions/month=YYYY-MM/part-*.parquet)
+    RETENTION_INTERVAL_SECONDS: float = 3600  # How often partitions are extended and old months archived
+    PARTITION_MONTHS_AHEAD: int = 3  # Monthly partitions kept created ahead of the current month
+
+    # Analytics rollups
+    ANALYTICS_FLUSH_SECONDS: float = 10  # How often in-memory counters are merged into the rollup table
+
+    # Explanations (SHAP)
+    EXPLANATION_POLICY: str = "always"  # "always", "flagged", "sampled" or "deferred"
+    EXPLANATION_SAMPLE_RATE: float = 0.1  # Fraction explained inline with the "sampled" policy
+    EXPLANATION_QUEUE_SIZE: int = 10000  # Max transactions waiting for the deferred worker
+
     @property
     def ASYNC_DATABASE_URL(self) -> str:
         if self.DATABASE_URL:
             return self.DATABASE_URL
-        # FALLBACK: Use SQLite for local development (Absolute path to avoid confusion)
-        return "sqlite+aiosqlite:///C:/PROJECT/AegisFlow/fraud_detection.db"
+        # FALLBACK: Use SQLite for local development (in the working directory)
+        return "sqlite+aiosqlite:///./fraud_detection.db"
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List
+
+# ULIDs (https://github.com/ulid/spec): a 48-bit millisecond timestamp followed by 80 random bits,
+# written as 26 Crockford base32 characters. They sort by creation time, so new rows land at the
+# right-hand edge of the (id) and (timestamp, id) indexes instead of all over them, and they
+# cannot collide between requests, workers or hosts the way millisecond timestamps did.
+# Within one millisecond a process increments the random part, so its IDs are strictly increasing.
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+TRANSACTION_PREFIX = "txn_"
+_RANDOM_BITS = 80
+_MAX_RANDOM = (1 << _RANDOM_BITS) - 1
+
+
+def encode(value: int) -> str:
+    """A 128-bit integer as 26 base32 characters (most significant first)."""
+    chars = []
+    for _ in range(26):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class ULIDGenerator:
+    """Thread-safe, monotonic ULID source (see module comment)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self, count: int = 1) -> List[str]:
+        with self._lock:
+            now_ms = int(time.time() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms, self._last_random = now_ms, int.from_bytes(os.urandom(10), "big") >> 1
+            ids = []
+            # A clock that steps back keeps counting from the last millisecond seen
+            for _ in range(count):
+                self._last_random += 1
+                if self._last_random > _MAX_RANDOM:
+                    # 2**79 IDs in one millisecond: borrow the next one
+                    self._last_ms, self._last_random = self._last_ms + 1, 0
+                ids.append(encode((self._last_ms << _RANDOM_BITS) | self._last_random))
+            return ids
+
+
+_generator = ULIDGenerator()
+
+
+def new_transaction_id() -> str:
+    return TRANSACTION_PREFIX + _generator.new()[0]
+
+
+def new_transaction_ids(count: int) -> List[str]:
+    """`count` increasing IDs at once (one lock round trip for a whole batch)."""
+    return [TRANSACTION_PREFIX + ulid for ulid in _generator.new(count)]
+
+
+def id_time(transaction_id: str) -> datetime:
+    """When an ID was generated (UTC, millisecond precision)."""
+    ulid = transaction_id[len(TRANSACTION_PREFIX):] if transaction_id.startswith(TRANSACTION_PREFIX) else transaction_id
+    value = 0
+    for char in ulid[:10]:
+        value = value * 32 + _DECODE[char]
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
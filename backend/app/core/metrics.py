@@ -0,0 +1,129 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds, from a tenth of a millisecond (one tree engine call) up to a slow SHAP batch
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# A gauge rendered at scrape time: (name, help, labels, value)
+Gauge = Tuple[str, str, Dict[str, str], float]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with Prometheus semantics (an observation counts in every bucket >= it)."""
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, out = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            out.append(("+Inf" if bound == float("inf") else _number(bound), total))
+        return out
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "started")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe_stage(self.stage, time.perf_counter() - self.started)
+
+
+class Metrics:
+    """
+    Process-wide latency histograms per scoring stage, batch size histograms and error counters.
+    Not thread safe; it is only updated from the event loop (worker threads and processes hand
+    their predictor stage timings back with their results, see services/inference.py).
+    """
+    def __init__(self):
+        self.stages: Dict[str, Histogram] = {}
+        self.batch_sizes: Dict[str, Histogram] = {}
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def time(self, stage: str) -> _Timer:
+        """Times the block it wraps (sync or async code): `with metrics.time("auth"): ...`."""
+        return _Timer(self, stage)
+
+    def observe_stage(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+    def observe_stages(self, timings: Iterable[Tuple[str, float]]):
+        for stage, seconds in timings:
+            self.observe_stage(stage, seconds)
+
+    def observe_batch(self, kind: str, size: int):
+        histogram = self.batch_sizes.get(kind)
+        if histogram is None:
+            histogram = self.batch_sizes[kind] = Histogram(BATCH_BUCKETS)
+        histogram.observe(size)
+
+    def count_error(self, endpoint: str):
+        self.errors[endpoint] += 1
+
+    def reset(self):
+        self.__init__()
+
+    def render(self, gauges: Optional[List[Gauge]] = None) -> str:
+        """Everything in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        _render_histograms(lines, "aegisflow_stage_duration_seconds", "Time spent in each scoring stage.",
+                           "stage", self.stages)
+        _render_histograms(lines, "aegisflow_batch_size", "Transactions per model call or database flush.",
+                           "kind", self.batch_sizes)
+        lines.append("# HELP aegisflow_analyze_errors_total Analyze requests that failed with an unexpected error.")
+        lines.append("# TYPE aegisflow_analyze_errors_total counter")
+        for endpoint, count in sorted(self.errors.items()):
+            lines.append(f"aegisflow_analyze_errors_total{_labels({'endpoint': endpoint})} {count}")
+
+        described = set()
+        for name, help_text, labels, value in gauges or []:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _render_histograms(lines: List[str], name: str, help_text: str, label: str, histograms: Dict[str, Histogram]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(histograms.items()):
+        for bound, count in histogram.cumulative():
+            lines.append(f"{name}_bucket{_labels({label: key, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{_labels({label: key})} {_number(histogram.sum)}")
+        lines.append(f"{name}_count{_labels({label: key})} {histogram.count}")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
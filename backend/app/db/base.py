@@ -2,3 +2,6 @@
 from backend.app.db.base_class import Base
 from backend.app.models.user import User
 from backend.app.models.transaction import Transaction
+from backend.app.models.analytics import TransactionRollup
+from backend.app.models.shadow import ShadowScore
+from backend.app.models.explanation import ExplanationFeature
@@ -0,0 +1,77 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.config import settings
+from backend.app.models.transaction import Transaction
+
+# Column order of the COPY records
+COPY_COLUMNS = [column.name for column in Transaction.__table__.columns]
+
+# Client-side scalar defaults (Column(default=...), e.g. currency "USD"). Neither COPY nor an
+# INSERT of an explicit None applies them, and transaction_to_row() gives None for every
+# attribute that was never set, so both paths fill them in here
+SCALAR_DEFAULTS = {
+    column.name: column.default.arg
+    for column in Transaction.__table__.columns
+    if column.default is not None and column.default.is_scalar
+}
+
+
+def with_defaults(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rows with the scalar column defaults filled in where a value is missing or None."""
+    return [
+        {**row, **{column: default for column, default in SCALAR_DEFAULTS.items() if row.get(column) is None}}
+        for row in rows
+    ]
+
+
+def copy_records(rows: List[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+    """
+    Row dicts (see persistence.transaction_to_row) as tuples in COPY_COLUMNS order. Missing columns
+    get their scalar default, or NULL when they have none.
+    """
+    return [
+        tuple(SCALAR_DEFAULTS.get(column) if row.get(column) is None else row[column] for column in COPY_COLUMNS)
+        for row in rows
+    ]
+
+
+async def bulk_insert_transactions(db: AsyncSession, rows: List[Dict[str, Any]], ignore_existing: bool = False,
+                                   use_copy: Optional[bool] = None):
+    """
+    Inserts Transaction rows in one round trip; the caller commits.
+
+    On PostgreSQL with asyncpg (and DB_BULK_COPY) the rows are streamed with COPY, the fastest
+    way in. Everywhere else, and for replays that must skip rows already stored (COPY has no
+    ON CONFLICT), it is a single executemany INSERT, which is what tests run on SQLite.
+    """
+    if not rows:
+        return
+    use_copy = settings.DB_BULK_COPY if use_copy is None else use_copy
+    dialect = db.bind.dialect
+    if use_copy and not ignore_existing and dialect.name == "postgresql" and dialect.driver == "asyncpg":
+        await _copy(db, rows)
+        return
+    if ignore_existing and dialect.name == "postgresql":
+        # No conflict target: the partitioned table's primary key is (id, timestamp), not (id)
+        statement = postgresql.insert(Transaction).on_conflict_do_nothing()
+    elif ignore_existing and dialect.name == "sqlite":
+        statement = sqlite.insert(Transaction).on_conflict_do_nothing(index_elements=["id"])
+    else:
+        statement = insert(Transaction)
+    await db.execute(statement, with_defaults(rows))
+
+
+async def _copy(db: AsyncSession, rows: List[Dict[str, Any]]):
+    connection = await db.connection()
+    driver = (await connection.get_raw_connection()).driver_connection
+    copy = driver.copy_records_to_table(Transaction.__tablename__, records=copy_records(rows), columns=COPY_COLUMNS)
+    if driver.is_in_transaction():
+        await copy
+    else:
+        # Nothing ran on this session yet, so no transaction is open: the COPY commits on its own
+        async with driver.transaction():
+            await copy
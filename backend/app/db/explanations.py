@@ -0,0 +1,131 @@
+import asyncio
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models.explanation import ExplanationFeature
+
+# A stored explanation is the top SHAP factors of a transaction, most important first, packed as
+# fixed-width little-endian records: feature id (uint16), impact (float32), input value (float64).
+# That is 14 bytes per factor (70 for the usual top 5) instead of ~330 bytes of JSON, and any
+# number of explanations decode with one np.frombuffer. Feature ids point into the
+# explanation_features table; the id of the first (strongest) factor is also stored in the
+# indexed Transaction.top_feature column, so "where X was the top driver" is an index range scan.
+EXPLANATION_DTYPE = np.dtype([("feature", "<u2"), ("impact", "<f4"), ("value", "<f8")])
+
+
+def pack_explanation(explanation: List[Dict[str, Any]], feature_ids: Dict[str, int]) -> bytes:
+    """predictor explanation items ({"feature", "impact", "value"}) -> packed records."""
+    records = np.empty(len(explanation), dtype=EXPLANATION_DTYPE)
+    for i, item in enumerate(explanation):
+        records[i] = (feature_ids[item["feature"]], item["impact"], item["value"])
+    return records.tobytes()
+
+
+def unpack_explanation(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=EXPLANATION_DTYPE)
+
+
+def decode_explanation(blob: bytes, names: Dict[int, str]) -> List[Dict[str, Any]]:
+    """Packed records -> explanation items, as the predictor returned them."""
+    return [
+        {"feature": names.get(int(feature), f"feature_{feature}"), "impact": float(impact), "value": float(value)}
+        for feature, impact, value in unpack_explanation(blob).tolist()
+    ]
+
+
+def feature_ids(blobs: Iterable[Optional[bytes]]) -> Set[int]:
+    """Every feature id referenced by the given packed explanations."""
+    return {feature for blob in blobs if blob for feature in unpack_explanation(blob)["feature"].tolist()}
+
+
+class FeatureCatalog:
+    """
+    Cached name <-> id mapping of the explanation_features table of one database. The table only
+    ever grows, so a cached entry never goes stale; a name missing from it is registered
+    (concurrent registrations from several workers resolve to the same id).
+    """
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: Dict[int, str] = {}
+        self._lock = asyncio.Lock()
+
+    async def resolve(self, db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+        """Ids of `names`, registering the new ones. Returns the whole name -> id mapping."""
+        missing = [name for name in dict.fromkeys(names) if name not in self.ids]
+        if missing:
+            async with self._lock:
+                await self._load(db)
+                missing = [name for name in missing if name not in self.ids]
+                if missing:
+                    await self._register(db, missing)
+                    await self._load(db)
+        return self.ids
+
+    async def find(self, db: AsyncSession, name: str) -> Optional[int]:
+        """Id of a feature, or None if it was never registered (without registering it)."""
+        if name not in self.ids:
+            async with self._lock:
+                await self._load(db)
+        return self.ids.get(name)
+
+    async def lookup(self, db: AsyncSession, ids: Iterable[int] = ()) -> Dict[int, str]:
+        """The id -> name mapping, refreshed when one of `ids` (or nothing at all) is known yet."""
+        ids = [i for i in ids if i is not None]
+        if not self.names or any(i not in self.names for i in ids):
+            async with self._lock:
+                await self._load(db)
+        return self.names
+
+    async def _load(self, db: AsyncSession):
+        rows = (await db.execute(select(ExplanationFeature.id, ExplanationFeature.name))).all()
+        for feature_id, name in rows:
+            self.ids[name] = feature_id
+            self.names[feature_id] = name
+
+    async def _register(self, db: AsyncSession, names: List[str]):
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(ExplanationFeature).on_conflict_do_nothing(index_elements=["name"])
+        elif dialect == "sqlite":
+            statement = sqlite.insert(ExplanationFeature).on_conflict_do_nothing(index_elements=["name"])
+        else:
+            statement = insert(ExplanationFeature)
+        # Own transaction: committed straight away whatever the caller's session is doing
+        async with db.bind.begin() as conn:
+            await conn.execute(statement, [{"name": name} for name in names])
+
+
+_catalogs: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def feature_catalog(db: AsyncSession) -> FeatureCatalog:
+    """The catalog of the database `db` is bound to."""
+    engine = db.bind.sync_engine
+    catalog = _catalogs.get(engine)
+    if catalog is None:
+        catalog = _catalogs[engine] = FeatureCatalog()
+    return catalog
+
+
+async def explanation_columns(db: AsyncSession, explanations: List[Optional[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """
+    Transaction column values ({"explanation", "top_feature"}) storing each explanation;
+    NULLs for the ones that are None (not explained).
+    """
+    names = [item["feature"] for explanation in explanations if explanation for item in explanation]
+    feature_ids = await feature_catalog(db).resolve(db, names) if names else {}
+    columns = []
+    for explanation in explanations:
+        if explanation is None:
+            columns.append({"explanation": None, "top_feature": None})
+        else:
+            columns.append({
+                "explanation": pack_explanation(explanation, feature_ids),
+                "top_feature": feature_ids[explanation[0]["feature"]] if explanation else None
+            })
+    return columns
@@ -0,0 +1,80 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# On PostgreSQL the transactions table is range-partitioned by month on "timestamp" (see the
+# "partition transactions by month" migration): recent months stay small and hot, and old months
+# are archived and dropped whole by the retention job (services/retention.py). Rows outside every
+# monthly partition land in transactions_default. Other databases keep one plain table.
+
+TABLE = "transactions"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    result = await conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {"table": TABLE})
+    return result.first() is not None
+
+
+async def partition_exists(conn: AsyncConnection, month: datetime) -> bool:
+    result = await conn.execute(text("SELECT to_regclass(:name)"), {"name": partition_name(month)})
+    return result.scalar() is not None
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+    """
+    Creates the monthly partitions from the current month to `months_ahead` months ahead, so new
+    rows never fall into the default partition. Returns the partitions created (none on an
+    unpartitioned table).
+    """
+    if not await is_partitioned(conn):
+        return []
+    created = []
+    first = month_start(now or datetime.now())
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        if await partition_exists(conn, month):
+            continue
+        await conn.execute(text(
+            f'CREATE TABLE {partition_name(month)} PARTITION OF {TABLE} '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        created.append(partition_name(month))
+    return created
+
+
+async def drop_partition(conn: AsyncConnection, month: datetime) -> bool:
+    """
+    Detaches and drops a month's partition once its rows were archived and deleted.
+    False if there is none, or if it still holds rows (written after they were archived).
+    """
+    if not await is_partitioned(conn) or not await partition_exists(conn, month):
+        return False
+    name = partition_name(month)
+    # Keeps writers out of the partition until the transaction ends, so nothing lands in it between the check and the drop
+    await conn.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+    if (await conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1"))).first() is not None:
+        return False
+    await conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+    await conn.execute(text(f"DROP TABLE {name}"))
+    return True
@@ -1,12 +1,35 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import Any, Dict, Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from backend.app.core.config import settings
+from backend.app.db.pool import InstrumentedAsyncQueuePool
 
-engine = create_async_engine(
-    settings.ASYNC_DATABASE_URL,
-    echo=True, # Log SQL queries for development
-    future=True
-)
+def engine_options(database_url: str) -> Dict[str, Any]:
+    """create_async_engine() arguments for the configured pool (DB_* settings) and driver."""
+    url = make_url(database_url)
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO, "future": True}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # An in-memory database lives in a single shared connection: nothing to size
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+    if url.get_driver_name() == "asyncpg":
+        # Prepared statements are cached per connection: the hot INSERT/SELECTs are parsed and planned once
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+        }
+    return options
+
+engine = create_async_engine(settings.ASYNC_DATABASE_URL, **engine_options(settings.ASYNC_DATABASE_URL))
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -16,6 +39,11 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+def pool_stats(db_engine: AsyncEngine = engine) -> Optional[Dict[str, Any]]:
+    """Connection pool state, or None when the engine does not use the instrumented pool."""
+    pool = db_engine.pool
+    return pool.stats() if isinstance(pool, InstrumentedAsyncQueuePool) else None
+
 async def get_db():
     async with SessionLocal() as session:
         try:
@@ -1,31 +1,151 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
 
 from backend.app.core.config import settings
-from backend.app.api.endpoints import auth, analyze, transactions, users
-from backend.ml_engine.predictor import FraudPredictor
+from backend.app.core.cache import result_cache, user_cache
+from backend.app.core.metrics import metrics
+from backend.app.db.session import pool_stats
+from backend.app.api.endpoints import auth, analyze, analytics, models, transactions, users
+from backend.app.services.analytics import AnalyticsAggregator
+from backend.app.services.batcher import MicroBatcher
+from backend.app.services.checkpoints import VelocityCheckpointer
+from backend.app.services.explanations import ExplanationWorker
+from backend.app.services.models import ModelManager
+from backend.app.services.persistence import WriteBehindBuffer
+from backend.app.services.retention import RetentionJob
+from backend.app.services.shadow import ShadowScorer
+from backend.app.services.stream import TransactionHub
+from backend.ml_engine.loader import ModelRegistry
 
 # Lifecycle event to load models
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Load ML Models
     print("Startup: Initializing ML Engine...")
-    model_path = os.path.join(os.path.dirname(__file__), "..", "..", "backend", "ml_engine", "saved_models")
+    model_registry = ModelRegistry(os.path.join(os.path.dirname(__file__), "..", "..", "backend", "ml_engine", "saved_models"))
     
     # Initialize the global predictor in the analyze module
     # Note: A better pattern is app.state.predictor, but for the dependency injection in analyze.py we can set it there.
+    # model_dir is filled in per registry version by the model manager
+    predictor_kwargs = dict(
+        feature_mode=settings.FEATURE_MODE,
+        engine=settings.INFERENCE_ENGINE,
+        explanation_policy=settings.EXPLANATION_POLICY,
+        explanation_sample_rate=settings.EXPLANATION_SAMPLE_RATE,
+        velocity_max_keys=settings.VELOCITY_MAX_KEYS,
+        model_format=settings.MODEL_FORMAT
+    )
+
+    def serve(predictor, executor):
+        analyze.predictor, analyze.executor = predictor, executor
+
+    # Model work runs on a worker pool so it never blocks the event loop
+    # (process workers load their own copy of the models once); every model version gets its own pool
+    analyze.model_manager = ModelManager(
+        model_registry,
+        predictor_kwargs=predictor_kwargs,
+        executor_kwargs=dict(
+            kind=settings.INFERENCE_EXECUTOR,
+            workers=settings.INFERENCE_WORKERS,
+            max_backlog=settings.INFERENCE_MAX_BACKLOG
+        ),
+        on_swap=serve,
+        shadow_versions=[version.strip() for version in settings.SHADOW_MODEL_VERSIONS.split(",") if version.strip()]
+    )
+    velocity_checkpointer = None
     try:
-        analyze.predictor = FraudPredictor(model_dir=model_path)
-        analyze.predictor.load_models()
-        print("Startup: ML Models Loaded Successfully.")
+        await analyze.model_manager.activate(settings.MODEL_VERSION)
+
+        # Velocity state lives in the shared predictor with the thread executor: keep it across restarts
+        if settings.REDIS_URL and settings.VELOCITY_CHECKPOINT_SECONDS > 0 and settings.INFERENCE_EXECUTOR == "thread":
+            velocity_checkpointer = VelocityCheckpointer(
+                lambda: analyze.predictor, settings.REDIS_URL, interval_seconds=settings.VELOCITY_CHECKPOINT_SECONDS
+            )
+            await velocity_checkpointer.start()
+
+        if settings.MICROBATCH_ENABLED:
+            analyze.batcher = MicroBatcher(
+                run_batch=lambda records: analyze.run_inference("predict_batch", records),
+                max_wait_ms=settings.MICROBATCH_MAX_WAIT_MS,
+                max_batch=settings.MICROBATCH_MAX_SIZE
+            )
+        print(f"Startup: ML Models Loaded Successfully ({analyze.model_manager.active_version}).")
     except Exception as e:
         print(f"Startup Error: Failed to load models: {e}")
         # We don't crash the app, but /analyze will fail
+
+    # Scored rows are bulk-inserted in the background; rows left over from a previous run are replayed first
+    if settings.WRITE_BEHIND_ENABLED:
+        analyze.write_buffer = WriteBehindBuffer(
+            spill_path=settings.WRITE_BEHIND_SPILL_PATH,
+            max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+            flush_interval_ms=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS,
+            fsync=settings.WRITE_BEHIND_FSYNC,
+            max_buffered=settings.WRITE_BEHIND_MAX_BUFFERED
+        )
+        await analyze.write_buffer.start()
+
+    # Live stream fan-out (shared across API workers through Redis pub/sub when REDIS_URL is set)
+    analyze.stream_hub = TransactionHub(
+        subscriber_queue_size=settings.STREAM_SUBSCRIBER_QUEUE_SIZE,
+        redis_url=settings.REDIS_URL
+    )
+    analyze.stream_hub.start()
+
+    # Dashboard metrics, aggregated as transactions are scored
+    analyze.analytics = AnalyticsAggregator(flush_interval_seconds=settings.ANALYTICS_FLUSH_SECONDS)
+    analyze.analytics.start()
+
+    # Keeps monthly partitions ahead and moves old months to Parquet archives
+    analyze.retention = RetentionJob(
+        archive_path=settings.RETENTION_ARCHIVE_PATH,
+        hot_days=settings.RETENTION_HOT_DAYS,
+        interval_seconds=settings.RETENTION_INTERVAL_SECONDS,
+        months_ahead=settings.PARTITION_MONTHS_AHEAD
+    )
+    analyze.retention.start()
+
+    # Candidate models score a sample of traffic on their own pool, never on the response path
+    analyze.shadow_scorer = ShadowScorer(
+        get_predictor=lambda: analyze.predictor,
+        sample_rate=settings.SHADOW_SAMPLE_RATE,
+        max_queue=settings.SHADOW_QUEUE_SIZE,
+        kind=settings.SHADOW_EXECUTOR,
+        workers=settings.SHADOW_WORKERS
+    )
+    analyze.shadow_scorer.start()
+
+    # Background SHAP worker (only fed when EXPLANATION_POLICY is "deferred")
+    analyze.explanation_worker = ExplanationWorker(
+        get_executor=lambda: analyze.executor,
+        max_queue=settings.EXPLANATION_QUEUE_SIZE,
+        flush_pending_writes=analyze.write_buffer.flush if analyze.write_buffer else None,
+        on_explained=analyze.analytics.record_explanations
+    )
+    analyze.explanation_worker.start()
         
     yield
-    # Shutdown events if any
+    # Shutdown: flush waiting requests, finish explaining whatever is still queued,
+    # drain the write-behind buffer, then stop the workers
+    if analyze.batcher:
+        await analyze.batcher.close()
+    await analyze.explanation_worker.stop()
+    await analyze.shadow_scorer.stop()
+    if analyze.write_buffer:
+        await analyze.write_buffer.close()
+    await analyze.analytics.stop()
+    await analyze.retention.stop()
+    await analyze.model_manager.close()
+    if velocity_checkpointer:
+        await velocity_checkpointer.stop()
+    await analyze.stream_hub.stop()
+    if user_cache:
+        await user_cache.close()
+    if result_cache:
+        await result_cache.close()
 
 app = FastAPI(
     title="Fraud Detection API",
@@ -47,6 +167,8 @@ app.include_router(auth.router, prefix="/api/v1", tags=["auth"])
 app.include_router(analyze.router, prefix="/api/v1/analyze", tags=["analysis"])
 app.include_router(transactions.router, prefix="/api/v1/transactions", tags=["transactions"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
+app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["analytics"])
+app.include_router(models.router, prefix="/api/v1/models", tags=["models"])
 
 @app.get("/")
 async def root():
@@ -54,9 +176,57 @@ async def root():
         "system": "Fraud Detection Platform",
         "status": "online",
         "version": "1.0.0",
-        "ml_engine": "active" if analyze.predictor and analyze.predictor.xgb_model else "offline"
+        "ml_engine": "active" if analyze.predictor and analyze.predictor.is_loaded else "offline",
+        "model_version": analyze.model_manager.active_version if analyze.model_manager else None
     }
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "model": analyze.model_manager.status() if analyze.model_manager else None,
+        "inference": analyze.executor.stats() if analyze.executor else None,
+        "microbatch": analyze.batcher.stats() if analyze.batcher else None,
+        "write_behind": analyze.write_buffer.stats() if analyze.write_buffer else None,
+        "user_cache": user_cache.stats() if user_cache else None,
+        "result_cache": result_cache.stats() if result_cache else None,
+        "database_pool": pool_stats(),
+        "stream": analyze.stream_hub.stats() if analyze.stream_hub else None,
+        "analytics": analyze.analytics.stats() if analyze.analytics else None,
+        "shadow": analyze.shadow_scorer.stats() if analyze.shadow_scorer else None,
+        "retention": analyze.retention.stats() if analyze.retention else None,
+        # Per-process state with the process executor, so only reported for the shared thread-pool predictor
+        "velocity": analyze.predictor.velocity_stats()
+        if analyze.predictor and settings.INFERENCE_EXECUTOR == "thread" else None
+    }
+
+def _scrape_gauges():
+    """Point-in-time values reported next to the histograms on /metrics."""
+    gauges = []
+    if analyze.model_manager and analyze.model_manager.active_version:
+        gauges.append(("aegisflow_model_info", "Model version being served.",
+                       {"version": analyze.model_manager.active_version}, 1))
+    if analyze.executor:
+        stats = analyze.executor.stats()
+        gauges.append(("aegisflow_inference_in_flight", "Inference calls submitted and not finished.", {}, stats["in_flight"]))
+        gauges.append(("aegisflow_inference_queue_depth", "Inference calls waiting for a free worker.", {}, stats["queue_depth"]))
+    pool = pool_stats()
+    if pool:
+        gauges.append(("aegisflow_db_pool_size", "Connections the pool keeps open.", {}, pool["size"]))
+        gauges.append(("aegisflow_db_pool_checked_out", "Connections currently in use.", {}, pool["checked_out"]))
+        gauges.append(("aegisflow_db_pool_overflow", "Connections open beyond the pool size.", {}, pool["overflow"]))
+    if analyze.batcher:
+        gauges.append(("aegisflow_microbatch_waiting", "Requests waiting for their micro-batch to be dispatched.",
+                       {}, analyze.batcher.stats()["waiting"]))
+    if analyze.explanation_worker:
+        gauges.append(("aegisflow_explanation_queue_depth", "Transactions waiting for a deferred explanation.",
+                       {}, analyze.explanation_worker.queue.qsize()))
+    if analyze.write_buffer:
+        gauges.append(("aegisflow_write_behind_buffered", "Scored rows not yet committed to the database.",
+                       {}, analyze.write_buffer.stats()["buffered"]))
+    return gauges
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(_scrape_gauges()), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, DateTime, String
+from backend.app.db.base_class import Base
+
+class TransactionRollup(Base):
+    """Pre-aggregated metrics of the transactions scored in one hour (see services/analytics.py)."""
+    __tablename__ = "transaction_rollups"
+
+    # Start of the hour, naive like the scoring timestamps it is derived from
+    bucket_start = Column(DateTime, primary_key=True)
+
+    # Counters
+    total = Column(Integer, nullable=False, default=0)
+    flagged = Column(Integer, nullable=False, default=0)
+    allow_count = Column(Integer, nullable=False, default=0)
+    review_count = Column(Integer, nullable=False, default=0)
+    deny_count = Column(Integer, nullable=False, default=0)
+
+    # Sums (averages are derived)
+    amount_sum = Column(Float, nullable=False, default=0.0)
+    risk_score_sum = Column(Float, nullable=False, default=0.0)
+
+    # Fixed-bucket histograms, JSON lists of counts (edges in services/analytics.py)
+    risk_score_histogram = Column(String, nullable=False)
+    amount_histogram = Column(String, nullable=False)
+
+    # Per-feature attribution of the explained transactions, JSON {feature id: [top_count, count,
+    # impact_sum, abs_impact_sum]}; NULL for hours rolled up before it was tracked
+    feature_attribution = Column(String, nullable=True)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+from backend.app.db.base_class import Base
+
+class ExplanationFeature(Base):
+    """Model feature referenced by id from stored explanations (see backend/app/db/explanations.py)."""
+    __tablename__ = "explanation_features"
+
+    # Ids are never reused or renumbered: archived explanations keep pointing to them
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
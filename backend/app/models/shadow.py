@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Float, DateTime, String, Boolean, Index
+from backend.app.db.base_class import Base
+
+class ShadowScore(Base):
+    """Score of a sampled transaction by a shadow (candidate) model (see services/shadow.py)."""
+    __tablename__ = "shadow_scores"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    transaction_id = Column(String, nullable=False, index=True)
+    model_version = Column(String(16), nullable=False)
+    risk_score = Column(Float, nullable=False)
+    verdict = Column(String(8), nullable=False)
+    # Compared with the verdict the primary model returned
+    score_delta = Column(Float, nullable=False)  # shadow risk_score - primary risk_score
+    disagrees = Column(Boolean, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_shadow_scores_model_version_created_at", "model_version", "created_at"),
+    )
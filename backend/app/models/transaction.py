@@ -1,14 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index, LargeBinary
 from sqlalchemy.sql import func
 from backend.app.db.base_class import Base
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(String, primary_key=True, index=True) # Transaction ID from payment gateway
+    id = Column(String, primary_key=True, index=True) # Time-ordered "txn_<ULID>" (backend/app/core/ids.py)
     amount = Column(Float, nullable=False)
     currency = Column(String, default="USD")
-    merchant_id = Column(String, index=True)
+    merchant_id = Column(String) # Indexed together with (timestamp, id), see __table_args__
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Optional link to registered user
     
     # Metadata
@@ -30,4 +30,21 @@ class Transaction(Base):
     is_flagged = Column(Boolean, default=False)
     
     # Explainability
-    rule_violations = Column(String) # JSON string of broken rules
+    # Top SHAP factors packed as fixed-width binary records (see backend/app/db/explanations.py);
+    # NULL until the transaction is explained
+    explanation = Column(LargeBinary, nullable=True)
+    top_feature = Column(Integer, nullable=True) # ExplanationFeature id of the strongest factor
+    # Model input the transaction was scored with (packed by backend/ml_engine/predictor.py's
+    # pack_model_inputs); kept only until the transaction is explained
+    model_input = Column(LargeBinary, nullable=True)
+
+    # Keyset pagination walks (timestamp, id) newest first; each filter gets its own
+    # composite index so a filtered page is an index range scan instead of a sort
+    __table_args__ = (
+        Index("ix_transactions_timestamp_id", "timestamp", "id"),
+        Index("ix_transactions_risk_level_timestamp_id", "risk_level", "timestamp", "id"),
+        Index("ix_transactions_is_flagged_timestamp_id", "is_flagged", "timestamp", "id"),
+        Index("ix_transactions_merchant_id_timestamp_id", "merchant_id", "timestamp", "id"),
+        Index("ix_transactions_top_feature_timestamp_id", "top_feature", "timestamp", "id"),
+    )
+    # On PostgreSQL the table is partitioned by month on timestamp (see backend/app/db/partitions.py)
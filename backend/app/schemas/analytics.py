@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from typing import Dict, List
+from datetime import datetime
+
+class AnalyticsSummary(BaseModel):
+    total: int
+    flagged: int
+    by_verdict: Dict[str, int]
+    fraud_rate: float  # Share of DENY verdicts
+    flagged_rate: float
+    amount_sum: float
+    avg_amount: float
+    avg_risk_score: float
+
+class HourlyAnalytics(AnalyticsSummary):
+    bucket_start: datetime
+
+class Histogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+
+class AnalyticsResponse(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    bucket_seconds: int
+    totals: AnalyticsSummary
+    hourly: List[HourlyAnalytics]
+    risk_score_histogram: Histogram
+    # The last amount bucket is open-ended (>= the last edge)
+    amount_histogram: Histogram
+
+class FeatureAttribution(BaseModel):
+    feature: str
+    top_count: int  # Explanations where it was the strongest factor
+    top_share: float  # top_count / explained
+    count: int  # Explanations where it was among the top factors
+    mean_impact: float  # Mean SHAP impact over those (positive pushes towards fraud)
+    mean_abs_impact: float
+
+class HourlyTopFeatures(BaseModel):
+    bucket_start: datetime
+    explained: int
+    top_features: Dict[str, int]  # Feature -> times it was the strongest factor
+
+class FeatureAttributionResponse(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    bucket_seconds: int
+    explained: int
+    features: List[FeatureAttribution]
+    hourly: List[HourlyTopFeatures]
@@ -0,0 +1,43 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+class ModelVersion(BaseModel):
+    version: str
+    created_at: Optional[datetime] = None
+    active: bool
+    # Anything else the trainer recorded (feature columns, dataset, metrics...)
+    metadata: Dict[str, Any]
+
+class ReloadStatus(BaseModel):
+    state: str  # "idle", "loading", "ready" or "failed"
+    version: Optional[str] = None
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ModelsResponse(BaseModel):
+    active_version: Optional[str] = None
+    versions: List[ModelVersion]
+    reload: ReloadStatus
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None  # Latest when omitted
+
+class ReloadResponse(BaseModel):
+    version: str
+    reload: ReloadStatus
+
+class ShadowVersionSummary(BaseModel):
+    model_version: str
+    scored: int
+    disagreements: int  # Verdict differs from the primary model's
+    disagreement_rate: float
+    mean_score_delta: float  # shadow risk_score - primary risk_score
+    mean_abs_score_delta: float
+
+class ShadowSummaryResponse(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    sample_rate: float
+    shadows: List[ShadowVersionSummary]
@@ -10,9 +10,13 @@ class TransactionBase(BaseModel):
     newbalanceDest: float = Field(..., ge=0, description="New balance destination")
     type: Literal['PAYMENT', 'TRANSFER', 'CASH_OUT', 'DEBIT', 'CASH_IN']
     transaction_time: Optional[datetime] = None
+    # Originating account; keys the per-account velocity features when the models use them
+    nameOrig: Optional[str] = None
 
 class TransactionCreate(TransactionBase):
-    pass
+    # Resubmissions with the same key (e.g. gateway retries) get the stored result instead of being
+    # scored again; the Idempotency-Key header does the same for a whole request
+    idempotency_key: Optional[str] = Field(None, max_length=255)
 
 class ExplanationItem(BaseModel):
     feature: str
@@ -20,8 +24,16 @@ class ExplanationItem(BaseModel):
     value: float
 
 class RiskAssessment(BaseModel):
+    transaction_id: Optional[str] = None
     risk_score: float = Field(..., ge=0.0, le=1.0)
     verdict: Literal['ALLOW', 'DENY', 'REVIEW']
     anomaly_detected: bool
     explanation: List[ExplanationItem]
+    # "skipped"/"deferred" explanations can be fetched later from /transactions/{id}/explanation
+    explanation_status: Literal['ready', 'skipped', 'deferred'] = 'ready'
     timestamp: datetime = Field(default_factory=datetime.now)
+
+class TransactionExplanation(BaseModel):
+    transaction_id: str
+    status: Literal['ready', 'pending']
+    explanation: List[ExplanationItem] = []
@@ -0,0 +1,327 @@
+import asyncio
+import bisect
+import json
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from backend.app.db.explanations import feature_catalog, unpack_explanation
+from backend.app.db.session import SessionLocal
+from backend.app.models.analytics import TransactionRollup
+from backend.app.models.transaction import Transaction
+
+BUCKET = timedelta(hours=1)
+
+# Fixed histogram bucket edges; the last amount bucket is open-ended
+RISK_SCORE_EDGES = [round(i / 10, 1) for i in range(11)]
+AMOUNT_EDGES = [0, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+# Persisted risk level -> model verdict (inverse of analyze.RISK_LEVEL_MAP)
+VERDICT_BY_RISK_LEVEL = {"LOW": "ALLOW", "HIGH": "REVIEW", "CRITICAL": "DENY"}
+
+
+def bucket_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _risk_score_bin(score: float) -> int:
+    # 10 equal bins over [0, 1]; a score of exactly 1.0 belongs to the last one
+    return min(int(score * 10), 9)
+
+
+def _amount_bin(amount: float) -> int:
+    return max(bisect.bisect_right(AMOUNT_EDGES, amount) - 1, 0)
+
+
+# Per-feature attribution counters, indexes into the lists stored per feature id
+TOP_COUNT, COUNT, IMPACT_SUM, ABS_IMPACT_SUM = range(4)
+
+
+class RollupCounters:
+    """Counters, sums and histograms of one hour bucket. Mergeable, so buckets can be built up incrementally."""
+    __slots__ = ("total", "flagged", "verdicts", "amount_sum", "risk_score_sum", "risk_score_histogram", "amount_histogram",
+                 "features")
+
+    def __init__(self):
+        self.total = 0
+        self.flagged = 0
+        self.verdicts = {"ALLOW": 0, "REVIEW": 0, "DENY": 0}
+        self.amount_sum = 0.0
+        self.risk_score_sum = 0.0
+        self.risk_score_histogram = [0] * (len(RISK_SCORE_EDGES) - 1)
+        self.amount_histogram = [0] * len(AMOUNT_EDGES)
+        # Feature id -> [top_count, count, impact_sum, abs_impact_sum] over the explained transactions
+        # of the hour: how often the feature was the strongest factor, how often it was in the top
+        # factors at all, and its summed (signed and absolute) SHAP impact there
+        self.features: Dict[int, List[float]] = {}
+
+    def add(self, transaction: Transaction):
+        self.total += 1
+        self.flagged += int(bool(transaction.is_flagged))
+        verdict = VERDICT_BY_RISK_LEVEL.get(transaction.risk_level)
+        if verdict:
+            self.verdicts[verdict] += 1
+        self.amount_sum += transaction.amount
+        self.risk_score_sum += transaction.risk_score
+        self.risk_score_histogram[_risk_score_bin(transaction.risk_score)] += 1
+        self.amount_histogram[_amount_bin(transaction.amount)] += 1
+        if transaction.explanation:
+            self.add_explanation(transaction.explanation)
+
+    def add_explanation(self, explanation: bytes):
+        """Counts one stored explanation (see backend/app/db/explanations.py)."""
+        for rank, (feature, impact, _) in enumerate(unpack_explanation(explanation).tolist()):
+            counters = self.features.get(feature)
+            if counters is None:
+                counters = self.features[feature] = [0, 0, 0.0, 0.0]
+            counters[TOP_COUNT] += rank == 0
+            counters[COUNT] += 1
+            counters[IMPACT_SUM] += impact
+            counters[ABS_IMPACT_SUM] += abs(impact)
+
+    @property
+    def explained(self) -> int:
+        # Every explanation has exactly one top factor
+        return sum(counters[TOP_COUNT] for counters in self.features.values())
+
+    def merge(self, other: "RollupCounters"):
+        self.total += other.total
+        self.flagged += other.flagged
+        for verdict, count in other.verdicts.items():
+            self.verdicts[verdict] += count
+        self.amount_sum += other.amount_sum
+        self.risk_score_sum += other.risk_score_sum
+        self.risk_score_histogram = [a + b for a, b in zip(self.risk_score_histogram, other.risk_score_histogram)]
+        self.amount_histogram = [a + b for a, b in zip(self.amount_histogram, other.amount_histogram)]
+        for feature, counters in other.features.items():
+            mine = self.features.get(feature)
+            if mine is None:
+                self.features[feature] = list(counters)
+            else:
+                self.features[feature] = [a + b for a, b in zip(mine, counters)]
+
+    @classmethod
+    def from_row(cls, row: TransactionRollup) -> "RollupCounters":
+        counters = cls()
+        counters.total = row.total
+        counters.flagged = row.flagged
+        counters.verdicts = {"ALLOW": row.allow_count, "REVIEW": row.review_count, "DENY": row.deny_count}
+        counters.amount_sum = row.amount_sum
+        counters.risk_score_sum = row.risk_score_sum
+        counters.risk_score_histogram = json.loads(row.risk_score_histogram)
+        counters.amount_histogram = json.loads(row.amount_histogram)
+        # NULL on the rows of hours rolled up before explanations were counted
+        counters.features = {int(feature): values for feature, values in json.loads(row.feature_attribution or "{}").items()}
+        return counters
+
+    def apply_to(self, row: TransactionRollup):
+        row.total = self.total
+        row.flagged = self.flagged
+        row.allow_count = self.verdicts["ALLOW"]
+        row.review_count = self.verdicts["REVIEW"]
+        row.deny_count = self.verdicts["DENY"]
+        row.amount_sum = self.amount_sum
+        row.risk_score_sum = self.risk_score_sum
+        row.risk_score_histogram = json.dumps(self.risk_score_histogram)
+        row.amount_histogram = json.dumps(self.amount_histogram)
+        row.feature_attribution = json.dumps(self.features)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "flagged": self.flagged,
+            "by_verdict": dict(self.verdicts),
+            "fraud_rate": round(self.verdicts["DENY"] / self.total, 6) if self.total else 0.0,
+            "flagged_rate": round(self.flagged / self.total, 6) if self.total else 0.0,
+            "amount_sum": self.amount_sum,
+            "avg_amount": self.amount_sum / self.total if self.total else 0.0,
+            "avg_risk_score": self.risk_score_sum / self.total if self.total else 0.0,
+        }
+
+
+class AnalyticsAggregator:
+    """
+    Incremental hourly rollups of scored transactions for the dashboards.
+
+    /analyze records every scored row here (in memory, O(1) per row); a background task merges
+    the accumulated deltas into the transaction_rollups table every `flush_interval_seconds` and
+    on shutdown. Queries read one rollup row per hour plus this process' unflushed deltas, so
+    they cost O(buckets) however many transactions were scored.
+    """
+    def __init__(self, flush_interval_seconds: float = 10, session_factory: Callable = SessionLocal):
+        self.flush_interval = flush_interval_seconds
+        self.session_factory = session_factory
+        self._pending: Dict[datetime, RollupCounters] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task = None
+        self.recorded = 0
+        self.flushes = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(self, transactions: Iterable[Transaction]):
+        for transaction in transactions:
+            bucket = bucket_start(transaction.timestamp)
+            counters = self._pending.get(bucket)
+            if counters is None:
+                counters = self._pending[bucket] = RollupCounters()
+            counters.add(transaction)
+            self.recorded += 1
+
+    def record_explanations(self, explanations: Iterable[Tuple[datetime, bytes]]):
+        """Counts explanations stored after their transaction was recorded: (transaction timestamp, explanation)."""
+        for timestamp, explanation in explanations:
+            bucket = bucket_start(timestamp)
+            counters = self._pending.get(bucket)
+            if counters is None:
+                counters = self._pending[bucket] = RollupCounters()
+            counters.add_explanation(explanation)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Analytics Flush Error: {e}")
+
+    async def flush(self):
+        """Merges the deltas recorded so far into the rollup table."""
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                async with self.session_factory() as db:
+                    # Row locks keep concurrent flushes from several API workers from losing updates.
+                    # Two workers creating the same new bucket collide on the primary key; the loser
+                    # keeps its deltas and merges them into the existing row on its next flush.
+                    result = await db.execute(
+                        select(TransactionRollup)
+                        .where(TransactionRollup.bucket_start.in_(list(pending)))
+                        .with_for_update()
+                    )
+                    rows = {row.bucket_start: row for row in result.scalars().all()}
+                    for bucket, delta in pending.items():
+                        row = rows.get(bucket)
+                        if row is None:
+                            row = TransactionRollup(bucket_start=bucket)
+                            db.add(row)
+                            merged = delta
+                        else:
+                            merged = RollupCounters.from_row(row)
+                            merged.merge(delta)
+                        merged.apply_to(row)
+                    await db.commit()
+            except Exception:
+                # Keep the deltas for the next attempt
+                for bucket, delta in pending.items():
+                    self._pending.setdefault(bucket, RollupCounters()).merge(delta)
+                raise
+            self.flushes += 1
+
+    async def _buckets(self, first_bucket: datetime, end_time: datetime, feature_names: Optional[Dict[int, str]] = None
+                       ) -> Dict[datetime, RollupCounters]:
+        """Stored rollups merged with this process' unflushed deltas, for the buckets in [first_bucket, end_time)."""
+        async with self._lock:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(TransactionRollup)
+                    .where(TransactionRollup.bucket_start >= first_bucket)
+                    .where(TransactionRollup.bucket_start < end_time)
+                    .order_by(TransactionRollup.bucket_start)
+                )
+                buckets = {row.bucket_start: RollupCounters.from_row(row) for row in result.scalars().all()}
+                # Not yet flushed deltas of this process
+                for bucket, delta in self._pending.items():
+                    if first_bucket <= bucket < end_time:
+                        buckets.setdefault(bucket, RollupCounters()).merge(delta)
+                if feature_names is not None:
+                    ids = {feature for counters in buckets.values() for feature in counters.features}
+                    feature_names.update(await feature_catalog(db).lookup(db, ids))
+        return buckets
+
+    async def summarize(self, start_time: datetime, end_time: datetime) -> Dict[str, Any]:
+        """Hourly series, totals and histograms for the hours overlapping [start_time, end_time)."""
+        first_bucket = bucket_start(start_time)
+        buckets = await self._buckets(first_bucket, end_time)
+
+        totals = RollupCounters()
+        hourly: List[Dict[str, Any]] = []
+        for bucket in sorted(buckets):
+            totals.merge(buckets[bucket])
+            hourly.append({"bucket_start": bucket, **buckets[bucket].summary()})
+        return {
+            "start_time": first_bucket,
+            "end_time": end_time,
+            "bucket_seconds": int(BUCKET.total_seconds()),
+            "totals": totals.summary(),
+            "hourly": hourly,
+            "risk_score_histogram": {"edges": RISK_SCORE_EDGES, "counts": totals.risk_score_histogram},
+            "amount_histogram": {"edges": AMOUNT_EDGES, "counts": totals.amount_histogram},
+        }
+
+    async def feature_attribution(self, start_time: datetime, end_time: datetime) -> Dict[str, Any]:
+        """
+        Which features drive the explanations of the hours overlapping [start_time, end_time):
+        per feature totals (strongest first) and the top-factor counts of every hour.
+        """
+        first_bucket = bucket_start(start_time)
+        names: Dict[int, str] = {}
+        buckets = await self._buckets(first_bucket, end_time, feature_names=names)
+
+        totals = RollupCounters()
+        hourly: List[Dict[str, Any]] = []
+        for bucket in sorted(buckets):
+            counters = buckets[bucket]
+            totals.merge(counters)
+            hourly.append({
+                "bucket_start": bucket,
+                "explained": counters.explained,
+                "top_features": {
+                    names.get(feature, f"feature_{feature}"): values[TOP_COUNT]
+                    for feature, values in sorted(counters.features.items(), key=lambda item: -item[1][TOP_COUNT])
+                    if values[TOP_COUNT]
+                },
+            })
+        explained = totals.explained
+        features = [
+            {
+                "feature": names.get(feature, f"feature_{feature}"),
+                "top_count": values[TOP_COUNT],
+                "top_share": round(values[TOP_COUNT] / explained, 6) if explained else 0.0,
+                "count": values[COUNT],
+                "mean_impact": values[IMPACT_SUM] / values[COUNT],
+                "mean_abs_impact": values[ABS_IMPACT_SUM] / values[COUNT],
+            }
+            for feature, values in totals.features.items()
+        ]
+        features.sort(key=lambda item: (-item["top_count"], -item["mean_abs_impact"]))
+        return {
+            "start_time": first_bucket,
+            "end_time": end_time,
+            "bucket_seconds": int(BUCKET.total_seconds()),
+            "explained": explained,
+            "features": features,
+            "hourly": hourly,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_buckets": len(self._pending),
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+        }
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Callable, Optional
+
+from backend.ml_engine.predictor import FraudPredictor
+
+
+class VelocityCheckpointer:
+    """
+    Periodically snapshots the predictor's velocity feature store to Redis, and restores the
+    last snapshot at startup, so per-account velocity survives restarts and deploys.
+    Only meaningful for the thread executor: process workers each keep their own store.
+    `get_predictor` returns the predictor currently serving (it changes on a model reload).
+    """
+    def __init__(self, get_predictor: Callable[[], FraudPredictor], redis_url: str, interval_seconds: float = 60):
+        self.get_predictor = get_predictor
+        self.redis_url = redis_url
+        self.interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.checkpoints = 0
+        self.errors = 0
+
+    async def start(self):
+        try:
+            predictor = self.get_predictor()
+            if await asyncio.to_thread(predictor.restore_velocity, self.redis_url):
+                print(f"Velocity: restored {predictor.velocity_stats()['keys']} keys from Redis")
+        except Exception as e:
+            self.errors += 1
+            print(f"Velocity Restore Error: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.checkpoint()
+
+    async def checkpoint(self):
+        try:
+            # Snapshotting copies the state array: keep it off the event loop
+            if await asyncio.to_thread(self.get_predictor().checkpoint_velocity, self.redis_url):
+                self.checkpoints += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Velocity Checkpoint Error: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.checkpoint()
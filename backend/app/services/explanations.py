@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+
+from backend.app.db.explanations import explanation_columns
+from backend.app.db.session import SessionLocal
+from backend.app.models.transaction import Transaction
+
+
+class ExplanationWorker:
+    """
+    Background SHAP worker for the "deferred" explanation policy.
+    /analyze returns the verdict straight away and queues the transaction here with the model input
+    it was scored with; the worker explains queued inputs in batches on the inference executor and
+    stores the explanations in their rows (Transaction.explanation / top_feature).
+    """
+    def __init__(
+        self,
+        get_executor: Callable[[], Any],
+        max_batch: int = 64,
+        max_queue: int = 10000,
+        session_factory: Callable = SessionLocal,
+        flush_pending_writes: Optional[Callable[[], Awaitable[None]]] = None,
+        on_explained: Optional[Callable[[Iterable[Tuple[datetime, bytes]]], None]] = None
+    ):
+        self.get_executor = get_executor
+        # Rows may still sit in the write-behind buffer; they must be in the table before the UPDATE
+        self.flush_pending_writes = flush_pending_writes
+        # Told (transaction timestamp, stored explanation) of every explained transaction, e.g. by the analytics rollups
+        self.on_explained = on_explained
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.pending: Set[str] = set()
+        self.dropped = 0
+        self.completed = 0
+        self._task: asyncio.Task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Explains everything still queued, then stops the worker."""
+        if self._task is None:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def submit(self, transaction_id: str, model_input: bytes, timestamp: datetime) -> bool:
+        """
+        Queues a scored transaction (its packed model input and the timestamp of its row) for explanation.
+        Returns False if the queue is full.
+        """
+        try:
+            self.queue.put_nowait((transaction_id, model_input, timestamp))
+        except asyncio.QueueFull:
+            # The explanation can still be computed on demand by the explanation endpoint
+            self.dropped += 1
+            return False
+        self.pending.add(transaction_id)
+        return True
+
+    def is_pending(self, transaction_id: str) -> bool:
+        return transaction_id in self.pending
+
+    async def _run(self):
+        while True:
+            batch: List[Tuple[str, bytes, datetime]] = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._explain_batch(batch)
+            except Exception as e:
+                print(f"Explanation Worker Error: {e}")
+            finally:
+                for transaction_id, _, _ in batch:
+                    self.pending.discard(transaction_id)
+                    self.queue.task_done()
+
+    async def _explain_batch(self, batch: List[Tuple[str, bytes, datetime]]):
+        # SHAP is CPU bound: run it on the inference executor. Background work waits for a
+        # worker instead of being shed like request traffic. The inputs are explained as they were
+        # scored: transforming the transactions again would see velocity state that includes them.
+        explanations = await self.get_executor().run(
+            "explain_model_inputs", [model_input for _, model_input, _ in batch], reject_when_full=False
+        )
+        if self.flush_pending_writes:
+            await self.flush_pending_writes()
+        async with self.session_factory() as db:
+            columns = await explanation_columns(db, explanations)
+            await db.execute(
+                update(Transaction),
+                [{"id": transaction_id, **values, "model_input": None}
+                 for (transaction_id, _, _), values in zip(batch, columns)]
+            )
+            await db.commit()
+        self.completed += len(batch)
+        if self.on_explained:
+            self.on_explained([(timestamp, values["explanation"]) for (_, _, timestamp), values in zip(batch, columns)])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "pending": len(self.pending),
+            "completed": self.completed,
+            "dropped": self.dropped
+        }
@@ -0,0 +1,162 @@
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Optional
+
+from backend.app.core.metrics import metrics
+from backend.ml_engine import timing
+from backend.ml_engine.predictor import FraudPredictor
+
+EXECUTOR_KINDS = ("thread", "process")
+
+# Calls whose first argument is a list (or record array) of transactions (its length goes into the batch size histogram)
+_BATCH_METHODS = {"predict_batch": "predict", "predict_records": "predict", "explain_transactions": "explain",
+                  "explain_model_inputs": "explain"}
+
+
+class InferenceBacklogFull(Exception):
+    """Raised when too many inference calls are already waiting for a worker."""
+
+
+# Each process-pool worker loads its own predictor exactly once (see _init_worker)
+_worker_predictor: Optional[FraudPredictor] = None
+
+
+def _init_worker(predictor_kwargs: Dict[str, Any]):
+    global _worker_predictor
+    _worker_predictor = FraudPredictor(**predictor_kwargs)
+    _worker_predictor.load_models()
+
+
+def _call_in_process(method: str, args: tuple, submitted_at: float):
+    # time.time() (not perf_counter) so the wait is comparable across processes
+    waited = time.time() - submitted_at
+    if method == "ping":
+        return None, waited, []
+    with timing.collect() as timings:
+        result = getattr(_worker_predictor, method)(*args)
+    return result, waited, timings
+
+
+def _call_in_thread(predictor: FraudPredictor, method: str, args: tuple, submitted_at: float):
+    waited = time.time() - submitted_at
+    with timing.collect() as timings:
+        result = getattr(predictor, method)(*args)
+    return result, waited, timings
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound FraudPredictor calls (pandas, tree scoring, SHAP) outside the asyncio event loop.
+
+    kind="thread"  - a thread pool sharing the already loaded predictor
+    kind="process" - a process pool; every worker process loads the models once at startup
+
+    Calls beyond `max_backlog` in flight are rejected with InferenceBacklogFull (mapped to 503).
+    """
+    def __init__(
+        self,
+        predictor: FraudPredictor,
+        kind: str = "thread",
+        workers: int = 4,
+        max_backlog: int = 256,
+        predictor_kwargs: Optional[Dict[str, Any]] = None
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', expected one of {EXECUTOR_KINDS}")
+        self.predictor = predictor
+        self.kind = kind
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self.predictor_kwargs = predictor_kwargs or {}
+        self.pool: Executor = self._create_pool()
+        self.in_flight = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        self.recent_waits = deque(maxlen=1000)
+
+    def _create_pool(self) -> Executor:
+        if self.kind == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        # spawn (not fork): the parent already runs an event loop and threads
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.predictor_kwargs,)
+        )
+
+    async def start(self):
+        """Brings every worker up front, so process workers load their models before traffic arrives."""
+        if self.kind == "process":
+            await asyncio.gather(*[self.run("ping", reject_when_full=False) for _ in range(self.workers)])
+            # Model loading time is not queueing time
+            self._reset_stats()
+
+    async def run(self, method: str, *args: Any, reject_when_full: bool = True) -> Any:
+        """Runs predictor.<method>(*args) on a worker and returns its result."""
+        if reject_when_full and self.in_flight >= self.max_backlog:
+            self.rejected += 1
+            raise InferenceBacklogFull(f"{self.in_flight} inference calls already in flight")
+
+        self.in_flight += 1
+        self.submitted += 1
+        submitted_at = time.time()
+        try:
+            if self.kind == "thread":
+                call = partial(_call_in_thread, self.predictor, method, args, submitted_at)
+            else:
+                call = partial(_call_in_process, method, args, submitted_at)
+            try:
+                result, waited, timings = await asyncio.get_running_loop().run_in_executor(self.pool, call)
+            except Exception:
+                # Failed calls report no wait, so they stay out of the wait averages
+                self.failed += 1
+                raise
+            self.completed += 1
+            self._record_wait(waited)
+            if method != "ping":
+                metrics.observe_stage("queue_wait", waited)
+                metrics.observe_stages(timings)
+            if method in _BATCH_METHODS:
+                metrics.observe_batch(_BATCH_METHODS[method], len(args[0]))
+            return result
+        finally:
+            self.in_flight -= 1
+
+    def _record_wait(self, waited: float):
+        # Only touched from the event loop thread, so no locking needed
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.recent_waits.append(waited)
+
+    def shutdown(self, wait: bool = True):
+        self.pool.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        recent = sorted(self.recent_waits)
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            # Calls beyond the worker count are waiting in the pool's queue
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "max_backlog": self.max_backlog,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 3) if self.completed else 0.0,
+            "p99_wait_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000, 3) if recent else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
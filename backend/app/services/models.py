@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from backend.app.services.inference import InferenceExecutor
+from backend.ml_engine.loader import ModelRegistry
+from backend.ml_engine.predictor import FraudPredictor
+
+# Scored once by every freshly loaded version before it takes traffic
+WARMUP_TRANSACTION = {
+    "amount": 100.0,
+    "oldbalanceOrg": 1000.0,
+    "newbalanceOrig": 900.0,
+    "oldbalanceDest": 0.0,
+    "newbalanceDest": 100.0,
+    "type": "PAYMENT",
+}
+
+
+class ModelReloadInProgress(Exception):
+    """Raised when a reload is requested while another one is still loading."""
+
+
+class ModelManager:
+    """
+    Serves one model version from the registry at a time and hot-swaps to another without downtime.
+
+    A reload builds the new predictor and its own inference executor next to the running ones,
+    verifies the artifacts, loads and warms them up (process workers load their copy during
+    executor.start()). Only then is the pair swapped in, in a single step on the event loop via
+    `on_swap`. Calls already submitted to the old executor finish on the old models; its pool
+    is shut down in the background once they are done.
+
+    `shadow_versions` are loaded with every activation and attached to the serving predictor
+    as shadow models (see services/shadow.py); the version being served is never its own shadow.
+    """
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        predictor_kwargs: Dict[str, Any],
+        executor_kwargs: Dict[str, Any],
+        on_swap: Callable[[FraudPredictor, InferenceExecutor], None],
+        shadow_versions: List[str] = ()
+    ):
+        self.registry = registry
+        self.predictor_kwargs = predictor_kwargs
+        self.executor_kwargs = executor_kwargs
+        self.on_swap = on_swap
+        self.shadow_versions = list(shadow_versions)
+        self.active_version: Optional[str] = None
+        self.predictor: Optional[FraudPredictor] = None
+        self.executor: Optional[InferenceExecutor] = None
+        self.reload_status: Dict[str, Any] = {"state": "idle", "version": None, "error": None,
+                                              "started_at": None, "finished_at": None}
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def activate(self, version: Optional[str] = None) -> str:
+        """Loads `version` (latest when None), swaps it in and returns its name."""
+        async with self._lock:
+            version = self.registry.resolve(version)
+            self._mark_loading(version)
+            try:
+                predictor, executor = await self._load(version)
+            except Exception as e:
+                self.reload_status.update(state="failed", error=str(e), finished_at=datetime.now())
+                raise
+
+            old_predictor, old_executor = self.predictor, self.executor
+            self._carry_over_velocity(old_predictor, predictor)
+            # The swap itself: no awaits from here to on_swap, so every request sees either pair
+            self.predictor, self.executor, self.active_version = predictor, executor, version
+            self.on_swap(predictor, executor)
+            self.reload_status.update(state="ready", finished_at=datetime.now())
+
+            if old_executor:
+                # shutdown(wait=True) returns once the calls already running on the old models are done
+                self._spawn(asyncio.to_thread(old_executor.shutdown, True))
+            return version
+
+    def reload_in_background(self, version: Optional[str] = None) -> str:
+        """
+        Starts activating `version` without waiting for it. Returns the resolved version.
+        Raises ValueError for unknown versions and ModelReloadInProgress if a reload is running.
+        """
+        version = self.registry.resolve(version)
+        if self.reload_status["state"] == "loading":
+            raise ModelReloadInProgress(f"Already loading {self.reload_status['version']}")
+        # Marked right away so a second request in the same tick is refused too
+        self._mark_loading(version)
+        self._spawn(self._activate_quietly(version))
+        return version
+
+    def _mark_loading(self, version: str):
+        self.reload_status = {"state": "loading", "version": version, "error": None,
+                              "started_at": datetime.now(), "finished_at": None}
+
+    async def _activate_quietly(self, version: str):
+        try:
+            await self.activate(version)
+            print(f"Models: now serving {version}")
+        except Exception as e:
+            # Keep serving the current version; the failure is visible in status()
+            print(f"Model Reload Error ({version}): {e}")
+
+    async def _load(self, version: str):
+        await asyncio.to_thread(self.registry.verify, version)
+        predictor_kwargs = dict(self.predictor_kwargs, model_dir=self.registry.path(version))
+        predictor = FraudPredictor(**predictor_kwargs)
+        await asyncio.to_thread(predictor.load_models)
+        await asyncio.to_thread(predictor.predict_batch, [WARMUP_TRANSACTION])
+        for shadow_version in self.shadow_versions:
+            if shadow_version != version:
+                await self._attach_shadow(predictor, shadow_version)
+
+        executor = InferenceExecutor(predictor, predictor_kwargs=predictor_kwargs, **self.executor_kwargs)
+        try:
+            await executor.start()
+        except Exception:
+            executor.shutdown(wait=False)
+            raise
+        return predictor, executor
+
+    async def _attach_shadow(self, predictor: FraudPredictor, version: str):
+        # A broken candidate must not keep the primary model from loading
+        try:
+            await asyncio.to_thread(self.registry.verify, version)
+            # Shadows only score: SHAP is never computed for them
+            shadow = FraudPredictor(**dict(self.predictor_kwargs, model_dir=self.registry.path(version),
+                                           explanation_policy="deferred"))
+            await asyncio.to_thread(shadow.load_models)
+            await asyncio.to_thread(shadow.predict_batch, [WARMUP_TRANSACTION])
+        except Exception as e:
+            print(f"Models: shadow {version} not loaded ({e})")
+            return
+        predictor.add_shadow(version, shadow)
+
+    @staticmethod
+    def _carry_over_velocity(old: Optional[FraudPredictor], new: FraudPredictor):
+        """
+        Hands the per-account velocity state to the new models (and to shadows loaded again) when both
+        track the same key over the same windows. The store is shared rather than copied, so the
+        transactions still finishing on the old models after the swap are counted too.
+        """
+        if old is None:
+            return
+        pairs = [(old, new)] + [(old.shadows[version], shadow) for version, shadow in new.shadows.items()
+                                if version in old.shadows]
+        for source, target in pairs:
+            store, replaced = source.preprocessor.velocity, target.preprocessor.velocity
+            if store is None or replaced is None:
+                continue
+            # Feature order follows the windows' order, so that has to match too
+            if (list(store.windows.items()) != list(replaced.windows.items())
+                    or source.preprocessor.velocity_key != target.preprocessor.velocity_key):
+                print(f"Models: velocity state not carried over (windows {store.windows} keyed by "
+                      f"{source.preprocessor.velocity_key}, new models use {replaced.windows} keyed by "
+                      f"{target.preprocessor.velocity_key})")
+                continue
+            target.preprocessor.velocity = store
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Waits for background reloads and retirements, then stops the active executor."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.executor:
+            self.executor.shutdown()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "active_version": self.active_version,
+            "shadow_versions": list(self.predictor.shadows) if self.predictor else [],
+            "available_versions": self.registry.versions(),
+            "reload": self.reload_status,
+        }
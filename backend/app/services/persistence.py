@@ -0,0 +1,351 @@
+import asyncio
+import base64
+import glob
+import json
+import os
+import re
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, LargeBinary, inspect
+from sqlalchemy.exc import DataError, IntegrityError
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): every spill file is treated as left over from a dead process
+    fcntl = None
+
+from backend.app.core.metrics import metrics
+from backend.app.db.bulk import bulk_insert_transactions
+from backend.app.db.session import SessionLocal
+from backend.app.models.transaction import Transaction
+
+# Columns that need converting back from their JSON (ISO string / base64) form when replaying the spill file
+_DATETIME_COLUMNS = [c.key for c in Transaction.__table__.columns if isinstance(c.type, DateTime)]
+_BINARY_COLUMNS = [c.key for c in Transaction.__table__.columns if isinstance(c.type, LargeBinary)]
+_COLUMN_KEYS = [attr.key for attr in inspect(Transaction).column_attrs]
+
+
+class WriteBufferFull(Exception):
+    """Raised when max_buffered rows are already waiting for the database."""
+
+
+def _rejected_by_database(error: Exception) -> bool:
+    """Whether an insert failed because of the rows themselves (constraint violations, invalid values)."""
+    if isinstance(error, (IntegrityError, DataError)):
+        return True
+    try:
+        # COPY goes through asyncpg directly, so its errors are not wrapped by SQLAlchemy
+        from asyncpg.exceptions import DataError as PgDataError, IntegrityConstraintViolationError
+    except ImportError:
+        return False
+    return isinstance(error, (IntegrityConstraintViolationError, PgDataError))
+
+
+def transaction_to_row(transaction: Transaction) -> Dict[str, Any]:
+    """Plain column -> value mapping of a Transaction, ready for a bulk insert."""
+    return {key: getattr(transaction, key) for key in _COLUMN_KEYS}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    return str(value)
+
+
+def _encode(row: Dict[str, Any]) -> str:
+    return json.dumps(row, default=_json_default)
+
+
+def _decode(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    for key in _DATETIME_COLUMNS:
+        if row.get(key):
+            row[key] = datetime.fromisoformat(row[key])
+    for key in _BINARY_COLUMNS:
+        if row.get(key) is not None:
+            row[key] = base64.b64decode(row[key])
+    return row
+
+
+class WriteBehindBuffer:
+    """
+    Moves transaction persistence off the /analyze critical path.
+
+    Scored rows are appended to a local spill file (so they survive a crash or restart) and kept
+    in memory; a background task bulk-inserts them when `max_batch` rows are waiting or every
+    `flush_interval_ms`. Each flush rotates the spill file into a segment that is deleted once its
+    rows are committed; leftover segments are replayed on the next start. Replays ignore rows that
+    already made it into the database, so a crash between commit and cleanup is harmless.
+
+    Every process (uvicorn worker) spills to its own files, named after its pid and guarded by a
+    lock file it holds while running. On start, a worker replays the files of processes whose
+    lock is free (they exited), under a lock on the spill directory so that no two workers claim
+    the same files. Rows the database rejects (e.g. a duplicate id) are moved to the dead-letter
+    file instead of failing every later flush, and add() refuses rows beyond `max_buffered`.
+    """
+    def __init__(
+        self,
+        spill_path: str,
+        max_batch: int = 500,
+        flush_interval_ms: float = 200,
+        fsync: bool = False,
+        session_factory: Callable = SessionLocal,
+        max_buffered: int = 100_000,
+        dead_letter_path: Optional[str] = None
+    ):
+        self.spill_root, self.spill_ext = os.path.splitext(spill_path)
+        self.spill_dir = os.path.dirname(os.path.abspath(spill_path))
+        # This process's own spill file, e.g. write_behind/transactions.1234.jsonl
+        self.spill_path = self._owner_spill(os.getpid())
+        self.dead_letter_path = dead_letter_path or f"{self.spill_root}.dead_letter{self.spill_ext}"
+        self.max_batch = max_batch
+        self.max_buffered = max_buffered
+        self.flush_interval = flush_interval_ms / 1000
+        self.fsync = fsync
+        self.session_factory = session_factory
+
+        self._rows: List[Dict[str, Any]] = []
+        self._segments: List[str] = []  # Rotated spill files whose rows are not committed yet
+        self._segment_seq = 0
+        self._spill = None
+        self._owner_lock = None
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task = None
+
+        # Stats
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.replayed_rows = 0
+        self.dead_lettered_rows = 0
+        self.rejected_adds = 0
+
+    async def start(self):
+        """Replays rows left over by exited processes, then starts the background flusher."""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # Held until close(): while it is, no other worker replays (and deletes) this process's files
+        self._owner_lock = _try_lock(self._owner_spill(os.getpid(), ".lock"))
+        await self._replay()
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stops the flusher and drains everything still buffered."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+        # Nothing left to replay unless the final flush failed
+        if not self._rows and os.path.exists(self.spill_path) and os.path.getsize(self.spill_path) == 0:
+            os.remove(self.spill_path)
+        if self._owner_lock:
+            _unlock(self._owner_lock, remove=True)
+            self._owner_lock = None
+
+    def add(self, transactions: List[Transaction]):
+        """Queues scored rows for insertion. Returns immediately; rows hit the database on the next flush."""
+        if len(self._rows) + len(transactions) > self.max_buffered:
+            # The database has been failing (or falling behind) for a while: push back on callers
+            self.rejected_adds += 1
+            raise WriteBufferFull(f"{len(self._rows)} rows already waiting for the database")
+        rows = [transaction_to_row(t) for t in transactions]
+        self._spill.write("".join(_encode(row) + "\n" for row in rows))
+        self._spill.flush()
+        if self.fsync:
+            os.fsync(self._spill.fileno())
+        self._rows.extend(rows)
+        if len(self._rows) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Commits every row buffered so far. Once it returns, earlier add() calls are in the database."""
+        async with self._lock:
+            if not self._rows:
+                return
+            rows, self._rows = self._rows, []
+            self._segments.append(self._rotate_spill())
+            with metrics.time("db_commit"):
+                left, error = await self._insert_isolating(rows)
+            if error is not None:
+                # Keep the rows not committed yet (and their segment files) for the next attempt
+                print(f"Write-Behind Flush Error: {error}")
+                self._rows = left + self._rows
+                self.failed_flushes += 1
+                return
+            for segment in self._segments:
+                os.remove(segment)
+            self._segments = []
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            metrics.observe_batch("write_behind", len(rows))
+
+    def _owner_spill(self, pid: Any, ext: Optional[str] = None) -> str:
+        return f"{self.spill_root}.{pid}{self.spill_ext if ext is None else ext}"
+
+    def _rotate_spill(self) -> str:
+        """Moves the current spill file aside as a segment and starts a fresh one."""
+        self._segment_seq += 1
+        segment = f"{self.spill_path}.{self._segment_seq}.segment"
+        if self._spill:
+            self._spill.close()
+        os.replace(self.spill_path, segment)
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+        return segment
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _leftover_files(self) -> Dict[str, List[str]]:
+        """Spill files and segments on disk, grouped by the pid of the process that wrote them."""
+        name, ext = re.escape(os.path.basename(self.spill_root)), re.escape(self.spill_ext)
+        pattern = re.compile(name + r"\.(\d+)" + ext + r"(?:\.(\d+)\.segment)?$")
+        # The single spill file shared by all workers in earlier versions (owner "")
+        shared = re.compile(r"()" + name + ext + r"(?:\.\d+\.(\d+)\.segment)?$")
+        owners: Dict[str, List[Tuple[float, str]]] = {}
+        for path in glob.glob(f"{glob.escape(self.spill_root)}.*"):
+            match = pattern.match(os.path.basename(path)) or shared.match(os.path.basename(path))
+            if match:
+                # Segments in rotation order, then the live spill file
+                seq = int(match.group(2)) if match.group(2) else float("inf")
+                owners.setdefault(match.group(1), []).append((seq, path))
+        return {pid: [path for _, path in sorted(files)] for pid, files in owners.items()}
+
+    async def _replay(self):
+        directory_lock = _lock_directory(self.spill_dir)
+        try:
+            for pid, files in self._leftover_files().items():
+                own = pid == str(os.getpid())
+                # Own files are left over by an earlier process with the same pid (this one holds the lock)
+                owner_lock = None if own or not pid else _try_lock(self._owner_spill(pid, ".lock"))
+                if owner_lock is False:
+                    continue  # Still running
+                try:
+                    await self._replay_files(files)
+                finally:
+                    if owner_lock:
+                        _unlock(owner_lock, remove=True)
+        finally:
+            _unlock(directory_lock)
+
+    async def _replay_files(self, files: List[str]):
+        rows = []
+        for path in list(files):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    rows.extend(_decode(line) for line in f if line.strip())
+            except FileNotFoundError:
+                # Its owner flushed and removed it while shutting down
+                files.remove(path)
+        if rows:
+            print(f"Write-Behind: replaying {len(rows)} rows from {len(files)} spill file(s)")
+            for start in range(0, len(rows), self.max_batch):
+                _, error = await self._insert_isolating(rows[start:start + self.max_batch], ignore_existing=True)
+                if error is not None:
+                    raise error
+            self.replayed_rows += len(rows)
+        for path in files:
+            os.remove(path)
+
+    async def _insert_isolating(
+        self, rows: List[Dict[str, Any]], ignore_existing: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[Exception]]:
+        """
+        Inserts the rows, bisecting a chunk the database rejects until the offending rows are found
+        and dead-lettered; the others are committed. Any other error (e.g. the database is down)
+        stops it: returns (rows not committed yet, error), or ([], None) once everything is handled.
+        """
+        pending = deque([rows])
+        while pending:
+            chunk = pending.popleft()
+            try:
+                await self._insert(chunk, ignore_existing=ignore_existing)
+            except Exception as e:
+                if not _rejected_by_database(e):
+                    return [row for part in [chunk, *pending] for row in part], e
+                if len(chunk) == 1:
+                    self._dead_letter(chunk[0], e)
+                else:
+                    middle = len(chunk) // 2
+                    pending.extendleft([chunk[middle:], chunk[:middle]])
+        return [], None
+
+    def _dead_letter(self, row: Dict[str, Any], error: Exception):
+        print(f"Write-Behind: dead-lettering transaction {row.get('id')}: {error}")
+        line = json.dumps({"error": str(error).splitlines()[0], "row": row}, default=_json_default)
+        # One append per row: lines from several workers do not interleave
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        self.dead_lettered_rows += 1
+
+    async def _insert(self, rows: List[Dict[str, Any]], ignore_existing: bool = False):
+        async with self.session_factory() as db:
+            await bulk_insert_transactions(db, rows, ignore_existing=ignore_existing)
+            await db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._rows),
+            "max_buffered": self.max_buffered,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "replayed_rows": self.replayed_rows,
+            "dead_lettered_rows": self.dead_lettered_rows,
+            "rejected_adds": self.rejected_adds,
+        }
+
+
+def _try_lock(path: str):
+    """
+    Opens and exclusively locks `path` without waiting. Returns the open file, False if another
+    process holds it, None when the platform has no locks.
+    """
+    if fcntl is None:
+        return None
+    f = open(path, "a+")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return False
+    return f
+
+
+def _lock_directory(path: str) -> Optional[int]:
+    """Waits for an exclusive lock on a directory (no lock file that would outlive it)."""
+    if fcntl is None:
+        return None
+    fd = os.open(path, os.O_RDONLY)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+def _unlock(lock: Any, remove: bool = False):
+    if lock is None:
+        return
+    if isinstance(lock, int):
+        os.close(lock)
+        return
+    if remove:
+        # Removed while still locked, so nobody takes a lock on a file that is about to disappear
+        os.remove(lock.name)
+    lock.close()
@@ -0,0 +1,283 @@
+import asyncio
+import glob
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, LargeBinary, delete, func, select, tuple_
+
+from backend.app.db.partitions import add_months, drop_partition, ensure_partitions, month_start
+from backend.app.db.session import SessionLocal
+from backend.app.models.transaction import Transaction
+
+# Archived transactions: one directory per month, one Parquet file per retention run that archived
+# rows of that month, every file in (timestamp, id) order with the table's columns:
+#   <archive path>/transactions/month=2026-01/part-00000.parquet
+# A file is first written as .pending, then exactly the rows it holds are deleted from the database
+# (by id: rows of the month written meanwhile, e.g. replayed from a write-behind spill file, stay for
+# the next run), then it is renamed; a .pending file left by a crash is kept or discarded depending on whether the delete
+# committed (see RetentionJob._recover), so a crash neither loses rows nor archives them twice.
+# Only months that ended more than hot_days ago are archived: rows are no longer written to them.
+
+_TABLE = Transaction.__table__
+_COLUMNS = list(_TABLE.columns)
+COLUMN_NAMES = [column.name for column in _COLUMNS]
+ARCHIVE_DIR = "transactions"
+PENDING_SUFFIX = ".pending"
+# IDs per DELETE statement (bound parameters are capped at 32766 by SQLite and asyncpg)
+DELETE_BATCH_SIZE = 5000
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    def arrow_type(column):
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, LargeBinary):
+            return pa.binary()
+        return pa.string()
+
+    return pa.schema([(column.name, arrow_type(column)) for column in _COLUMNS])
+
+
+def _import_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Transaction archives are Parquet files and need pyarrow (pip install pyarrow)") from e
+    return pq
+
+
+def naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Archives store naive timestamps: aware ones (PostgreSQL timestamptz) are converted to UTC."""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def month_directory(archive_path: str, month: datetime) -> str:
+    return os.path.join(archive_path, ARCHIVE_DIR, f"month={month:%Y-%m}")
+
+
+async def iter_table_rows(session_factory: Callable, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          chunk_size: int = 10_000) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Rows with start <= timestamp < end as plain dicts, oldest first, `chunk_size` per keyset page."""
+    after = None
+    while True:
+        query = select(*_COLUMNS)
+        if start is not None:
+            query = query.where(_TABLE.c.timestamp >= start)
+        if end is not None:
+            query = query.where(_TABLE.c.timestamp < end)
+        if after is not None:
+            query = query.where(tuple_(_TABLE.c.timestamp, _TABLE.c.id) > after)
+        query = query.order_by(_TABLE.c.timestamp, _TABLE.c.id).limit(chunk_size)
+        async with session_factory() as db:
+            rows = [dict(row) for row in (await db.execute(query)).mappings()]
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        after = (rows[-1]["timestamp"], rows[-1]["id"])
+
+
+def _archive_months(archive_path: str) -> List[datetime]:
+    months = []
+    for directory in glob.glob(os.path.join(glob.escape(archive_path), ARCHIVE_DIR, "month=*")):
+        try:
+            months.append(datetime.strptime(os.path.basename(directory), "month=%Y-%m"))
+        except ValueError:
+            continue
+    return sorted(months)
+
+
+def iter_archive(archive_path: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 batch_size: int = 10_000) -> Iterator[List[Dict[str, Any]]]:
+    """Archived rows with start <= timestamp < end, month by month (oldest first), in batches of dicts."""
+    start, end = naive_utc(start), naive_utc(end)
+    months = [month for month in _archive_months(archive_path)
+              if (start is None or add_months(month, 1) > start) and (end is None or month < end)]
+    if not months:
+        return
+    pq = _import_parquet()
+    import pyarrow.compute as pc
+
+    for month in months:
+        for path in sorted(glob.glob(os.path.join(glob.escape(month_directory(archive_path, month)), "part-*.parquet"))):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+                timestamps = batch.column("timestamp")
+                if start is not None:
+                    batch = batch.filter(pc.greater_equal(timestamps, start))
+                    timestamps = batch.column("timestamp")
+                if end is not None:
+                    batch = batch.filter(pc.less(timestamps, end))
+                if batch.num_rows:
+                    yield batch.to_pylist()
+
+
+class RetentionJob:
+    """
+    Hot/cold tiering of the transactions table, run every `interval_seconds` in the background:
+
+    - keeps monthly partitions created `months_ahead` months ahead (PostgreSQL, see db/partitions.py)
+    - moves every month that ended more than `hot_days` days ago to a Parquet archive, deletes the
+      archived rows and drops the emptied partition (PostgreSQL). Archived rows stay readable
+      through iter_archive() and the /transactions/export endpoint.
+
+    hot_days = 0 disables archiving (partitions are still maintained).
+    """
+    def __init__(
+        self,
+        archive_path: str,
+        hot_days: int = 0,
+        interval_seconds: float = 3600,
+        months_ahead: int = 3,
+        chunk_size: int = 50_000,
+        session_factory: Callable = SessionLocal,
+        clock: Callable[[], datetime] = datetime.now
+    ):
+        self.archive_path = archive_path
+        self.hot_days = hot_days
+        self.interval = interval_seconds
+        self.months_ahead = months_ahead
+        self.chunk_size = chunk_size
+        self.session_factory = session_factory
+        self.clock = clock
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task = None
+        self.runs = 0
+        self.errors = 0
+        self.archived_rows = 0
+        self.archived_months = 0
+        self.partitions_created = 0
+        self.last_run: Optional[datetime] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"Retention Error: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """One maintenance pass. Returns the number of rows archived."""
+        async with self._lock:
+            async with self.session_factory() as db:
+                created = await ensure_partitions(await db.connection(), self.months_ahead, now=self.clock())
+                await db.commit()
+            self.partitions_created += len(created)
+
+            archived = 0
+            if self.hot_days > 0:
+                await self._recover()
+                cutoff = month_start(self.clock() - timedelta(days=self.hot_days))
+                async with self.session_factory() as db:
+                    oldest = (await db.execute(select(func.min(Transaction.timestamp)))).scalar()
+                month = month_start(naive_utc(oldest)) if oldest else cutoff
+                while month < cutoff:
+                    archived += await self.archive_month(month)
+                    month = add_months(month, 1)
+            self.runs += 1
+            self.last_run = self.clock()
+            return archived
+
+    async def archive_month(self, month: datetime) -> int:
+        """Writes the month's rows to a new archive part, then removes exactly those rows from the database."""
+        pq = _import_parquet()
+        import pyarrow as pa
+
+        schema = _arrow_schema()
+        end = add_months(month, 1)
+        directory = month_directory(self.archive_path, month)
+        part = os.path.join(directory, f"part-{len(glob.glob(os.path.join(glob.escape(directory), 'part-*.parquet'))):05d}.parquet")
+        pending = part + PENDING_SUFFIX
+
+        rows = 0
+        archived_ids = []
+        writer = None
+        try:
+            async for chunk in iter_table_rows(self.session_factory, month, end, self.chunk_size):
+                for row in chunk:
+                    row["timestamp"] = naive_utc(row["timestamp"])
+                if writer is None:
+                    os.makedirs(directory, exist_ok=True)
+                    writer = pq.ParquetWriter(pending, schema)
+                # Each chunk becomes a row group; the file is never held in memory whole
+                await asyncio.to_thread(writer.write_table, pa.Table.from_pylist(chunk, schema=schema))
+                rows += len(chunk)
+                archived_ids.extend(row["id"] for row in chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        # One transaction: _recover() tells from the part's first row whether the delete committed
+        async with self.session_factory() as db:
+            for first in range(0, len(archived_ids), DELETE_BATCH_SIZE):
+                await db.execute(delete(Transaction).where(
+                    Transaction.id.in_(archived_ids[first:first + DELETE_BATCH_SIZE]),
+                    Transaction.timestamp >= month, Transaction.timestamp < end
+                ))
+            await drop_partition(await db.connection(), month)
+            await db.commit()
+        if rows:
+            os.replace(pending, part)
+            self.archived_rows += rows
+            self.archived_months += 1
+        return rows
+
+    async def _recover(self):
+        """Settles .pending parts left by a run that stopped between writing a part and renaming it."""
+        pq = _import_parquet()
+        import pyarrow as pa
+
+        for pending in glob.glob(os.path.join(glob.escape(self.archive_path), ARCHIVE_DIR, "month=*", "*" + PENDING_SUFFIX)):
+            try:
+                ids = pq.read_table(pending, columns=["id"]).column("id")
+            except (pa.ArrowInvalid, OSError):
+                # Never closed (no footer): the run stopped while writing it, before the delete
+                os.remove(pending)
+                continue
+            if not len(ids):
+                os.remove(pending)
+                continue
+            async with self.session_factory() as db:
+                still_stored = await db.get(Transaction, ids[0].as_py()) is not None
+            if still_stored:
+                # The delete never committed: the rows will be archived again
+                os.remove(pending)
+            else:
+                os.replace(pending, pending[:-len(PENDING_SUFFIX)])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hot_days": self.hot_days,
+            "runs": self.runs,
+            "errors": self.errors,
+            "archived_rows": self.archived_rows,
+            "archived_months": self.archived_months,
+            "partitions_created": self.partitions_created,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
@@ -0,0 +1,262 @@
+import asyncio
+import multiprocessing
+import os
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, insert, select
+
+from backend.app.db.session import SessionLocal
+from backend.app.models.shadow import ShadowScore
+from backend.app.services.inference import EXECUTOR_KINDS
+from backend.ml_engine.predictor import FraudPredictor
+
+# (transaction_id, transaction, primary risk_score, primary verdict,
+#  velocity features of the transaction per shadow version that uses them)
+ShadowItem = Tuple[str, Dict[str, Any], float, str, Dict[str, np.ndarray]]
+
+
+def _shadow_spec(shadow: FraudPredictor) -> Dict[str, Any]:
+    """What a process worker needs to load its own copy of a shadow model."""
+    return {
+        "model_dir": shadow.model_dir,
+        "feature_mode": shadow.feature_mode,
+        "engine": shadow.engine_name,
+        "explanation_policy": "deferred",
+        "velocity_max_keys": shadow.preprocessor.velocity_max_keys,
+        "model_format": shadow.model_format,
+    }
+
+
+def _build_rows(shadows: Dict[str, FraudPredictor], batch: List[ShadowItem]) -> List[Dict[str, Any]]:
+    """Scores the batch with every shadow and builds the shadow_scores rows."""
+    now = datetime.now()
+    rows = []
+    for version, shadow in shadows.items():
+        items, velocity = batch, None
+        if shadow.preprocessor.velocity is not None:
+            # Velocity features come with the items (see ShadowScorer.submit); only items queued
+            # after the shadow was attached have them
+            items = [item for item in batch if version in item[4]]
+            if not items:
+                continue
+            velocity = np.stack([item[4][version] for item in items])
+        results = shadow.predict_batch([data for _, data, _, _, _ in items], velocity)
+        for (transaction_id, _, primary_score, primary_verdict, _), result in zip(items, results):
+            rows.append({
+                "transaction_id": transaction_id,
+                "model_version": version,
+                "risk_score": result["risk_score"],
+                "verdict": result["verdict"],
+                "score_delta": result["risk_score"] - primary_score,
+                "disagrees": result["verdict"] != primary_verdict,
+                "created_at": now,
+            })
+    return rows
+
+
+# Shadow models loaded by a process-pool worker, keyed by their spec (reloaded models get a new one)
+_worker_shadows: Dict[Tuple, FraudPredictor] = {}
+
+
+def _init_worker(nice: int):
+    # Below the API process: the primary path gets the CPU whenever both want it
+    if hasattr(os, "sched_setscheduler") and hasattr(os, "SCHED_IDLE"):
+        # Linux: only run on otherwise idle CPU, preempted as soon as anything else wakes up
+        try:
+            os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+            return
+        except OSError:
+            pass
+    if nice:
+        os.nice(nice)
+
+
+def _score_in_process(specs: Dict[str, Dict[str, Any]], batch: List[ShadowItem]) -> List[Dict[str, Any]]:
+    keys = {name: tuple(sorted(spec.items())) for name, spec in specs.items()}
+    for key in set(_worker_shadows) - set(keys.values()):
+        del _worker_shadows[key]
+    for name, key in keys.items():
+        if key not in _worker_shadows:
+            shadow = FraudPredictor(**specs[name])
+            shadow.load_models()
+            _worker_shadows[key] = shadow
+    return _build_rows({name: _worker_shadows[key] for name, key in keys.items()}, batch)
+
+
+class ShadowScorer:
+    """
+    Scores a sample of live traffic with the shadow (candidate) models attached to the serving
+    predictor and records how they compare with the primary verdicts in the shadow_scores table.
+
+    Nothing here runs on the response path: /analyze only puts already scored transactions on a
+    bounded queue (dropping them when it is full). The worker collects what arrives over
+    `batch_interval_ms` into one batch, so each shadow scores many rows per vectorized call, and
+    the rows are bulk-inserted once per batch. Scoring runs on a pool of its own:
+      kind="thread"  - threads sharing the attached shadow models (they compete with the
+                       inference threads for the GIL, so busy hosts see it in tail latency)
+      kind="process" - worker processes with their own copy of the shadows, running at idle
+                       OS priority (SCHED_IDLE on Linux, else `nice`), so they only use CPU
+                       the primary path leaves free
+    Shadows with velocity features keep their per-account state here, in the attached shadow
+    models, fed by every submitted transaction (sampled or not); the sampled rows are scored with
+    the features computed at submission, so the state is neither sampled nor split across workers.
+    """
+    def __init__(
+        self,
+        get_predictor: Callable[[], Optional[FraudPredictor]],
+        sample_rate: float = 0.1,
+        max_batch: int = 1024,
+        batch_interval_ms: float = 500,
+        max_queue: int = 10000,
+        kind: str = "thread",
+        workers: int = 1,
+        nice: int = 10,
+        session_factory: Callable = SessionLocal
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', expected one of {EXECUTOR_KINDS}")
+        self.get_predictor = get_predictor
+        self.sample_rate = sample_rate
+        self.max_batch = max_batch
+        self.batch_interval = batch_interval_ms / 1000
+        self.kind = kind
+        self.session_factory = session_factory
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        if kind == "thread":
+            self.pool: Executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+        else:
+            # spawn (not fork): the parent already runs an event loop and threads
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(nice,)
+            )
+        self.dropped = 0
+        self.scored = 0
+        self.disagreements = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Scores everything still queued, then stops the worker."""
+        if self._task is None:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.pool.shutdown()
+
+    def submit(self, transaction_ids: List[str], data: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> int:
+        """
+        Queues a sample of scored transactions for the shadows (nothing when none are attached).
+        Returns how many were queued.
+        """
+        predictor = self.get_predictor()
+        if not predictor or not predictor.shadows:
+            return 0
+        # Cheap (a dict lookup per transaction), and the only place that sees the whole traffic
+        velocity = {
+            version: shadow.preprocessor.velocity_features(data)
+            for version, shadow in predictor.shadows.items() if shadow.preprocessor.velocity is not None
+        }
+        queued = 0
+        for row, (transaction_id, record, result) in enumerate(zip(transaction_ids, data, results)):
+            if random.random() >= self.sample_rate:
+                continue
+            item_velocity = {version: features[row] for version, features in velocity.items()}
+            try:
+                self.queue.put_nowait((transaction_id, record, result["risk_score"], result["verdict"], item_velocity))
+            except asyncio.QueueFull:
+                # Shadow results are statistics: losing some under overload is fine
+                self.dropped += 1
+                continue
+            queued += 1
+        return queued
+
+    async def _run(self):
+        while True:
+            batch: List[ShadowItem] = [await self.queue.get()]
+            # Let a batch build up: fewer, larger scoring calls and inserts
+            await asyncio.sleep(self.batch_interval)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._score_batch(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Shadow Scoring Error: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _score_batch(self, batch: List[ShadowItem]):
+        predictor = self.get_predictor()
+        if not predictor or not predictor.shadows:
+            return
+        loop = asyncio.get_running_loop()
+        if self.kind == "thread":
+            rows = await loop.run_in_executor(self.pool, _build_rows, dict(predictor.shadows), batch)
+        else:
+            specs = {name: _shadow_spec(shadow) for name, shadow in predictor.shadows.items()}
+            rows = await loop.run_in_executor(self.pool, _score_in_process, specs, batch)
+        if not rows:
+            return
+        async with self.session_factory() as session:
+            await session.execute(insert(ShadowScore), rows)
+            await session.commit()
+        self.scored += len(rows)
+        self.disagreements += sum(row["disagrees"] for row in rows)
+
+    async def summarize(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        """Agreement of every shadow version with the primary model over [start_time, end_time)."""
+        query = (
+            select(
+                ShadowScore.model_version,
+                func.count(),
+                func.sum(case((ShadowScore.disagrees, 1), else_=0)),
+                func.avg(ShadowScore.score_delta),
+                func.avg(func.abs(ShadowScore.score_delta)),
+            )
+            .where(ShadowScore.created_at >= start_time, ShadowScore.created_at < end_time)
+            .group_by(ShadowScore.model_version)
+            .order_by(ShadowScore.model_version)
+        )
+        async with self.session_factory() as session:
+            rows = (await session.execute(query)).all()
+        return [
+            {
+                "model_version": version,
+                "scored": scored,
+                "disagreements": disagreements or 0,
+                "disagreement_rate": (disagreements or 0) / scored if scored else 0.0,
+                "mean_score_delta": float(mean_delta or 0.0),
+                "mean_abs_score_delta": float(mean_abs_delta or 0.0),
+            }
+            for version, scored, disagreements, mean_delta, mean_abs_delta in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        predictor = self.get_predictor()
+        return {
+            "shadow_versions": list(predictor.shadows) if predictor else [],
+            "executor": self.kind,
+            "sample_rate": self.sample_rate,
+            "queued": self.queue.qsize(),
+            "dropped": self.dropped,
+            "scored": self.scored,
+            "disagreements": self.disagreements,
+            "errors": self.errors,
+        }
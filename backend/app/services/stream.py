@@ -0,0 +1,153 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Set
+
+from backend.app.models.transaction import Transaction
+
+# Put on a subscriber's queue (after clearing it) when the subscriber falls too far behind
+LAGGED = object()
+
+
+def transaction_event(transaction: Transaction) -> Dict[str, Any]:
+    """JSON-ready stream payload of a scored transaction (the fields of the transaction listing)."""
+    return {
+        "id": transaction.id,
+        "amount": transaction.amount,
+        "type": transaction.type,
+        "risk_score": transaction.risk_score,
+        "risk_level": transaction.risk_level,
+        "is_flagged": transaction.is_flagged,
+        "timestamp": transaction.timestamp.isoformat(),
+    }
+
+
+class Subscription:
+    """One live stream client. Events wait in a bounded queue until the client reads them."""
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def push(self, event: Dict[str, Any]) -> bool:
+        """Returns False (after leaving only LAGGED in the queue) when the client cannot keep up."""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Don't buffer without bound for a slow client: it reconnects and
+            # resumes from the database at the last event it actually received
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(LAGGED)
+            return False
+
+    async def get(self) -> Any:
+        return await self.queue.get()
+
+
+class TransactionHub:
+    """
+    Fans newly scored transactions out to every live stream subscriber.
+
+    Without Redis, /analyze publishes straight to the subscribers of this process. With
+    REDIS_URL set, batches go through a Redis pub/sub channel instead and every API worker
+    fans out what it receives, so each client sees the transactions scored by all workers.
+    Publishing never blocks the request: Redis sends happen on a background task.
+    """
+    def __init__(self, subscriber_queue_size: int = 1000, redis_url: Optional[str] = None,
+                 channel: str = "aegisflow:transactions"):
+        self.subscriber_queue_size = subscriber_queue_size
+        self.channel = channel
+        self.subscribers: Set[Subscription] = set()
+        self.redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self.redis = redis.from_url(redis_url, decode_responses=True)
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=10000)
+        self._tasks: List[asyncio.Task] = []
+
+        # Stats
+        self.published = 0
+        self.delivered = 0
+        self.lagged = 0
+        self.redis_errors = 0
+
+    def start(self):
+        if self.redis is not None:
+            self._tasks = [asyncio.create_task(self._send()), asyncio.create_task(self._listen())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.subscriber_queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, events: List[Dict[str, Any]]):
+        """Queues a batch of transaction events for every subscriber (in every worker when Redis is on)."""
+        if not events:
+            return
+        self.published += len(events)
+        if self.redis is None:
+            self._fan_out(events)
+            return
+        try:
+            self._outbox.put_nowait(events)
+        except asyncio.QueueFull:
+            # Redis is not keeping up: at least serve this worker's own subscribers
+            self.redis_errors += 1
+            self._fan_out(events)
+
+    def _fan_out(self, events: List[Dict[str, Any]]):
+        for subscription in list(self.subscribers):
+            for event in events:
+                if not subscription.push(event):
+                    self.lagged += 1
+                    self.unsubscribe(subscription)
+                    break
+                self.delivered += 1
+
+    async def _send(self):
+        while True:
+            events = await self._outbox.get()
+            try:
+                await self.redis.publish(self.channel, json.dumps(events))
+            except Exception as e:
+                print(f"Stream Hub Redis Error: {e}")
+                self.redis_errors += 1
+                self._fan_out(events)
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._fan_out(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stream Hub Redis Error: {e}")
+                self.redis_errors += 1
+                await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "lagged": self.lagged,
+            "redis": {"errors": self.redis_errors} if self.redis is not None else None,
+        }
@@ -0,0 +1,192 @@
+import json
+import mmap
+import os
+import struct
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import numpy as np
+
+try:
+    from backend.ml_engine.engine import CompiledForest, CompiledIsolationForest, CompiledXGBClassifier
+except ImportError:
+    from engine import CompiledForest, CompiledIsolationForest, CompiledXGBClassifier
+
+if TYPE_CHECKING:
+    from sklearn.preprocessing import StandardScaler
+
+# Single-file model bundle written next to the pickles of a model version:
+#
+#   magic (8 bytes) | header length (uint64 LE) | JSON header | arrays, each 64-byte aligned
+#
+# The header describes every array (dtype, shape, offset) plus the scalars needed to rebuild the
+# scaler and both compiled forests. Opening a bundle memory-maps the file read-only and hands out
+# NumPy views of it, so nothing is unpickled or copied and every process that opens the same
+# bundle shares its pages through the page cache.
+BUNDLE_FILE = "model.bundle"
+BUNDLE_MAGIC = b"AEGISMB\x00"
+BUNDLE_FORMAT_VERSION = 1
+_ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def write_bundle(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+    """Writes the arrays and JSON-serializable metadata to `path` (atomically)."""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"format_version": BUNDLE_FORMAT_VERSION, "arrays": layout, "meta": meta}).encode()
+    data_start = _align(len(BUNDLE_MAGIC) + 8 + len(header))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+class BundledScaler:
+    """
+    The fitted state of a StandardScaler and its transform, without scikit-learn: importing it
+    (and scipy, joblib and pandas with it) costs more than loading the whole bundle.
+    """
+    def __init__(self, with_mean: bool, with_std: bool, mean_: Optional[np.ndarray], var_: Optional[np.ndarray],
+                 scale_: Optional[np.ndarray], n_samples_seen_: int, n_features_in_: int, feature_names_in_=None):
+        self.with_mean = with_mean
+        self.with_std = with_std
+        self.mean_ = mean_
+        self.var_ = var_
+        self.scale_ = scale_
+        self.n_samples_seen_ = n_samples_seen_
+        self.n_features_in_ = n_features_in_
+        if feature_names_in_ is not None:
+            self.feature_names_in_ = feature_names_in_
+
+    def transform(self, X) -> np.ndarray:
+        # Same float64 steps as StandardScaler.transform
+        X = np.array(X, dtype=np.float64)
+        if self.with_mean:
+            X -= self.mean_
+        if self.with_std:
+            X /= self.scale_
+        return X
+
+
+class ModelBundle:
+    """A memory-mapped model bundle. The arrays are read-only views that stay valid while the bundle is referenced."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        (header_len,) = struct.unpack_from("<Q", self._mmap, len(BUNDLE_MAGIC))
+        header_start = len(BUNDLE_MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_len])
+        if header["format_version"] != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model bundle format {header['format_version']}")
+        self.meta: Dict[str, Any] = header["meta"]
+        data_start = _align(header_start + header_len)
+
+        buffer = memoryview(self._mmap)
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype=np.int64))
+            self.arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=data_start + spec["offset"]
+            ).reshape(spec["shape"])
+
+    def _forest(self, prefix: str) -> CompiledForest:
+        meta = self.meta[prefix]
+        arrays = {name: self.arrays[f"{prefix}_{name}"] for name in CompiledForest.ARRAYS if f"{prefix}_{name}" in self.arrays}
+        if "value" not in arrays:
+            # XGBoost leaves keep their value in the threshold slot: stored once
+            arrays["value"] = arrays["threshold"]
+        return CompiledForest.from_arrays(arrays, max_depth=meta["max_depth"], inclusive=meta["inclusive"])
+
+    def compiled_xgb(self) -> CompiledXGBClassifier:
+        return CompiledXGBClassifier(self._forest("xgb"), np.float32(self.meta["xgb"]["base_margin"]))
+
+    def compiled_iso(self) -> CompiledIsolationForest:
+        meta = self.meta["iso"]
+        return CompiledIsolationForest(self._forest("iso"), meta["denominator"], meta["offset"])
+
+    def scaler(self) -> BundledScaler:
+        """The fitted scaler the bundle was exported from (its parameters and transform)."""
+        meta = self.meta["scaler"]
+        arrays = {attribute: self.arrays.get(f"scaler_{attribute.rstrip('_')}") for attribute in ("mean_", "var_", "scale_")}
+        return BundledScaler(
+            with_mean=meta["with_mean"],
+            with_std=meta["with_std"],
+            n_samples_seen_=np.int64(meta["n_samples_seen"]),
+            n_features_in_=meta["n_features"],
+            feature_names_in_=np.asarray(meta["feature_names"], dtype=object) if meta["feature_names"] else None,
+            **arrays,
+        )
+
+    def booster(self):
+        """The XGBoost booster (only needed for SHAP explanations), loaded from its UBJSON copy."""
+        import xgboost as xgb
+        booster = xgb.Booster()
+        booster.load_model(bytearray(self.arrays["xgb_booster"]))
+        return booster
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._mmap)
+
+
+def export_bundle(model_dir: str, xgb_model: Any, iso_forest: Any, scaler: "StandardScaler",
+                  feature_columns: Optional[list] = None) -> str:
+    """Compiles the fitted models and writes `model_dir`/model.bundle. Returns its path."""
+    import sklearn
+    import xgboost as xgb
+
+    xgb_compiled = CompiledXGBClassifier.from_model(xgb_model)
+    iso_compiled = CompiledIsolationForest.from_model(iso_forest)
+    booster = xgb_model.get_booster() if hasattr(xgb_model, "get_booster") else xgb_model
+
+    arrays: Dict[str, np.ndarray] = {}
+    for prefix, forest in (("xgb", xgb_compiled.forest), ("iso", iso_compiled.forest)):
+        for name, array in forest.to_arrays().items():
+            if prefix == "xgb" and name == "value":
+                continue
+            arrays[f"{prefix}_{name}"] = array
+    for attribute in ("mean_", "var_", "scale_"):
+        if getattr(scaler, attribute, None) is not None:
+            arrays[f"scaler_{attribute.rstrip('_')}"] = np.asarray(getattr(scaler, attribute), dtype=np.float64)
+    arrays["xgb_booster"] = np.frombuffer(bytes(booster.save_raw("ubj")), dtype=np.uint8)
+
+    meta = {
+        "feature_columns": feature_columns,
+        "scaler": {
+            "with_mean": scaler.with_mean,
+            "with_std": scaler.with_std,
+            "n_samples_seen": int(np.asarray(scaler.n_samples_seen_).reshape(-1)[0]),
+            "n_features": int(scaler.n_features_in_),
+            "feature_names": [str(name) for name in getattr(scaler, "feature_names_in_", [])],
+        },
+        "xgb": {
+            "base_margin": float(xgb_compiled.base_margin),
+            "max_depth": xgb_compiled.forest.max_depth,
+            "inclusive": xgb_compiled.forest.inclusive,
+        },
+        "iso": {
+            "denominator": iso_compiled.denominator,
+            "offset": iso_compiled.offset,
+            "max_depth": iso_compiled.forest.max_depth,
+            "inclusive": iso_compiled.forest.inclusive,
+        },
+        "exported_with": {"xgboost": xgb.__version__, "scikit-learn": sklearn.__version__},
+    }
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    write_bundle(path, arrays, meta)
+    return path
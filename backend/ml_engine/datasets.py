@@ -0,0 +1,161 @@
+import asyncio
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Sequence, Tuple
+
+# Chunked training data sources for the out-of-core trainer. Every source yields pandas
+# DataFrames of at most `chunk_size` rows with the same columns (PaySim names), oldest first, so
+# the trainer never holds more than a few chunks of the history in memory.
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns the trainer uses; anything else in the source is not read
+TRAINING_COLUMNS = [
+    "amount", "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest",
+    "type", "transaction_time", "nameOrig", "isFraud",
+]
+LABEL_COLUMN = "isFraud"
+# PaySim has no timestamps: `step` counts hours since the start of the simulation
+PAYSIM_EPOCH = datetime(2024, 1, 1)
+_READ_COLUMNS = set(TRAINING_COLUMNS) | {"step"}
+FILE_EXTENSIONS = (".csv", ".csv.gz", ".parquet", ".pq")
+
+
+def normalize_chunk(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Brings a chunk to the training columns: transaction_time (from PaySim's step if needed) and the isFraud label."""
+    import pandas as pd
+
+    if "transaction_time" in df.columns:
+        df["transaction_time"] = pd.to_datetime(df["transaction_time"])
+    elif "step" in df.columns:
+        df["transaction_time"] = pd.Timestamp(PAYSIM_EPOCH) + pd.to_timedelta(df["step"], unit="h")
+    else:
+        raise ValueError("Training data needs a transaction_time column (or PaySim's step)")
+    if LABEL_COLUMN not in df.columns:
+        raise ValueError(f"Training data needs a {LABEL_COLUMN} label column")
+    return df[[column for column in TRAINING_COLUMNS if column in df.columns]]
+
+
+def expand_paths(paths: Sequence[str]) -> List[str]:
+    """Files as given, directories (e.g. a partitioned Parquet dataset) as their data files in name order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(FILE_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_file_chunks(paths: Sequence[str], chunk_size: int = 500_000) -> Iterator["pd.DataFrame"]:
+    """Streams CSV and Parquet files (Parquet needs pyarrow) in order, one chunk at a time."""
+    import pandas as pd
+
+    for path in expand_paths(paths):
+        if path.endswith((".csv", ".csv.gz")):
+            for chunk in pd.read_csv(path, chunksize=chunk_size, usecols=lambda column: column in _READ_COLUMNS):
+                yield normalize_chunk(chunk)
+        elif path.endswith((".parquet", ".pq")):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError as e:
+                raise ImportError("Reading Parquet training data needs pyarrow (pip install pyarrow)") from e
+            parquet_file = pq.ParquetFile(path)
+            columns = [name for name in parquet_file.schema_arrow.names if name in _READ_COLUMNS]
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                yield normalize_chunk(batch.to_pandas())
+        else:
+            raise ValueError(f"Unsupported training data file {path}, expected one of {FILE_EXTENSIONS}")
+
+
+def iter_table_chunks(database_url: str, chunk_size: int = 500_000) -> Iterator["pd.DataFrame"]:
+    """
+    Streams the transactions table oldest first, one keyset page per chunk (ordered by the
+    (timestamp, id) index, so no page is a sort or an OFFSET scan).
+    The table has no ground truth: is_flagged, the verdict recorded at scoring time, is the label.
+    """
+    import pandas as pd
+    from sqlalchemy import Boolean, DateTime, Float, String, column, select, table, tuple_
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    transactions = table(
+        "transactions",
+        column("id", String), column("timestamp", DateTime), column("amount", Float),
+        column("oldbalanceOrg", Float), column("newbalanceOrig", Float),
+        column("oldbalanceDest", Float), column("newbalanceDest", Float),
+        column("type", String), column("is_flagged", Boolean),
+    )
+    columns = [c.name for c in transactions.columns]
+
+    async def fetch_page(engine, after):
+        query = select(transactions).order_by(transactions.c.timestamp, transactions.c.id).limit(chunk_size)
+        if after is not None:
+            query = query.where(tuple_(transactions.c.timestamp, transactions.c.id) > after)
+        async with engine.connect() as conn:
+            return (await conn.execute(query)).all()
+
+    # The trainer is synchronous: drive the same async drivers the API uses on a private loop
+    loop = asyncio.new_event_loop()
+    engine = create_async_engine(database_url)
+    try:
+        after = None
+        while True:
+            rows = loop.run_until_complete(fetch_page(engine, after))
+            if not rows:
+                break
+            after = (rows[-1].timestamp, rows[-1].id)
+            df = pd.DataFrame.from_records(rows, columns=columns)
+            numerical = ["amount", "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest"]
+            df[numerical] = df[numerical].fillna(0.0)
+            df[LABEL_COLUMN] = df.pop("is_flagged").fillna(False).astype(int)
+            df = df.rename(columns={"timestamp": "transaction_time"}).drop(columns=["id"])
+            yield normalize_chunk(df)
+            if len(rows) < chunk_size:
+                break
+    finally:
+        loop.run_until_complete(engine.dispose())
+        loop.close()
+
+
+def prefetch(chunks: Iterable, depth: int = 2) -> Iterator:
+    """
+    Reads up to `depth` chunks ahead on a background thread, so parsing/decoding the next chunk
+    overlaps with the caller working on the current one. Errors are re-raised in the caller.
+    """
+    buffer: "queue.Queue[Tuple[str, object]]" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for chunk in chunks:
+                if not put(("chunk", chunk)):
+                    return
+            put(("done", None))
+        except BaseException as e:
+            put(("error", e))
+
+    thread = threading.Thread(target=reader, name="training-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        # The consumer stopped early (or finished): let the reader exit
+        stop.set()
@@ -0,0 +1,336 @@
+import json
+import warnings
+from contextlib import contextmanager
+import numpy as np
+from typing import Any, Dict
+
+# Inference engines used by FraudPredictor to turn a feature matrix into scores.
+#   "native"   - calls the xgboost / sklearn Python wrappers (predict_proba, predict)
+#   "compiled" - flattens the trees of both models into plain NumPy arrays once at load time
+#                and walks them directly, with no per-call input validation or wrapper objects
+
+
+def _traverse(X: np.ndarray, forest: "CompiledForest") -> np.ndarray:
+    """
+    Walk every tree of the forest for every row at once.
+    Returns the (n_rows, n_trees) matrix of leaf node indexes.
+    Leaves point to themselves, so a fixed number of steps (the forest depth) is always enough.
+    """
+    n_rows, n_features = X.shape
+    flat_X = np.ascontiguousarray(X).ravel()
+    row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+    node = np.repeat(forest.roots[None, :], n_rows, axis=0)
+    has_missing = np.isnan(flat_X).any()
+
+    for _ in range(forest.max_depth):
+        x = flat_X[row_offset + forest.feature[node]]
+        threshold = forest.threshold[node]
+        # NaN compares False either way, so only rows with missing values need the default direction
+        go_right = ~(x <= threshold) if forest.inclusive else ~(x < threshold)
+        if has_missing:
+            go_right = np.where(np.isnan(x), ~forest.default_left[node], go_right)
+        node = forest.children[2 * node + go_right]
+    return node
+
+
+class CompiledForest:
+    """
+    Array-backed tree ensemble: the nodes of all trees concatenated into flat arrays.
+    `children` interleaves (left, right) per node as absolute indexes into the same arrays,
+    so one gather picks the next node; `roots` holds each tree's first node.
+    """
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, max_depth, inclusive):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.children = np.empty(2 * len(self.feature), dtype=np.intp)
+        self.children[0::2] = left
+        self.children[1::2] = right
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        # sklearn sends `x <= threshold` left, xgboost sends `x < threshold` left
+        self.inclusive = inclusive
+
+    # Array attributes, as written to and read back from a model bundle (see bundle.py)
+    ARRAYS = ("feature", "threshold", "children", "default_left", "value", "roots")
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], max_depth: int, inclusive: bool) -> "CompiledForest":
+        """
+        Wraps already flattened arrays (e.g. read-only views of a memory-mapped bundle) without copying them,
+        as long as they have the native dtypes.
+        """
+        forest = cls.__new__(cls)
+        forest.feature = np.asarray(arrays["feature"], dtype=np.intp)
+        forest.threshold = arrays["threshold"]
+        forest.children = np.asarray(arrays["children"], dtype=np.intp)
+        forest.default_left = np.asarray(arrays["default_left"], dtype=bool)
+        forest.value = arrays["value"]
+        forest.roots = np.asarray(arrays["roots"], dtype=np.intp)
+        forest.max_depth = int(max_depth)
+        forest.inclusive = inclusive
+        return forest
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Per-tree leaf value for every row, shape (n_rows, n_trees)."""
+        return self.value[_traverse(X, self)]
+
+
+def _depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Depth of a single tree given its (local) child arrays, -1 marking leaves."""
+    depth, frontier = 0, [0]
+    while True:
+        children = [c for n in frontier for c in (left[n], right[n]) if c != -1]
+        if not children:
+            return depth
+        depth += 1
+        frontier = children
+
+
+def _parse_base_score(raw: str) -> np.float32:
+    """base_score is stored in probability space: "5E-1" in older xgboost, "[5E-1]" (one per target) since 3.0."""
+    return np.float32(float(raw.strip("[]").split(",")[0]))
+
+
+class CompiledXGBClassifier:
+    """Flattened binary:logistic XGBoost model reproducing XGBClassifier.predict_proba()[:, 1]."""
+    def __init__(self, forest: CompiledForest, base_margin: np.float32):
+        self.forest = forest
+        self.base_margin = np.float32(base_margin)
+
+    @classmethod
+    def from_model(cls, xgb_model: Any) -> "CompiledXGBClassifier":
+        booster = xgb_model.get_booster() if hasattr(xgb_model, "get_booster") else xgb_model
+        learner = json.loads(booster.save_raw("json"))["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Compiled engine only supports binary:logistic, got '{objective}'")
+        model = learner["gradient_booster"]["model"]
+        trees = model["trees"]
+
+        # Respect early stopping the same way the sklearn wrapper does
+        best_iteration = booster.attributes().get("best_iteration")
+        if best_iteration is not None:
+            trees = trees[:int(model["iteration_indptr"][int(best_iteration) + 1])]
+
+        feature, threshold, left, right, default_left, roots = [], [], [], [], [], []
+        max_depth, offset = 0, 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Compiled engine does not support categorical splits")
+            tree_left = np.asarray(tree["left_children"], dtype=np.int64)
+            tree_right = np.asarray(tree["right_children"], dtype=np.int64)
+            is_leaf = tree_left == -1
+            local = np.arange(len(tree_left))
+
+            roots.append(offset)
+            feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+            # Leaves keep their leaf value in split_conditions
+            threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            left.append(np.where(is_leaf, local, tree_left) + offset)
+            right.append(np.where(is_leaf, local, tree_right) + offset)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            max_depth = max(max_depth, _depth(tree_left, tree_right))
+            offset += len(tree_left)
+
+        threshold = np.concatenate(threshold)
+        forest = CompiledForest(
+            feature=np.concatenate(feature),
+            threshold=threshold,
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            default_left=np.concatenate(default_left),
+            value=threshold,
+            roots=np.asarray(roots),
+            max_depth=max_depth,
+            inclusive=False,
+        )
+
+        base_score = _parse_base_score(learner["learner_model_param"]["base_score"])
+        base_margin = -np.log(np.float32(1.0) / base_score - np.float32(1.0))
+        return cls(forest, base_margin)
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        """Raw log-odds, accumulated tree by tree in float32 like xgboost's CPU predictor."""
+        X = np.asarray(X, dtype=np.float32)
+        leaf_values = self.forest.leaf_values(X)
+        margins = np.empty((X.shape[0], leaf_values.shape[1] + 1), dtype=np.float32)
+        margins[:, 0] = self.base_margin
+        margins[:, 1:] = leaf_values
+        # cumsum adds strictly left to right, i.e. in tree order
+        return np.cumsum(margins, axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Fraud probability (class 1) per row, float32."""
+        margin = self.predict_margin(X)
+        # Same float32 sigmoid as xgboost's common::Sigmoid. expf is taken in float64 and rounded
+        # back, which reproduces libm's correctly rounded expf (NumPy's SIMD float32 exp can be 1 ulp off).
+        exponent = np.minimum(-margin, np.float32(88.7))
+        denominator = np.exp(exponent.astype(np.float64)).astype(np.float32) + np.float32(1.0) + np.float32(1e-16)
+        return np.float32(1.0) / denominator
+
+
+def _node_depths(tree: Any) -> np.ndarray:
+    """Depth of every node of a fitted sklearn tree, counting the root as 1."""
+    depths = np.zeros(tree.node_count, dtype=np.int64)
+    depths[0] = 1
+    level = np.array([0])
+    while level.size:
+        children = np.concatenate([tree.children_left[level], tree.children_right[level]])
+        parent_depths = np.concatenate([depths[level], depths[level]])
+        has_child = children != -1
+        children = children[has_child]
+        depths[children] = parent_depths[has_child] + 1
+        level = children
+    return depths
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """
+    Average path length of an unsuccessful BST search among n samples, the depth an isolation
+    tree adds for a leaf still holding n training samples (IsolationForest's c(n)).
+    """
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    average = np.zeros(n_samples.shape)
+    average[n_samples == 2] = 1.0
+    larger = n_samples > 2
+    average[larger] = (
+        2.0 * (np.log(n_samples[larger] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples[larger] - 1.0) / n_samples[larger]
+    )
+    return average
+
+
+class CompiledIsolationForest:
+    """Flattened sklearn IsolationForest reproducing decision_function() / predict()."""
+    def __init__(self, forest: CompiledForest, denominator: float, offset: float):
+        self.forest = forest
+        self.denominator = denominator
+        self.offset = offset
+
+    @classmethod
+    def from_model(cls, iso_forest: Any) -> "CompiledIsolationForest":
+        """
+        Built from the fitted trees' public attributes only (estimators_, tree_ arrays, max_samples_);
+        the path length bookkeeping sklearn keeps privately is recomputed here the same way.
+        """
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        max_depth, offset = 0, 0
+        for estimator, features in zip(iso_forest.estimators_, iso_forest.estimators_features_):
+            tree = estimator.tree_
+            tree_left = tree.children_left
+            is_leaf = tree_left == -1
+            local = np.arange(tree.node_count)
+
+            roots.append(offset)
+            # Trees see a feature subset; map their local feature ids back to input columns
+            feature.append(np.where(is_leaf, 0, np.asarray(features)[np.where(is_leaf, 0, tree.feature)]))
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, local, tree_left) + offset)
+            right.append(np.where(is_leaf, local, tree.children_right) + offset)
+            default_left.append(np.asarray(tree.missing_go_to_left).astype(bool))
+            # Per-node path length contribution, combined in the same order as sklearn does per tree
+            value.append(_node_depths(tree) + _average_path_length(tree.n_node_samples) - 1.0)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+        forest = CompiledForest(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value).astype(np.float64),
+            roots=np.asarray(roots),
+            max_depth=max_depth,
+            inclusive=True,
+        )
+
+        denominator = len(iso_forest.estimators_) * _average_path_length(np.asarray([iso_forest.max_samples_]))[0]
+        return cls(forest, float(denominator), float(iso_forest.offset_))
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Negative values are outliers, like IsolationForest.decision_function."""
+        X = np.asarray(X, dtype=np.float32)
+        # Sequential (cumsum) accumulation matches sklearn's tree-by-tree `depths +=`
+        depths = np.cumsum(self.forest.leaf_values(X), axis=1)[:, -1]
+        if self.denominator != 0:
+            scores = 2 ** (-(depths / self.denominator))
+        else:
+            # For a single training sample, denominator and depth are 0 (score set to 1 like sklearn)
+            scores = np.ones_like(depths)
+        return -scores - self.offset
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """+1 for inliers, -1 for outliers."""
+        is_inlier = np.ones(X.shape[0], dtype=int)
+        is_inlier[self.decision_function(X) < 0] = -1
+        return is_inlier
+
+
+@contextmanager
+def _unnamed_columns():
+    """
+    The models were fitted on DataFrames; plain arrays from the fast path are laid out in the same
+    column order, so sklearn's per-call feature-name warning is just noise. Silenced only here.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+        yield
+
+
+class NativeEngine:
+    """Scores through the original model objects."""
+    name = "native"
+
+    def __init__(self, xgb_model: Any, iso_forest: Any):
+        self.xgb_model = xgb_model
+        self.iso_forest = iso_forest
+
+    def fraud_proba(self, X) -> np.ndarray:
+        # proba returns [prob_legit, prob_fraud] per row
+        with _unnamed_columns():
+            return self.xgb_model.predict_proba(X)[:, 1]
+
+    def anomalies(self, X) -> np.ndarray:
+        # Returns -1 for anomaly, 1 for normal
+        with _unnamed_columns():
+            return self.iso_forest.predict(X) == -1
+
+
+class CompiledEngine:
+    """Scores through the flattened NumPy trees (bit-for-bit identical to NativeEngine)."""
+    name = "compiled"
+
+    def __init__(self, xgb_model: Any, iso_forest: Any):
+        self.xgb = CompiledXGBClassifier.from_model(xgb_model)
+        self.iso = CompiledIsolationForest.from_model(iso_forest)
+
+    @classmethod
+    def from_compiled(cls, xgb: CompiledXGBClassifier, iso: CompiledIsolationForest) -> "CompiledEngine":
+        """Engine over already flattened models (e.g. from a model bundle), skipping compilation."""
+        engine = cls.__new__(cls)
+        engine.xgb = xgb
+        engine.iso = iso
+        return engine
+
+    def fraud_proba(self, X) -> np.ndarray:
+        return self.xgb.predict_proba(np.asarray(X, dtype=np.float32))
+
+    def anomalies(self, X) -> np.ndarray:
+        return self.iso.predict(np.asarray(X, dtype=np.float32)) == -1
+
+
+ENGINES: Dict[str, Any] = {
+    NativeEngine.name: NativeEngine,
+    CompiledEngine.name: CompiledEngine,
+}
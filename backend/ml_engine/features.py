@@ -1,13 +1,37 @@
-import pandas as pd
 import numpy as np
-from typing import Dict, Any, Tuple
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-import joblib
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+import json
 import os
+import time
+from datetime import datetime
+
+try:
+    from backend.ml_engine.records import TRANSACTION_TYPES, record_names
+    from backend.ml_engine.velocity import VelocityStore
+except ImportError:
+    from records import TRANSACTION_TYPES, record_names
+    from velocity import VelocityStore
+
+# pandas, scikit-learn and joblib are imported where they are used: serving through the NumPy
+# fast path never needs pandas, and nothing is paid for them until models are fitted or loaded
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+# Hour used when a transaction carries no timestamp at all
+DEFAULT_HOUR_OF_DAY = 12
+
+# Written next to scaler.pkl when the models were trained with velocity features
+VELOCITY_CONFIG_FILE = "velocity.json"
 
 class TransactionPreprocessor:
-    def __init__(self):
-        self.scaler = StandardScaler()
+    def __init__(
+        self,
+        velocity_windows: Optional[Dict[str, float]] = None,
+        velocity_key: str = "nameOrig",
+        velocity_max_keys: int = 100_000
+    ):
+        self._scaler: Optional["StandardScaler"] = None
         self.label_encoders = {}
         # Define expected columns to ensure order
         self.feature_columns = [
@@ -16,36 +40,82 @@ class TransactionPreprocessor:
             'type_CASH_IN', 'type_CASH_OUT', 'type_DEBIT', 
             'type_PAYMENT', 'type_TRANSFER'
         ]
+        self.numerical_cols = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 
+                               'oldbalanceDest', 'newbalanceDest', 'hour_of_day']
+        # Fixed column positions for the NumPy fast path (no DataFrame / get_dummies)
+        self.numerical_index = np.array([self.feature_columns.index(c) for c in self.numerical_cols])
+        self.type_index = {
+            col[len('type_'):]: i for i, col in enumerate(self.feature_columns) if col.startswith('type_')
+        }
+        self.base_width = len(self.feature_columns)
+        # One-hot column of each binary record type code
+        self._type_columns = np.array([self.type_index[name] for name in TRANSACTION_TYPES])
+
+        # Optional per-account velocity features (appended after the base columns, unscaled)
+        self.velocity: Optional[VelocityStore] = None
+        self.velocity_key = velocity_key
+        self.velocity_max_keys = velocity_max_keys
+        if velocity_windows:
+            self.enable_velocity(velocity_windows)
+
+    @property
+    def scaler(self) -> "StandardScaler":
+        if self._scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self._scaler = StandardScaler()
+        return self._scaler
+
+    @scaler.setter
+    def scaler(self, scaler: "StandardScaler"):
+        self._scaler = scaler
+
+    def enable_velocity(self, windows: Dict[str, float], key: Optional[str] = None):
+        """Adds velocity features keyed by the `key` field of each transaction (e.g. nameOrig)."""
+        if key:
+            self.velocity_key = key
+        self.velocity = VelocityStore(windows, max_keys=self.velocity_max_keys)
+        self.feature_columns = self.feature_columns[:self.base_width] + self.velocity.feature_names
         
-    def fit(self, df: pd.DataFrame):
+    def fit(self, df: "pd.DataFrame"):
         """Fit the scaler to the training data."""
         # Feature engineering on the dataframe
         df_processed = self._engineer_features(df)
         
         # Fit scaler on numerical columns
-        numerical_cols = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 
-                         'oldbalanceDest', 'newbalanceDest', 'hour_of_day']
-        self.scaler.fit(df_processed[numerical_cols])
+        self.scaler.fit(df_processed[self.numerical_cols])
         
-    def transform(self, data: Dict[str, Any]) -> pd.DataFrame:
+    def transform(self, data: Dict[str, Any], observe: bool = True) -> "pd.DataFrame":
         """Transform a single transaction dictionary into a model-ready dataframe."""
-        # Convert dict to DataFrame
-        df = pd.DataFrame([data])
+        return self.transform_batch([data], observe=observe)
+
+    def transform_batch(self, records: List[Dict[str, Any]], observe: bool = True,
+                        velocity: Optional[np.ndarray] = None) -> "pd.DataFrame":
+        """
+        Transform a list of transaction dictionaries into one model-ready dataframe.
+        With velocity features, observe=False reads the velocity state without recording the transactions,
+        and `velocity` (the records' velocity features, computed elsewhere) bypasses the state entirely.
+        """
+        import pandas as pd
+
+        # Convert dicts to a single DataFrame (one row per transaction)
+        df = pd.DataFrame(records)
         
         # Basic preprocessing
         df_processed = self._engineer_features(df)
         
         # Scale numerical features
-        numerical_cols = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 
-                         'oldbalanceDest', 'newbalanceDest', 'hour_of_day']
-        
         # Handle case where scaler might not be fitted (for safety, though fit should be called first)
         try:
-            df_processed[numerical_cols] = self.scaler.transform(df_processed[numerical_cols])
+            df_processed[self.numerical_cols] = self.scaler.transform(df_processed[self.numerical_cols])
         except Exception:
             # Fallback if not fitted (only during initial dev/testing)
             pass
 
+        if self.velocity is not None:
+            df_processed[self.velocity.feature_names] = (
+                velocity if velocity is not None else self.velocity_features(records, observe=observe)
+            )
+
         # Ensure all columns are present (One-Hot Encoding handling)
         for col in self.feature_columns:
             if col not in df_processed.columns:
@@ -54,8 +124,144 @@ class TransactionPreprocessor:
         # Reorder to match training shape
         return df_processed[self.feature_columns]
 
-    def _engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def transform_array(self, data: Dict[str, Any], out: np.ndarray = None, observe: bool = True) -> np.ndarray:
+        """NumPy fast path for a single transaction. Returns a (1, n_features) float32 row."""
+        return self.transform_batch_array([data], out=out, observe=observe)
+
+    def transform_batch_array(self, records: List[Dict[str, Any]], out: np.ndarray = None, observe: bool = True,
+                              velocity: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Pandas-free equivalent of transform_batch().
+        Writes straight into a float32 matrix laid out like feature_columns.
+        Pass a preallocated `out` buffer (at least len(records) rows) to reuse it across calls;
+        the returned array is a view of its first len(records) rows.
+        """
+        n_rows = len(records)
+        out = self._output_buffer(n_rows, out)
+        numerical = np.empty((n_rows, len(self.numerical_cols)), dtype=np.float64)
+        for row, data in enumerate(records):
+            numerical[row, 0] = data['amount']
+            numerical[row, 1] = data['oldbalanceOrg']
+            numerical[row, 2] = data['newbalanceOrig']
+            numerical[row, 3] = data['oldbalanceDest']
+            numerical[row, 4] = data['newbalanceDest']
+            numerical[row, 5] = self._hour_of_day(data)
+
+            type_col = self.type_index.get(data.get('type'))
+            if type_col is not None:
+                out[row, type_col] = 1
+
+        self._write_numerical(out, numerical)
+        if self.velocity is not None:
+            out[:, self.base_width:] = velocity if velocity is not None else self.velocity_features(records, observe=observe)
+        return out
+
+    def transform_records_array(self, records: np.ndarray, out: np.ndarray = None, observe: bool = True) -> np.ndarray:
+        """
+        transform_batch_array() for fixed-width binary records (RECORD_DTYPE, see records.py), column by
+        column with no per-transaction Python objects. Type codes must be valid (validate_records()).
+        """
+        n_rows = len(records)
+        out = self._output_buffer(n_rows, out)
+        numerical = np.empty((n_rows, len(self.numerical_cols)), dtype=np.float64)
+        for col, name in enumerate(self.numerical_cols[:-1]):
+            numerical[:, col] = records[name]
+        # Local hour of day; a NaN timestamp gives a NaN hour, like a null transaction_time in JSON
+        local_time = records['transaction_time'] + records['utc_offset'] * 60.0
+        numerical[:, -1] = np.floor_divide(np.mod(local_time, 86400.0), 3600.0)
+
+        out[np.arange(n_rows), self._type_columns[records['type']]] = 1
+        self._write_numerical(out, numerical)
+        if self.velocity is not None:
+            times = records['transaction_time']
+            out[:, self.base_width:] = self.velocity.features(
+                record_names(records),
+                np.where(np.isnan(times), time.time(), times).tolist(),
+                records['amount'].tolist(),
+                observe=observe
+            )
+        return out
+
+    def _output_buffer(self, n_rows: int, out: Optional[np.ndarray]) -> np.ndarray:
+        """A zeroed (n_rows, n_features) float32 matrix: a new one, or a view of the caller's buffer."""
+        if out is None:
+            return np.zeros((n_rows, len(self.feature_columns)), dtype=np.float32)
+        if out.ndim != 2 or out.shape[0] < n_rows or out.shape[1] != len(self.feature_columns):
+            raise ValueError(f"Output buffer of shape {out.shape} cannot hold {n_rows} transactions")
+        out = out[:n_rows]
+        out.fill(0)
+        return out
+
+    def _write_numerical(self, out: np.ndarray, numerical: np.ndarray):
+        # Apply the fitted StandardScaler parameters directly (same float64 math as scaler.transform)
+        mean, scale = self._scaler_params()
+        if mean is not None:
+            numerical -= mean
+        if scale is not None:
+            numerical /= scale
+        out[:, self.numerical_index] = numerical
+
+    def velocity_features(self, records: List[Dict[str, Any]], observe: bool = True) -> np.ndarray:
+        """Velocity features of each record, in order. Shared by training and both serving paths."""
+        return self.velocity.features(
+            (self._velocity_key_of(data) for data in records),
+            (self._epoch_seconds(data) for data in records),
+            (float(data['amount']) for data in records),
+            observe=observe
+        )
+
+    def _velocity_key_of(self, data: Dict[str, Any]) -> Optional[str]:
+        key = data.get(self.velocity_key)
+        # Missing values come through as None from the API and as NaN from DataFrames
+        return None if key is None or (isinstance(key, float) and np.isnan(key)) else str(key)
+
+    @staticmethod
+    def _epoch_seconds(data: Dict[str, Any]) -> float:
+        """Event time of a transaction; transactions without one happen now."""
+        value = data.get('transaction_time')
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return time.time()
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                pass
+        import pandas as pd
+        return pd.Timestamp(value).timestamp()
+
+    def _scaler_params(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the (mean_, scale_) arrays to apply, or None where the scaler skips that step."""
+        if not hasattr(self._scaler, 'mean_'):
+            # Not fitted: mirror transform_batch() which leaves values unscaled
+            return None, None
+        mean = self.scaler.mean_ if self.scaler.with_mean else None
+        scale = self.scaler.scale_ if self.scaler.with_std else None
+        return mean, scale
+
+    @staticmethod
+    def _hour_of_day(data: Dict[str, Any]) -> float:
+        """Hour extraction matching pd.to_datetime(...).dt.hour, without building a Series."""
+        if 'transaction_time' not in data:
+            return DEFAULT_HOUR_OF_DAY
+        value = data['transaction_time']
+        if value is None:
+            return np.nan  # NaT in the DataFrame path
+        if isinstance(value, datetime):
+            return value.hour
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).hour
+            except ValueError:
+                pass
+        # Anything exotic (epoch numbers, odd string formats) goes through pandas' parser
+        import pandas as pd
+        return pd.Timestamp(value).hour
+
+    def _engineer_features(self, df: "pd.DataFrame") -> "pd.DataFrame":
         """Internal method to create features."""
+        import pandas as pd
         df = df.copy()
         
         # Extract time features if transaction_time exists, else assume current hour if missing
@@ -72,7 +278,24 @@ class TransactionPreprocessor:
         return df
 
     def save(self, path: str):
+        import joblib
         joblib.dump(self.scaler, os.path.join(path, "scaler.pkl"))
+        config_path = os.path.join(path, VELOCITY_CONFIG_FILE)
+        if self.velocity is not None:
+            with open(config_path, "w") as f:
+                json.dump({"windows": self.velocity.windows, "key": self.velocity_key}, f, indent=2)
+        elif os.path.exists(config_path):
+            os.remove(config_path)
 
-    def load(self, path: str):
-        self.scaler = joblib.load(os.path.join(path, "scaler.pkl"))
+    def load(self, path: str, scaler: Optional["StandardScaler"] = None):
+        """Loads the saved preprocessor; a scaler given by the caller (e.g. from a model bundle) replaces scaler.pkl."""
+        if scaler is None:
+            import joblib
+            scaler = joblib.load(os.path.join(path, "scaler.pkl"))
+        self.scaler = scaler
+        # The saved models decide whether velocity features are part of the input
+        config_path = os.path.join(path, VELOCITY_CONFIG_FILE)
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+            self.enable_velocity(config["windows"], key=config["key"])
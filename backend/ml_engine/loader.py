@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Every model version is a directory saved_models/v<N>/ holding the artifacts and this manifest
+MANIFEST_FILE = "manifest.json"
+MODEL_FILES = ("scaler.pkl", "xgb_model.pkl", "iso_forest.pkl")
+OPTIONAL_FILES = ("velocity.json", "model.bundle")
+
+_VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+
+class ModelRegistry:
+    """
+    Versioned model store: `root`/v1/, `root`/v2/, ... each with the model artifacts and a
+    manifest.json (version, creation time, SHA-256 of every artifact, feature columns and any
+    training metadata). A version only counts once its manifest is written, so a half-trained
+    directory is never picked up.
+    """
+    def __init__(self, root: str):
+        self.root = root
+
+    def versions(self) -> List[str]:
+        """Complete versions, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            match = _VERSION_PATTERN.match(name)
+            if match and os.path.exists(os.path.join(self.root, name, MANIFEST_FILE)):
+                found.append((int(match.group(1)), name))
+        return [name for _, name in sorted(found)]
+
+    def latest(self) -> Optional[str]:
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def resolve(self, version: Optional[str] = None) -> str:
+        """The requested version (or the latest one when None). Raises ValueError if it does not exist."""
+        if version is None:
+            version = self.latest()
+            if version is None:
+                raise ValueError(f"No model versions in {self.root}")
+        if not _VERSION_PATTERN.match(version) or version not in self.versions():
+            raise ValueError(f"Unknown model version '{version}'")
+        return version
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.root, self.resolve(version))
+
+    def manifest(self, version: str) -> Dict[str, Any]:
+        with open(os.path.join(self.path(version), MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def verify(self, version: str):
+        """Checks every artifact against the manifest checksums. Raises ValueError on a mismatch."""
+        path = self.path(version)
+        for name, expected in self.manifest(version)["files"].items():
+            if _sha256(os.path.join(path, name)) != expected:
+                raise ValueError(f"Checksum mismatch for {version}/{name}")
+
+    def create_version(self) -> str:
+        """Creates the directory of the next version and returns its name (no manifest yet)."""
+        numbers = [int(_VERSION_PATTERN.match(name).group(1))
+                   for name in (os.listdir(self.root) if os.path.isdir(self.root) else [])
+                   if _VERSION_PATTERN.match(name)]
+        version = f"v{max(numbers, default=0) + 1}"
+        os.makedirs(os.path.join(self.root, version))
+        return version
+
+    def write_manifest(self, version: str, **metadata: Any) -> Dict[str, Any]:
+        """Checksums the artifacts of `version` and publishes it."""
+        path = os.path.join(self.root, version)
+        files = {}
+        for name in MODEL_FILES + OPTIONAL_FILES:
+            file_path = os.path.join(path, name)
+            if os.path.exists(file_path):
+                files[name] = _sha256(file_path)
+            elif name in MODEL_FILES:
+                raise ValueError(f"{version} is missing {name}")
+        manifest = {
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "files": files,
+            **metadata,
+        }
+        tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        # Atomic publish: readers see either no manifest or a complete one
+        os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+        return manifest
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,28 +1,128 @@
-import pandas as pd
 import numpy as np
-import joblib
-import shap
 import os
-from typing import Dict, Any
+import random
+import threading
+from typing import Dict, Any, List
 # Import from local features file
 try:
     from backend.ml_engine.features import TransactionPreprocessor
+    from backend.ml_engine.engine import ENGINES, CompiledEngine
+    from backend.ml_engine.bundle import BUNDLE_FILE, ModelBundle
+    from backend.ml_engine.records import records_to_dicts
+    from backend.ml_engine.velocity import checkpoint_to_redis, restore_from_redis
+    from backend.ml_engine.timing import stage
 except ImportError:
     # Fallback to direct import if running locally
     from features import TransactionPreprocessor
+    from engine import ENGINES, CompiledEngine
+    from bundle import BUNDLE_FILE, ModelBundle
+    from records import records_to_dicts
+    from velocity import checkpoint_to_redis, restore_from_redis
+    from timing import stage
+
+# xgboost, scikit-learn, shap and joblib are only imported by load_models() (through the
+# unpickling, the engines and the explainer), so importing this module stays cheap for
+# processes that never load a model (migrations, seeding, auth-only workers)
+
+# How transactions are turned into model input:
+#   "numpy"  - pandas-free float32 fast path (TransactionPreprocessor.transform_batch_array)
+#   "pandas" - original DataFrame path (TransactionPreprocessor.transform_batch)
+FEATURE_MODES = ("numpy", "pandas")
+
+# When SHAP explanations are computed:
+#   "always"   - for every scored transaction
+#   "flagged"  - only for REVIEW / DENY verdicts
+#   "sampled"  - for a random fraction (explanation_sample_rate) of transactions
+#   "deferred" - never inline; the caller computes them later via explain_model_inputs()
+# Results without an explanation carry the model input they were scored with ("model_input", packed
+# by pack_model_inputs) so it can be explained later exactly as it was scored.
+EXPLANATION_POLICIES = ("always", "flagged", "sampled", "deferred")
+
+# Which saved artifacts load_models() reads:
+#   "auto"   - the memory-mapped model.bundle when the version has one and the engine is compiled, else the pickles
+#   "bundle" - always the bundle (compiled engine only)
+#   "pickle" - always the joblib pickles
+MODEL_FORMATS = ("auto", "bundle", "pickle")
+
+# Stored model inputs: one little-endian float64 per feature column (exact for both feature modes)
+MODEL_INPUT_DTYPE = np.dtype("<f8")
+
+
+def pack_model_inputs(X_values: np.ndarray) -> List[bytes]:
+    """One packed model input per row of X_values."""
+    packed = np.ascontiguousarray(X_values, dtype=MODEL_INPUT_DTYPE)
+    return [row.tobytes() for row in packed]
+
+
+def unpack_model_inputs(model_inputs: List[bytes], n_features: int) -> np.ndarray:
+    """Stacks packed model inputs back into rows. Raises ValueError when one has another number of features."""
+    width = n_features * MODEL_INPUT_DTYPE.itemsize
+    for model_input in model_inputs:
+        if len(model_input) != width:
+            raise ValueError(
+                f"Model input of {len(model_input)} bytes does not hold the {n_features} features of this model"
+            )
+    return np.frombuffer(b"".join(model_inputs), dtype=MODEL_INPUT_DTYPE).reshape(len(model_inputs), n_features)
 
 class FraudPredictor:
-    def __init__(self, model_dir: str):
+    def __init__(
+        self,
+        model_dir: str,
+        feature_mode: str = "numpy",
+        engine: str = "compiled",
+        explanation_policy: str = "always",
+        explanation_sample_rate: float = 0.1,
+        velocity_max_keys: int = 100_000,
+        model_format: str = "auto"
+    ):
+        if feature_mode not in FEATURE_MODES:
+            raise ValueError(f"Unknown feature_mode '{feature_mode}', expected one of {FEATURE_MODES}")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {tuple(ENGINES)}")
+        if explanation_policy not in EXPLANATION_POLICIES:
+            raise ValueError(f"Unknown explanation_policy '{explanation_policy}', expected one of {EXPLANATION_POLICIES}")
+        if model_format not in MODEL_FORMATS:
+            raise ValueError(f"Unknown model_format '{model_format}', expected one of {MODEL_FORMATS}")
+        if model_format == "bundle" and engine != "compiled":
+            raise ValueError("The bundle model format requires the compiled engine")
         self.model_dir = model_dir
-        self.preprocessor = TransactionPreprocessor()
+        self.feature_mode = feature_mode
+        self.engine_name = engine
+        self.explanation_policy = explanation_policy
+        self.explanation_sample_rate = explanation_sample_rate
+        self.model_format = model_format
+        # Velocity features are switched on by load_models() when the saved models use them
+        self.preprocessor = TransactionPreprocessor(velocity_max_keys=velocity_max_keys)
         self.xgb_model = None
         self.iso_forest = None
+        self.engine = None
         self.explainer = None
+        self.bundle = None
+        self._explainer_lock = threading.Lock()
+        # Candidate models scored next to this one (see add_shadow and services/shadow.py's ShadowScorer)
+        self.shadows: Dict[str, "FraudPredictor"] = {}
         
     def load_models(self):
         """Loads the pre-trained models and scaler."""
         print(f"Loading models from {self.model_dir}...")
+        bundle_path = os.path.join(self.model_dir, BUNDLE_FILE)
+        use_bundle = self.model_format == "bundle" or (
+            self.model_format == "auto" and self.engine_name == "compiled" and os.path.exists(bundle_path)
+        )
+        if use_bundle:
+            self._load_bundle(bundle_path)
+        else:
+            self._load_pickles()
+
+        # The SHAP explainer is only built up front when explanations are computed inline
+        if self.explanation_policy != "deferred":
+            self._get_explainer()
         
+        print("Models loaded successfully.")
+
+    def _load_pickles(self):
+        import joblib
+
         # Load Scaler (Preprocessor)
         self.preprocessor.load(self.model_dir)
         
@@ -31,74 +131,221 @@ class FraudPredictor:
         
         # Load Isolation Forest
         self.iso_forest = joblib.load(os.path.join(self.model_dir, "iso_forest.pkl"))
-        
-        # Initialize SHAP Explainer (TreeExplainer is optimized for XGBoost)
-        # We use a small background dataset if needed, but for TreeExplainer it's often optional or model-based
-        # For speed, we rely on the model structure itself
-        self.explainer = shap.TreeExplainer(self.xgb_model)
-        
-        print("Models loaded successfully.")
+
+        # Scoring engine (native wrappers or flattened NumPy trees), built once from the loaded models
+        self.engine = ENGINES[self.engine_name](self.xgb_model, self.iso_forest)
+
+    def _load_bundle(self, path: str):
+        # Already compiled trees, viewed straight from the memory-mapped file (shared by every process)
+        self.bundle = ModelBundle(path)
+        self.preprocessor.load(self.model_dir, scaler=self.bundle.scaler())
+        self.engine = CompiledEngine.from_compiled(self.bundle.compiled_xgb(), self.bundle.compiled_iso())
+
+    def _get_explainer(self):
+        if self.explainer is None:
+            with self._explainer_lock:
+                if self.explainer is None:
+                    import shap
+                    # Initialize SHAP Explainer (TreeExplainer is optimized for XGBoost)
+                    # We use a small background dataset if needed, but for TreeExplainer it's often optional or model-based
+                    # For speed, we rely on the model structure itself
+                    model = self.xgb_model if self.xgb_model is not None else self.bundle.booster()
+                    self.explainer = shap.TreeExplainer(model)
+        return self.explainer
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.engine is not None
 
     def predict(self, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Predicts fraud probability and returns SHAP explanation.
         """
-        if not self.xgb_model:
+        return self.predict_batch([transaction_data])[0]
+
+    def predict_batch(self, transactions: List[Dict[str, Any]], velocity: np.ndarray = None) -> List[Dict[str, Any]]:
+        """
+        Scores a list of transactions in one vectorized pass.
+        Each model (and SHAP) runs once for the whole batch instead of once per row.
+        `velocity` supplies the velocity features of the transactions (computed by whoever tracks
+        them, e.g. for shadow models); this predictor's velocity state is then left untouched.
+        `explanation_status` tells whether SHAP ran for a row ("ready"), was skipped by the
+        explanation policy ("skipped") or is left to a background worker ("deferred"); those rows
+        also carry their packed `model_input` for explain_model_inputs().
+        """
+        if not self.is_loaded:
             raise Exception("Models not loaded. Call load_models() first.")
+        if not transactions:
+            return []
             
         # 1. Preprocess
-        # ensures the dataframe has the exact same columns as training
-        X_input = self.preprocessor.transform(transaction_data)
-        
+        with stage("preprocess"):
+            X_input, X_values = self._transform(transactions, velocity=velocity)
+        return self._score(X_input, X_values)
+
+    def predict_records(self, records: np.ndarray) -> List[Dict[str, Any]]:
+        """predict_batch() for fixed-width binary records (see records.py), preprocessed column-wise."""
+        if not self.is_loaded:
+            raise Exception("Models not loaded. Call load_models() first.")
+        if not len(records):
+            return []
+        with stage("preprocess"):
+            if self.feature_mode == "numpy":
+                X_input = self.preprocessor.transform_records_array(records)
+                X_values = X_input
+            else:
+                X_input, X_values = self._transform(records_to_dicts(records))
+        return self._score(X_input, X_values)
+
+    def _score(self, X_input: Any, X_values: np.ndarray) -> List[Dict[str, Any]]:
+        """Verdicts (and the explanations the policy asks for) of preprocessed transactions."""
         # 2. XGBoost Prediction (Supervised) - Primary Signal
-        # proba returns [prob_legit, prob_fraud]
-        fraud_prob = self.xgb_model.predict_proba(X_input)[0][1]
+        with stage("xgboost"):
+            fraud_probs = self.engine.fraud_proba(X_input)
         
         # 3. Isolation Forest Prediction (Unsupervised) - Secondary Signal
-        # Returns -1 for anomaly, 1 for normal
-        iso_pred = self.iso_forest.predict(X_input)[0]
-        is_anomaly = True if iso_pred == -1 else False
-        
-        # 4. Generate Explainability (SHAP)
-        shap_values = self.explainer.shap_values(X_input)
-        
-        # SHAP returns a matrix, we want the first (and only) row
-        # For binary classification, sometimes it returns a list. XGBoost usually returns raw log odds.
-        if isinstance(shap_values, list):
-             shap_values = shap_values[1] # Class 1 (Fraud)
-
-        # Map SHAP values to feature names for the API response
-        # X_input is a DataFrame, so columns are available
-        feature_names = X_input.columns.tolist()
-        # Shap values might be (1, N) or (N,)
-        shap_array = shap_values[0] if len(shap_values.shape) > 1 else shap_values
-        
-        explanation = []
-        for name, value in zip(feature_names, shap_array):
-            explanation.append({
-                "feature": name,
-                "impact": float(value),  # Convert to standard float for JSON serialization
-                "value": float(X_input.iloc[0][name]) # What was the actual input value?
-            })
-            
-        # Sort by absolute impact to show most important reasons first
-        explanation.sort(key=lambda x: abs(x["impact"]), reverse=True)
+        with stage("isolation_forest"):
+            anomalies = self.engine.anomalies(X_input)
         
-        # 5. Final Verdict Logic
+        # 4. Final Verdict Logic
         # We combine both signals. 
         # If Prob > 0.8 -> DENY
         # If Prob > 0.5 OR Anomaly -> REVIEW
         # Else -> ALLOW
-        
-        verdict = "ALLOW"
-        if fraud_prob > 0.8:
-            verdict = "DENY"
-        elif fraud_prob > 0.4 or is_anomaly:
-            verdict = "REVIEW"
+        verdicts = []
+        for fraud_prob, is_anomaly in zip(fraud_probs, anomalies):
+            verdict = "ALLOW"
+            if fraud_prob > 0.8:
+                verdict = "DENY"
+            elif fraud_prob > 0.4 or is_anomaly:
+                verdict = "REVIEW"
+            verdicts.append(verdict)
+
+        # 5. Generate Explainability (SHAP), only for the rows the policy asks for
+        explain_rows = [row for row, verdict in enumerate(verdicts) if self._should_explain(verdict)]
+        explanations = {}
+        if explain_rows:
+            subset = X_input[explain_rows] if isinstance(X_input, np.ndarray) else X_input.iloc[explain_rows]
+            explanations = dict(zip(explain_rows, self.explain(subset, X_values[explain_rows])))
+        skipped_status = "deferred" if self.explanation_policy == "deferred" else "skipped"
+        unexplained = [row for row in range(len(verdicts)) if row not in explanations]
+        model_inputs = dict(zip(unexplained, pack_model_inputs(X_values[unexplained])))
             
-        return {
-            "risk_score": float(fraud_prob),
-            "verdict": verdict,
-            "anomaly_detected": is_anomaly,
-            "explanation": explanation[:5] # Top 5 factors
-        }
+        results = []
+        for row, (fraud_prob, is_anomaly, verdict) in enumerate(zip(fraud_probs, anomalies, verdicts)):
+            result = {
+                "risk_score": float(fraud_prob),
+                "verdict": verdict,
+                "anomaly_detected": bool(is_anomaly),
+                "explanation": explanations.get(row, []),
+                "explanation_status": "ready" if row in explanations else skipped_status
+            }
+            if row in model_inputs:
+                result["model_input"] = model_inputs[row]
+            results.append(result)
+        return results
+
+    def explain_model_inputs(self, model_inputs: List[bytes]) -> List[List[Dict[str, Any]]]:
+        """
+        Top SHAP factors of already scored transactions, from the `model_input` of their results:
+        the same explanation the "always" policy would have given when they were scored.
+        Raises ValueError for inputs scored by a model with other features.
+        """
+        if not self.is_loaded:
+            raise Exception("Models not loaded. Call load_models() first.")
+        if not model_inputs:
+            return []
+        X_values = unpack_model_inputs(model_inputs, len(self.preprocessor.feature_columns))
+        # The fast path scores float32 rows; float64 holds them exactly
+        X_input = X_values.astype(np.float32) if self.feature_mode == "numpy" else X_values
+        return self.explain(X_input, X_input)
+
+    def explain_transactions(self, transactions: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Computes the top SHAP factors for each transaction regardless of the explanation policy.
+        The input is rebuilt from the transactions with the velocity state as it is now; prefer
+        explain_model_inputs() for transactions that were already scored.
+        """
+        if not self.is_loaded:
+            raise Exception("Models not loaded. Call load_models() first.")
+        if not transactions:
+            return []
+        # These were already scored: read the velocity state without counting them a second time
+        with stage("preprocess"):
+            X_input, X_values = self._transform(transactions, observe=False)
+        return self.explain(X_input, X_values)
+
+    def explain(self, X_input: Any, X_values: np.ndarray) -> List[List[Dict[str, Any]]]:
+        """Runs SHAP once over the model-ready rows and returns the top factors per row."""
+        explainer = self._get_explainer()
+        with stage("shap"):
+            shap_values = explainer.shap_values(X_input)
+        
+        # For binary classification, sometimes it returns a list. XGBoost usually returns raw log odds.
+        if isinstance(shap_values, list):
+             shap_values = shap_values[1] # Class 1 (Fraud)
+        shap_values = np.asarray(shap_values).reshape(len(X_values), -1)
+
+        return self._build_explanations(self.preprocessor.feature_columns, X_values, shap_values)
+
+    def _transform(self, transactions: List[Dict[str, Any]], observe: bool = True, velocity: np.ndarray = None):
+        """
+        Model-ready input plus the same values as a plain array (for explanations).
+        Ensures the input has the exact same columns (and order) as training.
+        """
+        if self.feature_mode == "numpy":
+            X_input = self.preprocessor.transform_batch_array(transactions, observe=observe, velocity=velocity)
+            return X_input, X_input
+        X_input = self.preprocessor.transform_batch(transactions, observe=observe, velocity=velocity)
+        return X_input, X_input.to_numpy(dtype=np.float64)
+
+    def add_shadow(self, name: str, shadow: "FraudPredictor"):
+        """
+        Attaches a loaded candidate model. Shadows never influence the verdicts of this predictor;
+        they are scored separately (off the response path) by backend/app/services/shadow.py.
+        """
+        if not shadow.is_loaded:
+            raise Exception("Shadow models must be loaded before they are attached.")
+        self.shadows[name] = shadow
+
+    def velocity_stats(self) -> Dict[str, Any]:
+        """State of the velocity feature store, or None when the models don't use velocity features."""
+        velocity = self.preprocessor.velocity
+        return velocity.stats() if velocity is not None else None
+
+    def checkpoint_velocity(self, redis_url: str) -> bool:
+        if self.preprocessor.velocity is None:
+            return False
+        checkpoint_to_redis(self.preprocessor.velocity, redis_url)
+        return True
+
+    def restore_velocity(self, redis_url: str) -> bool:
+        if self.preprocessor.velocity is None:
+            return False
+        return restore_from_redis(self.preprocessor.velocity, redis_url)
+
+    def _should_explain(self, verdict: str) -> bool:
+        if self.explanation_policy == "always":
+            return True
+        if self.explanation_policy == "flagged":
+            return verdict != "ALLOW"
+        if self.explanation_policy == "sampled":
+            return random.random() < self.explanation_sample_rate
+        return False
+
+    @staticmethod
+    def _build_explanations(feature_names: List[str], values: np.ndarray, shap_values: np.ndarray, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Top-k SHAP factors per row, sorted by absolute impact (most important reasons first)."""
+        # Stable sort keeps the original feature order for ties, like list.sort() did
+        order = np.argsort(-np.abs(shap_values), axis=1, kind="stable")[:, :top_k]
+        explanations = []
+        for row, idx in enumerate(order):
+            explanations.append([
+                {
+                    "feature": feature_names[i],
+                    "impact": float(shap_values[row, i]),  # Convert to standard float for JSON serialization
+                    "value": float(values[row, i])  # What was the actual input value?
+                }
+                for i in idx
+            ])
+        return explanations
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Compact alternative to the JSON transaction payload for high-volume clients: a request body
+# is a plain concatenation of fixed-width little-endian records (no header, no padding), so the
+# server views it as a NumPy structured array without parsing anything.
+
+# Type code of a record = index in this tuple
+TRANSACTION_TYPES = ('PAYMENT', 'TRANSFER', 'CASH_OUT', 'DEBIT', 'CASH_IN')
+
+# Bytes reserved for nameOrig (UTF-8, NUL padded; all NULs when unknown)
+NAME_SIZE = 24
+
+RECORD_DTYPE = np.dtype([
+    ('amount', '<f8'),
+    ('oldbalanceOrg', '<f8'),
+    ('newbalanceOrig', '<f8'),
+    ('oldbalanceDest', '<f8'),
+    ('newbalanceDest', '<f8'),
+    # Epoch seconds; NaN when the transaction has no timestamp
+    ('transaction_time', '<f8'),
+    # Minutes east of UTC of the transaction's local time (hour_of_day is the local hour)
+    ('utc_offset', '<i2'),
+    ('type', 'u1'),
+    ('nameOrig', f'S{NAME_SIZE}'),
+])
+
+_BALANCE_FIELDS = ('oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest')
+_MAX_UTC_OFFSET = 24 * 60 - 1
+
+
+def decode_records(body: bytes) -> np.ndarray:
+    """Views a request body as records (zero copy, read-only). Raises ValueError on a partial record."""
+    if len(body) % RECORD_DTYPE.itemsize:
+        raise ValueError(
+            f"Body of {len(body)} bytes is not a whole number of {RECORD_DTYPE.itemsize} byte records"
+        )
+    return np.frombuffer(body, dtype=RECORD_DTYPE)
+
+
+def validate_records(records: np.ndarray) -> List[Tuple[int, str, str]]:
+    """
+    The constraints TransactionBase enforces on JSON payloads, checked column-wise.
+    Returns (record index, field, message) for every violation, in record order.
+    """
+    checks = [(~(records['amount'] > 0), 'amount', "Input should be greater than 0")]
+    # Written as negations so NaN fails like it does in pydantic
+    checks += [(~(records[field] >= 0), field, "Input should be greater than or equal to 0") for field in _BALANCE_FIELDS]
+    checks += [
+        (records['type'] >= len(TRANSACTION_TYPES), 'type', f"Type code should be below {len(TRANSACTION_TYPES)}"),
+        (np.isinf(records['transaction_time']), 'transaction_time', "Input should be a finite number or NaN"),
+        (np.abs(records['utc_offset'].astype(np.int32)) > _MAX_UTC_OFFSET, 'utc_offset',
+         f"Input should be within +/-{_MAX_UTC_OFFSET} minutes"),
+    ]
+    problems = [(int(row), field, message) for mask, field, message in checks for row in np.flatnonzero(mask)]
+    return sorted(problems, key=lambda problem: problem[0])
+
+
+def encode_records(transactions: Iterable[Dict[str, Any]]) -> bytes:
+    """Packs JSON-style transaction dicts (as accepted by /analyze) into a records body. Used by clients and tests."""
+    transactions = list(transactions)
+    records = np.zeros(len(transactions), dtype=RECORD_DTYPE)
+    for row, data in enumerate(transactions):
+        for field in ('amount',) + _BALANCE_FIELDS:
+            records[row][field] = data[field]
+        records[row]['type'] = TRANSACTION_TYPES.index(data['type'])
+        records[row]['transaction_time'], records[row]['utc_offset'] = _encode_time(data.get('transaction_time'))
+        name = (data.get('nameOrig') or '').encode()
+        if len(name) > NAME_SIZE:
+            raise ValueError(f"nameOrig is longer than {NAME_SIZE} bytes")
+        records[row]['nameOrig'] = name
+    return records.tobytes()
+
+
+def _encode_time(value: Any) -> Tuple[float, int]:
+    if value is None:
+        return np.nan, 0
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        # Naive times are local wall-clock times, as in the JSON path
+        value = value.astimezone()
+    return value.timestamp(), int(value.utcoffset().total_seconds() // 60)
+
+
+def record_names(records: np.ndarray) -> List[Optional[str]]:
+    """nameOrig of each record, None when unset."""
+    # tolist() strips the NUL padding of fixed-width byte strings
+    return [name.decode('utf-8', 'replace') if name else None for name in records['nameOrig'].tolist()]
+
+
+def records_to_dicts(records: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    The records as the dicts TransactionCreate.model_dump() gives for the same transactions.
+    Only what still needs rows pays for this (persistence, deferred explanations, shadow models).
+    """
+    columns = {field: records[field].tolist() for field in ('amount',) + _BALANCE_FIELDS}
+    columns['type'] = [TRANSACTION_TYPES[code] for code in records['type'].tolist()]
+    columns['transaction_time'] = [
+        None if np.isnan(epoch) else datetime.fromtimestamp(epoch, timezone(timedelta(minutes=offset)))
+        for epoch, offset in zip(records['transaction_time'].tolist(), records['utc_offset'].tolist())
+    ]
+    columns['nameOrig'] = record_names(records)
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
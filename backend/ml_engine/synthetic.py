@@ -0,0 +1,180 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Scalable PaySim-style synthetic transactions. Chunks are generated independently (seeded by
+# (seed, chunk index)), fully vectorized, so a dataset of hundreds of millions of rows is written
+# part by part, in parallel, without ever being in memory. The output depends on the seed and the
+# chunk size (each chunk draws its own random stream): the same pair gives the same dataset however
+# many workers write it, a different chunk size gives a different dataset.
+
+TYPES = np.array(["CASH_IN", "CASH_OUT", "DEBIT", "PAYMENT", "TRANSFER"])
+# PaySim's transaction type mix
+TYPE_WEIGHTS = np.array([0.22, 0.35, 0.01, 0.34, 0.08])
+# log-normal (mu, sigma) of the amount per type, same order as TYPES
+AMOUNT_PARAMS = np.array([(11.0, 1.2), (11.0, 1.2), (8.0, 1.2), (8.5, 1.1), (12.0, 1.3)])
+# Types that take money out of the originating account
+_OUTFLOW = np.isin(TYPES, ["CASH_OUT", "DEBIT", "PAYMENT", "TRANSFER"])
+# Types paid to merchants (PaySim keeps no balances for them)
+_TO_MERCHANT = np.isin(TYPES, ["DEBIT", "PAYMENT"])
+_TRANSFER = int(np.flatnonzero(TYPES == "TRANSFER")[0])
+_CASH_OUT = int(np.flatnonzero(TYPES == "CASH_OUT")[0])
+_PAYMENT = int(np.flatnonzero(TYPES == "PAYMENT")[0])
+
+COLUMNS = [
+    "transaction_time", "type", "amount", "nameOrig", "oldbalanceOrg", "newbalanceOrig",
+    "nameDest", "oldbalanceDest", "newbalanceDest", "isFraud",
+]
+FORMATS = ("parquet", "csv")
+
+
+@dataclass
+class SyntheticConfig:
+    n_accounts: int = 1_000_000
+    n_merchants: int = 100_000
+    # Larger skew: a few accounts make most transactions (u ** skew over the account pool)
+    account_skew: float = 1.5
+    start: datetime = datetime(2024, 1, 1)
+    # Simulated arrival rate (a Poisson process), in transactions per second
+    rate: float = 50.0
+    # Account takeover: a TRANSFER or CASH_OUT draining the whole balance
+    takeover_rate: float = 0.001
+    # A PAYMENT 20-50x larger than usual
+    anomaly_rate: float = 0.0005
+    # Velocity bursts: one account firing 3-8 TRANSFERs back to back; all but the first two are fraud
+    burst_rate: float = 0.0002
+
+
+def _account_names(prefix, ids: np.ndarray) -> np.ndarray:
+    """Names like C1234; `prefix` is one string or an array with one per row."""
+    if isinstance(prefix, np.ndarray):
+        prefix = pd.Series(prefix, copy=False)
+    return (prefix + pd.Series(ids, copy=False).astype(str)).to_numpy(dtype=object)
+
+
+def generate_chunk(chunk_index: int, n_rows: int, chunk_size: int, seed: int = 42,
+                   config: Optional[SyntheticConfig] = None) -> pd.DataFrame:
+    """Rows [chunk_index * chunk_size, + n_rows) of the dataset (n_rows <= chunk_size), oldest first."""
+    config = config or SyntheticConfig()
+    rng = np.random.default_rng([seed, chunk_index])
+
+    # Poisson arrivals: given the count, the times are uniform over the chunk's span
+    span = chunk_size / config.rate
+    offsets = np.sort(rng.uniform(0.0, n_rows / config.rate, n_rows)) + chunk_index * span
+    times = np.datetime64(config.start, "us") + (offsets * 1e6).astype("timedelta64[us]")
+
+    kinds = rng.choice(len(TYPES), n_rows, p=TYPE_WEIGHTS)
+    mu, sigma = AMOUNT_PARAMS[kinds, 0], AMOUNT_PARAMS[kinds, 1]
+    amount = np.round(rng.lognormal(mu, sigma), 2) + 0.01
+    origin = (config.n_accounts * rng.random(n_rows) ** config.account_skew).astype(np.int64)
+    old_org = np.round(np.where(rng.random(n_rows) < 0.3, 0.0, rng.lognormal(10.5, 1.5, n_rows)), 2)
+    to_merchant = _TO_MERCHANT[kinds]
+    dest = np.where(to_merchant, rng.integers(0, config.n_merchants, n_rows),
+                    (config.n_accounts * rng.random(n_rows) ** config.account_skew).astype(np.int64))
+    old_dest = np.where(to_merchant, 0.0, np.round(rng.lognormal(11.0, 2.0, n_rows), 2))
+    fraud = np.zeros(n_rows, dtype=np.int8)
+
+    takeover = rng.random(n_rows) < config.takeover_rate
+    kinds[takeover] = np.where(rng.random(int(takeover.sum())) < 0.5, _TRANSFER, _CASH_OUT)
+    old_org[takeover] = np.maximum(old_org[takeover], np.round(rng.lognormal(11.0, 1.0, int(takeover.sum())), 2))
+    amount[takeover] = old_org[takeover]
+    fraud[takeover] = 1
+
+    anomaly = (rng.random(n_rows) < config.anomaly_rate) & ~takeover
+    kinds[anomaly] = _PAYMENT
+    amount[anomaly] = np.round(np.exp(AMOUNT_PARAMS[_PAYMENT, 0]) * rng.uniform(20, 50, int(anomaly.sum())), 2)
+    fraud[anomaly] = 1
+
+    n_bursts = rng.binomial(max(n_rows - 8, 0), config.burst_rate) if n_rows > 8 else 0
+    if n_bursts:
+        starts = np.sort(rng.choice(n_rows - 8, n_bursts, replace=False))
+        starts = starts[np.concatenate([[True], np.diff(starts) > 8])]
+        lengths = rng.integers(3, 9, len(starts))
+        rows = np.repeat(starts, lengths)
+        position = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        rows = rows + position
+        origin[rows] = np.repeat(origin[starts], lengths)
+        kinds[rows] = _TRANSFER
+        amount[rows] = np.round(rng.lognormal(9.0, 0.5, len(rows)), 2)
+        old_org[rows] = np.repeat(np.round(rng.lognormal(11.5, 0.5, len(starts)), 2), lengths)
+        fraud[rows[position >= 2]] = 1
+
+    # Recomputed after the fraud patterns changed types and amounts
+    outflow, to_merchant = _OUTFLOW[kinds], _TO_MERCHANT[kinds]
+    new_org = np.where(outflow, np.maximum(old_org - amount, 0.0), old_org + amount)
+    old_dest = np.where(to_merchant, 0.0, old_dest)
+    new_dest = np.where(to_merchant, 0.0, np.where(outflow, old_dest + amount, np.maximum(old_dest - amount, 0.0)))
+
+    return pd.DataFrame({
+        "transaction_time": times,
+        "type": TYPES[kinds],
+        "amount": amount,
+        "nameOrig": _account_names("C", origin),
+        "oldbalanceOrg": old_org,
+        "newbalanceOrig": np.round(new_org, 2),
+        "nameDest": _account_names(np.where(to_merchant, "M", "C"), dest),
+        "oldbalanceDest": old_dest,
+        "newbalanceDest": np.round(new_dest, 2),
+        "isFraud": fraud,
+    }, columns=COLUMNS)
+
+
+def iter_chunks(n_rows: int, chunk_size: int = 1_000_000, seed: int = 42,
+                config: Optional[SyntheticConfig] = None) -> Iterator[pd.DataFrame]:
+    """The dataset as a stream of chunks (e.g. straight into trainer.train_models_streaming)."""
+    for chunk_index in range(-(-n_rows // chunk_size)):
+        yield generate_chunk(chunk_index, min(chunk_size, n_rows - chunk_index * chunk_size), chunk_size, seed, config)
+
+
+def _write_part(out_dir: str, chunk_index: int, n_rows: int, chunk_size: int, seed: int,
+                config: Optional[SyntheticConfig], fmt: str) -> str:
+    df = generate_chunk(chunk_index, n_rows, chunk_size, seed, config)
+    path = os.path.join(out_dir, f"part-{chunk_index:05d}.{fmt}")
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def write_dataset(out_dir: str, n_rows: int, chunk_size: int = 1_000_000, seed: int = 42,
+                  fmt: str = "parquet", workers: int = 1, config: Optional[SyntheticConfig] = None) -> List[str]:
+    """Writes the dataset as one file per chunk (part-00000.parquet, ...). Returns the paths in order."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Writing Parquet needs pyarrow (pip install pyarrow), or use fmt='csv'") from e
+    os.makedirs(out_dir, exist_ok=True)
+    n_chunks = -(-n_rows // chunk_size)
+    args = [(out_dir, i, min(chunk_size, n_rows - i * chunk_size), chunk_size, seed, config, fmt) for i in range(n_chunks)]
+    if workers <= 1:
+        return [_write_part(*part) for part in args]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_write_part, *zip(*args)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic PaySim-style transaction dataset.")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True, help="Output directory (one file per chunk)")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000,
+                        help="Rows per file; part of what the data depends on, with --seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--accounts", type=int, help="Originating account pool (default: rows / 10)")
+    args = parser.parse_args()
+    config = SyntheticConfig(n_accounts=args.accounts or max(args.rows // 10, 1))
+    paths = write_dataset(args.out, args.rows, args.chunk_size, args.seed, args.format, args.workers, config)
+    print(f"{args.rows} transactions written to {len(paths)} files in {args.out}")
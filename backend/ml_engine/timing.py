@@ -0,0 +1,38 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+# Per-stage timing hooks for the predictor. A stage always costs two perf_counter() calls; the
+# durations are only kept while the calling thread is inside collect(), which is how the inference
+# executor gathers them per call (in its worker thread or process) and hands them back to the
+# event loop, where they are aggregated into histograms (backend/app/core/metrics.py).
+
+_local = threading.local()
+
+
+class stage:
+    """Times the block it wraps as `name`: `with stage("xgboost"): ...`."""
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        timings = getattr(_local, "timings", None)
+        if timings is not None:
+            timings.append((self.name, time.perf_counter() - self.started))
+
+
+@contextmanager
+def collect() -> Iterator[List[Tuple[str, float]]]:
+    """Collects the (stage, seconds) of every stage run by this thread inside the block."""
+    previous = getattr(_local, "timings", None)
+    _local.timings = timings = []
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
@@ -4,26 +4,40 @@ import xgboost as xgb
 from sklearn.ensemble import IsolationForest
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
+import argparse
 import joblib
 import os
+import tempfile
 import time
 
 # Import our preprocessor
 # Note: In a real package structure, this might be backend.ml_engine.features
 try:
+    from backend.ml_engine.bundle import export_bundle
+    from backend.ml_engine.datasets import LABEL_COLUMN, iter_file_chunks, iter_table_chunks, prefetch
     from backend.ml_engine.features import TransactionPreprocessor
+    from backend.ml_engine.loader import ModelRegistry
+    from backend.ml_engine.synthetic import SyntheticConfig, iter_chunks as iter_synthetic_chunks
+    from backend.ml_engine.velocity import VELOCITY_WINDOWS
 except ImportError:
     # Fallback for running script directly from backend/
     import sys
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+    from backend.ml_engine.bundle import export_bundle
+    from backend.ml_engine.datasets import LABEL_COLUMN, iter_file_chunks, iter_table_chunks, prefetch
     from backend.ml_engine.features import TransactionPreprocessor
+    from backend.ml_engine.loader import ModelRegistry
+    from backend.ml_engine.synthetic import SyntheticConfig, iter_chunks as iter_synthetic_chunks
+    from backend.ml_engine.velocity import VELOCITY_WINDOWS
 
+# Model registry root: every training run publishes a new version directory (v1/, v2/, ...)
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "saved_models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-def generate_synthetic_data(n_samples=5000):
+def generate_synthetic_data(n_samples=5000, with_accounts=False):
     """
     Generates a synthetic dataset resembling financial transactions.
+    with_accounts adds originating accounts (nameOrig) and a burst fraud pattern for velocity features.
     """
     print(f"Generating {n_samples} synthetic transactions...")
     np.random.seed(42)
@@ -52,16 +66,44 @@ def generate_synthetic_data(n_samples=5000):
     # Pattern 2: Anomaly - High amount for 'PAYMENT'
     mask_fraud_2 = (df['type'] == 'PAYMENT') & (df['amount'] > 500)
     df.loc[mask_fraud_2, 'isFraud'] = 1
+
+    if with_accounts:
+        _add_accounts(df)
     
     print(f"Data generated. Fraud Rate: {df['isFraud'].mean():.2%}")
     return df
 
-def train_models():
-    """Main training pipeline."""
-    df = generate_synthetic_data(10000)
-    
-    # 1. Preprocessing
-    preprocessor = TransactionPreprocessor()
+def _add_accounts(df, n_accounts=None, n_bursts=40, burst_length=6):
+    """
+    Assigns originating accounts and plants bursts: one account firing several
+    TRANSFERs in consecutive minutes (a pattern only velocity features can see).
+    Uses its own random stream so the base columns stay identical to with_accounts=False.
+    """
+    rng = np.random.RandomState(7)
+    n_accounts = n_accounts or max(len(df) // 20, 1)
+    df['nameOrig'] = [f"C{i}" for i in rng.randint(0, n_accounts, len(df))]
+    for start in rng.choice(len(df) - burst_length, n_bursts, replace=False):
+        rows = df.index[start:start + burst_length]
+        df.loc[rows, 'nameOrig'] = f"C_burst_{start}"
+        df.loc[rows, 'type'] = 'TRANSFER'
+        # The first transfers look normal; the later ones in the burst are the fraud
+        df.loc[rows[2:], 'isFraud'] = 1
+
+def _engineer(df, preprocessor):
+    """Feature engineering shared by both training modes: returns the model matrix X and the labels y."""
+    if preprocessor.velocity is not None:
+        # Replay the transactions in time order through the same store serving uses. The columns
+        # go in as arrays (no per-row dicts) with the keys and epoch seconds velocity_features() derives
+        keys = df['nameOrig'].astype(str).to_numpy(dtype=object)
+        keys[df['nameOrig'].isna().to_numpy()] = None
+        times = df['transaction_time']
+        if times.dt.tz is not None:
+            times = times.dt.tz_convert(None)
+        # pd.Timestamp.timestamp(): naive times are UTC, rounded to microseconds
+        seconds = np.round(times.to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9, 6)
+        df[preprocessor.velocity.feature_names] = preprocessor.velocity.features(
+            keys, seconds, df['amount'].to_numpy(dtype=np.float64)
+        )
     # Need to engineer features first before split to handle OneHot columns correctly across all
     df['hour_of_day'] = df['transaction_time'].dt.hour
     df = pd.get_dummies(df, columns=['type'], prefix='type')
@@ -74,17 +116,48 @@ def train_models():
         if col not in df.columns:
             df[col] = 0
             
-    X = df[expected_cols]
-    y = df['isFraud']
+    return df[expected_cols], df[LABEL_COLUMN]
+
+def _publish(registry, version, preprocessor, xgb_model, iso_forest, trainer, metrics):
+    """Saves the pickles and the model bundle of a trained version, then publishes its manifest."""
+    version_dir = os.path.join(registry.root, version)
+    joblib.dump(xgb_model, os.path.join(version_dir, "xgb_model.pkl"))
+    joblib.dump(iso_forest, os.path.join(version_dir, "iso_forest.pkl"))
+
+    # Export the memory-mappable bundle the API loads instead of the pickles
+    print("Exporting model bundle...")
+    export_bundle(version_dir, xgb_model, iso_forest, preprocessor.scaler, preprocessor.feature_columns)
+
+    # Publish the version (until the manifest exists the registry ignores the directory)
+    registry.write_manifest(version, feature_columns=preprocessor.feature_columns, trainer=trainer, metrics=metrics)
+    print(f"All models saved to {version_dir}")
+
+def train_models(velocity=False, n_samples=10000, nthread=None):
+    """
+    Main training pipeline. velocity=True adds per-account velocity features (see velocity.py).
+    nthread: cores for XGBoost and the Isolation Forest (default: all of them).
+    Returns the new model version; the API serves it after a restart or a reload via /api/v1/models/reload.
+    """
+    nthread = nthread or os.cpu_count()
+    registry = ModelRegistry(MODEL_DIR)
+    version = registry.create_version()
+    version_dir = os.path.join(MODEL_DIR, version)
+
+    df = generate_synthetic_data(n_samples, with_accounts=velocity)
+    
+    # 1. Preprocessing
+    preprocessor = TransactionPreprocessor(velocity_windows=VELOCITY_WINDOWS if velocity else None)
+    if velocity:
+        df = df.sort_values('transaction_time', kind='stable').reset_index(drop=True)
+    X, y = _engineer(df, preprocessor)
     
     # Fit scaler
-    numerical_cols = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 
-                     'oldbalanceDest', 'newbalanceDest', 'hour_of_day']
+    numerical_cols = preprocessor.numerical_cols
     preprocessor.scaler.fit(X[numerical_cols])
     
     # Save the preprocessor
     print("Saving preprocessor...")
-    preprocessor.save(MODEL_DIR)
+    preprocessor.save(version_dir)
     
     # Apply scaling
     X_scaled = X.copy()
@@ -101,7 +174,8 @@ def train_models():
         learning_rate=0.1,
         max_depth=5,
         eval_metric='logloss',
-        use_label_encoder=False
+        use_label_encoder=False,
+        n_jobs=nthread
     )
     xgb_model.fit(X_train, y_train)
     
@@ -110,19 +184,243 @@ def train_models():
     print("XGBoost Results:")
     print(classification_report(y_test, preds))
     
-    # Save XGBoost
-    joblib.dump(xgb_model, os.path.join(MODEL_DIR, "xgb_model.pkl"))
-    
     # 3. Train Isolation Forest (Unsupervised/Anomaly)
     print("Training Isolation Forest...")
     # Train only on 'normal' behavior usually, but here we train on all to find outliers
-    iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+    iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42, n_jobs=nthread)
     iso_forest.fit(X_train)
-    
-    # Save Isolation Forest
-    joblib.dump(iso_forest, os.path.join(MODEL_DIR, "iso_forest.pkl"))
-    
-    print(f"All models saved to {MODEL_DIR}")
+
+    _publish(
+        registry, version, preprocessor, xgb_model, iso_forest,
+        trainer={"dataset": "synthetic", "n_samples": n_samples, "velocity": velocity},
+        metrics={"xgb_accuracy": round(float(accuracy_score(y_test, preds)), 4)}
+    )
+    return version
+
+# Out-of-core training: the history is streamed in chunks and never held in memory at once
+XGB_PARAMS = {
+    'objective': 'binary:logistic',
+    'eta': 0.1,
+    'max_depth': 5,
+    'eval_metric': 'logloss',
+    'tree_method': 'hist',
+}
+XGB_ROUNDS = 100
+
+def _holdout_mask(start, n_rows, fraction):
+    """Deterministic test split by global row number: the same rows are held out on every pass."""
+    rows = np.arange(start, start + n_rows, dtype=np.uint64)
+    return (rows * np.uint64(2654435761)) % np.uint64(2 ** 32) < np.uint64(fraction * 2 ** 32)
+
+class _Reservoir:
+    """Uniform random sample of at most `size` rows out of a stream of DataFrame chunks."""
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.frame = None
+
+    def add(self, frame):
+        keys = np.concatenate([self.keys, self.rng.random(len(frame))])
+        frame = frame if self.frame is None else pd.concat([self.frame, frame], ignore_index=True)
+        if len(keys) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size)[:self.size])
+            keys, frame = keys[keep], frame.iloc[keep].reset_index(drop=True)
+        self.keys, self.frame = keys, frame
+
+class _TrainingChunks(xgb.DataIter):
+    """Feeds the spilled training chunks to XGBoost, scaled on the way; every reset() starts over."""
+    def __init__(self, chunk_files, scale, feature_names, cache_prefix=None):
+        self.chunk_files = chunk_files
+        self.scale = scale
+        self.feature_names = feature_names
+        self._position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._position == len(self.chunk_files):
+            return False
+        X_path, y_path = self.chunk_files[self._position]
+        input_data(data=self.scale(np.load(X_path)), label=np.load(y_path), feature_names=self.feature_names)
+        self._position += 1
+        return True
+
+    def reset(self):
+        self._position = 0
+
+def train_models_streaming(make_chunks, source="stream", velocity=False, nthread=None, dmatrix="quantile",
+                           max_bin=256, test_fraction=0.05, max_eval_rows=500_000, iso_sample_rows=200_000,
+                           model_root=MODEL_DIR):
+    """
+    Trains a new model version on a history too large for memory.
+    make_chunks() returns an iterator of raw DataFrame chunks, oldest first (see datasets.py):
+      1. one scan of the source engineers the features chunk by chunk (replaying velocity in
+         order), fits the scaler incrementally (partial_fit), keeps the held-out rows and a uniform
+         sample of training rows for the Isolation Forest (which trains on ~256 rows a tree) and
+         spills the training rows to a temporary directory as float32 arrays
+      2. XGBoost builds its DMatrix from the spilled chunks through a DataIter (it makes several
+         passes, which re-read the arrays instead of re-parsing and re-engineering the source):
+           dmatrix="quantile" - QuantileDMatrix, histogram bins in memory (~1 byte per value)
+           dmatrix="external" - external-memory DMatrix paged to the temporary directory
+    XGBoost and the Isolation Forest use `nthread` cores (default: all of them); source chunks are
+    read and decoded on a background thread while the previous one is engineered.
+    """
+    nthread = nthread or os.cpu_count()
+    if dmatrix not in ("quantile", "external"):
+        raise ValueError(f"Unknown DMatrix kind '{dmatrix}', expected 'quantile' or 'external'")
+    registry = ModelRegistry(model_root)
+    version = registry.create_version()
+    version_dir = os.path.join(model_root, version)
+    preprocessor = TransactionPreprocessor(velocity_windows=VELOCITY_WINDOWS if velocity else None)
+    numerical_cols = preprocessor.numerical_cols
+    numerical_index = preprocessor.numerical_index
+    timings = {}
+
+    def scale(X):
+        """Scales the numerical columns of a float32 feature matrix in place."""
+        numerical = pd.DataFrame(X[:, numerical_index], columns=numerical_cols, dtype=np.float64)
+        X[:, numerical_index] = preprocessor.scaler.transform(numerical)
+        return X
+
+    def scaled(frame):
+        return scale(frame[preprocessor.feature_columns].to_numpy(dtype=np.float32))
+
+    with tempfile.TemporaryDirectory(prefix="aegisflow-train-") as work_dir:
+        # 1. Scan: features, scaler statistics, held-out rows, Isolation Forest sample
+        print(f"Scanning {source}...")
+        started = time.perf_counter()
+        holdout, iso_sample = _Reservoir(max_eval_rows), _Reservoir(iso_sample_rows)
+        chunk_files = []
+        n_rows = n_train = n_fraud = 0
+        for chunk in prefetch(make_chunks()):
+            if velocity and 'nameOrig' not in chunk.columns:
+                raise ValueError("Velocity features need a nameOrig column in the training data")
+            X, y = _engineer(chunk, preprocessor)
+            mask = _holdout_mask(n_rows, len(X), test_fraction)
+            holdout.add(pd.concat([X[mask], y[mask]], axis=1))
+            train, y_train = X[~mask], y[~mask]
+            if len(train):
+                # The scaler sees raw values: partial_fit with the same numerical columns as fit()
+                preprocessor.scaler.partial_fit(train[numerical_cols])
+                iso_sample.add(train)
+                paths = (os.path.join(work_dir, f"chunk{len(chunk_files)}_X.npy"),
+                         os.path.join(work_dir, f"chunk{len(chunk_files)}_y.npy"))
+                np.save(paths[0], train.to_numpy(dtype=np.float32))
+                np.save(paths[1], y_train.to_numpy(dtype=np.float32))
+                chunk_files.append(paths)
+            n_rows += len(X)
+            n_train += len(train)
+            n_fraud += int(y.sum())
+        if not n_train:
+            raise ValueError(f"No training rows in {source}")
+        timings['scan'] = time.perf_counter() - started
+        print(f"{n_rows} transactions, fraud rate {n_fraud / n_rows:.2%}")
+        print("Saving preprocessor...")
+        preprocessor.save(version_dir)
+
+        # 2. XGBoost on the streamed DMatrix
+        started = time.perf_counter()
+        if dmatrix == "quantile":
+            chunks = _TrainingChunks(chunk_files, scale, preprocessor.feature_columns)
+            dtrain = xgb.QuantileDMatrix(chunks, max_bin=max_bin, nthread=nthread)
+        else:
+            chunks = _TrainingChunks(chunk_files, scale, preprocessor.feature_columns,
+                                     cache_prefix=os.path.join(work_dir, "dmatrix"))
+            dtrain = xgb.DMatrix(chunks, nthread=nthread)
+        timings['dmatrix'] = time.perf_counter() - started
+
+        print(f"Training XGBoost ({dmatrix} DMatrix, {nthread} threads)...")
+        started = time.perf_counter()
+        booster = xgb.train({**XGB_PARAMS, 'nthread': nthread, 'max_bin': max_bin}, dtrain, num_boost_round=XGB_ROUNDS)
+        timings['xgboost'] = time.perf_counter() - started
+        del dtrain, chunks
+    # Served through the scikit-learn wrapper, like the in-memory trainer's model
+    xgb_model = xgb.XGBClassifier()
+    xgb_model.load_model(bytearray(booster.save_raw("ubj")))
+
+    metrics = {}
+    if holdout.frame is not None and len(holdout.frame):
+        y_test = holdout.frame[LABEL_COLUMN]
+        X_test = pd.DataFrame(scaled(holdout.frame), columns=preprocessor.feature_columns)
+        preds = xgb_model.predict(X_test)
+        print(f"XGBoost Results ({len(y_test)} held-out transactions):")
+        print(classification_report(y_test, preds, zero_division=0))
+        metrics["xgb_accuracy"] = round(float(accuracy_score(y_test, preds)), 4)
+
+    # 3. Isolation Forest on the uniform sample
+    print(f"Training Isolation Forest on {len(iso_sample.frame)} sampled transactions...")
+    started = time.perf_counter()
+    iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42, n_jobs=nthread)
+    iso_forest.fit(pd.DataFrame(scaled(iso_sample.frame), columns=preprocessor.feature_columns))
+    timings['isolation_forest'] = time.perf_counter() - started
+
+    total = sum(timings.values())
+    print(f"{'stage':<18}{'seconds':>9}{'rows/s':>12}")
+    for stage, seconds in timings.items():
+        rows = len(iso_sample.frame) if stage == 'isolation_forest' else n_rows
+        print(f"{stage:<18}{seconds:>9.2f}{rows / seconds:>12,.0f}")
+    print(f"{'total':<18}{total:>9.2f}{n_rows / total:>12,.0f}")
+
+    _publish(
+        registry, version, preprocessor, xgb_model, iso_forest,
+        trainer={
+            "dataset": source, "mode": "streaming", "n_samples": n_rows, "velocity": velocity,
+            "dmatrix": dmatrix, "nthread": nthread, "rows_per_second": round(n_rows / total),
+        },
+        metrics=metrics
+    )
+    return version
+
+def export_version_bundle(version):
+    """Writes the model bundle of an already published version from its pickles (and re-checksums it)."""
+    registry = ModelRegistry(MODEL_DIR)
+    version_dir = registry.path(version)
+    manifest = registry.manifest(version)
+
+    preprocessor = TransactionPreprocessor()
+    preprocessor.load(version_dir)
+    xgb_model = joblib.load(os.path.join(version_dir, "xgb_model.pkl"))
+    iso_forest = joblib.load(os.path.join(version_dir, "iso_forest.pkl"))
+    path = export_bundle(version_dir, xgb_model, iso_forest, preprocessor.scaler, preprocessor.feature_columns)
+
+    registry.write_manifest(version, **{k: v for k, v in manifest.items() if k not in ("version", "files")})
+    print(f"Model bundle written to {path}")
+    return path
 
 if __name__ == "__main__":
-    train_models()
+    parser = argparse.ArgumentParser(description="Train the fraud models on synthetic data or a stored transaction history.")
+    parser.add_argument("--velocity", action="store_true", help="Add per-account velocity features")
+    parser.add_argument("--export-bundle", metavar="VERSION",
+                        help="Don't train: export the model bundle of an existing version (e.g. v1)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--data", nargs="+", metavar="PATH",
+                        help="Stream the training data from CSV/Parquet files or directories (PaySim columns)")
+    source.add_argument("--from-db", nargs="?", const="", metavar="DATABASE_URL",
+                        help="Stream the transactions table (default: the API's DATABASE_URL), is_flagged as the label")
+    source.add_argument("--synthetic", type=int, metavar="ROWS",
+                        help="Stream ROWS generated transactions (see synthetic.py) without writing them out")
+    parser.add_argument("--chunk-size", type=int, default=500_000, help="Rows per streamed chunk")
+    parser.add_argument("--nthread", type=int, help="Cores for training (default: all)")
+    parser.add_argument("--dmatrix", choices=["quantile", "external"], default="quantile",
+                        help="In-memory quantized DMatrix, or external memory paged to disk")
+    args = parser.parse_args()
+    if args.export_bundle:
+        export_version_bundle(args.export_bundle)
+    elif args.data:
+        train_models_streaming(lambda: iter_file_chunks(args.data, args.chunk_size), source=", ".join(args.data),
+                               velocity=args.velocity, nthread=args.nthread, dmatrix=args.dmatrix)
+    elif args.from_db is not None:
+        if args.from_db:
+            database_url = args.from_db
+        else:
+            from backend.app.core.config import settings
+            database_url = settings.DATABASE_URL
+        train_models_streaming(lambda: iter_table_chunks(database_url, args.chunk_size), source="transactions table",
+                               velocity=args.velocity, nthread=args.nthread, dmatrix=args.dmatrix)
+    elif args.synthetic:
+        config = SyntheticConfig(n_accounts=max(args.synthetic // 10, 1))
+        train_models_streaming(lambda: iter_synthetic_chunks(args.synthetic, args.chunk_size, config=config),
+                               source=f"{args.synthetic} synthetic transactions", velocity=args.velocity,
+                               nthread=args.nthread, dmatrix=args.dmatrix)
+    else:
+        train_models(velocity=args.velocity, nthread=args.nthread)
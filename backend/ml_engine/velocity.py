@@ -0,0 +1,154 @@
+import json
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Default windows (name -> seconds) of the velocity features
+VELOCITY_WINDOWS = {"1m": 60.0, "1h": 3600.0, "24h": 86400.0}
+
+
+class VelocityStore:
+    """
+    Streaming per-key (account or merchant) velocity features: how many transactions a key made
+    recently and for how much, over several time windows.
+
+    Windows are exponentially decayed counters with the window length as time constant, so each
+    key needs a fixed amount of state no matter how many transactions it makes:
+    one float64 row [last_seen, count_per_window..., amount_per_window...] of a preallocated slab.
+    At most `max_keys` keys are tracked; the least recently seen key is evicted to make room.
+
+    Features for a transaction describe the key's history *before* it; observing the transaction
+    then folds it into the state. Training replays transactions in time order through a fresh
+    store, so training and serving compute the features the same way. Thread safe.
+    """
+    def __init__(self, windows: Optional[Dict[str, float]] = None, max_keys: int = 100_000):
+        windows = windows or VELOCITY_WINDOWS
+        self.windows = dict(windows)
+        self.tau = np.array(list(self.windows.values()), dtype=np.float64)
+        self.n_windows = len(self.tau)
+        self.max_keys = max_keys
+        self._state = np.zeros((max_keys, 1 + 2 * self.n_windows), dtype=np.float64)
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = list(range(max_keys - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @property
+    def feature_names(self) -> List[str]:
+        return ([f"velocity_count_{name}" for name in self.windows]
+                + [f"velocity_amount_{name}" for name in self.windows])
+
+    def features(
+        self,
+        keys: Iterable[Optional[str]],
+        timestamps: Iterable[float],
+        amounts: Iterable[float],
+        observe: bool = True
+    ) -> np.ndarray:
+        """
+        Velocity features of each transaction (rows in the given, chronological, order).
+        With observe=False the state is only read (e.g. to explain an already scored transaction).
+        Transactions without a key get zeros and are not tracked.
+        """
+        keys, timestamps, amounts = list(keys), list(timestamps), list(amounts)
+        out = np.zeros((len(keys), 2 * self.n_windows), dtype=np.float64)
+        n = self.n_windows
+        with self._lock:
+            for row, (key, timestamp, amount) in enumerate(zip(keys, timestamps, amounts)):
+                if key is None:
+                    continue
+                slot = self._slots.get(key)
+                if slot is None:
+                    if not observe:
+                        continue
+                    slot = self._allocate(key)
+                else:
+                    self._slots.move_to_end(key)
+
+                state = self._state[slot]
+                # Late (out of order) transactions don't get to undo decay
+                decay = np.exp(-max(timestamp - state[0], 0.0) / self.tau)
+                counts = state[1:1 + n] * decay
+                sums = state[1 + n:] * decay
+                out[row, :n] = counts
+                out[row, n:] = sums
+
+                if observe:
+                    state[0] = max(state[0], timestamp)
+                    state[1:1 + n] = counts + 1.0
+                    state[1 + n:] = sums + amount
+        return out
+
+    def _allocate(self, key: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self.evictions += 1
+        self._state[slot] = 0.0
+        self._slots[key] = slot
+        return slot
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._slots),
+            "max_keys": self.max_keys,
+            "evictions": self.evictions,
+            "state_bytes": int(self._state.nbytes),
+        }
+
+    # --- Checkpointing -------------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        """Snapshot: a length-prefixed JSON header (windows, keys in LRU order) followed by their state rows."""
+        with self._lock:
+            keys = list(self._slots)
+            states = self._state[list(self._slots.values())] if keys else self._state[:0]
+            header = json.dumps({"windows": self.windows, "keys": keys}).encode()
+            return struct.pack("<I", len(header)) + header + states.tobytes()
+
+    def load_bytes(self, blob: bytes):
+        """Restores a to_bytes() snapshot (keeping the most recent keys if it holds more than max_keys)."""
+        (header_len,) = struct.unpack_from("<I", blob)
+        header = json.loads(blob[4:4 + header_len])
+        if header["windows"] != self.windows:
+            raise ValueError(f"Snapshot windows {header['windows']} do not match {self.windows}")
+        states = np.frombuffer(blob[4 + header_len:], dtype=np.float64).reshape(-1, self._state.shape[1])
+        keys = header["keys"][-self.max_keys:]
+        states = states[len(states) - len(keys):]
+        with self._lock:
+            self._slots.clear()
+            self._state[:len(keys)] = states
+            for slot, key in enumerate(keys):
+                self._slots[key] = slot
+            self._free = list(range(self.max_keys - 1, len(keys) - 1, -1))
+
+
+def checkpoint_to_redis(store: VelocityStore, redis_url: str, key: str = "aegisflow:velocity"):
+    """Saves a snapshot of the store in Redis so a restarted API picks up where it left off."""
+    import redis
+    client = redis.Redis.from_url(redis_url)
+    try:
+        client.set(key, store.to_bytes())
+    finally:
+        client.close()
+
+
+def restore_from_redis(store: VelocityStore, redis_url: str, key: str = "aegisflow:velocity") -> bool:
+    """Loads the last snapshot from Redis, if there is one. Returns whether anything was restored."""
+    import redis
+    client = redis.Redis.from_url(redis_url)
+    try:
+        blob = client.get(key)
+    finally:
+        client.close()
+    if blob is None:
+        return False
+    store.load_bytes(blob)
+    return True
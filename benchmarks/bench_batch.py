@@ -0,0 +1,69 @@
+"""
+Throughput of scoring a burst of transactions one at a time versus in one predict_batch call.
+
+The per-row side is what /analyze does for every transaction (predict(), i.e. a batch of one);
+the batched side is what /analyze/batch does for the whole burst. Both score the same
+transactions with identical verdicts; the script checks that, prints transactions per second for
+each batch size and exits 1 when batching is less than --min-speedup times faster.
+
+    python benchmarks/bench_batch.py --sizes 64 256 --explanation-policy always
+    python benchmarks/bench_batch.py --feature-mode pandas --engine native   # the original scoring path
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+warnings.filterwarnings("ignore")
+
+from benchmarks.bench_shadow import load_predictor, make_transactions  # noqa: E402
+
+
+def best_of(rounds, call):
+    """Fastest of `rounds` timed calls, in seconds (the least disturbed by other load)."""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(args):
+    predictor = load_predictor(feature_mode=args.feature_mode, engine=args.engine,
+                               explanation_policy=args.explanation_policy)
+    # Warm-up (SHAP explainer, first-call allocations)
+    predictor.predict_batch(make_transactions(8))
+
+    print(f"feature mode '{args.feature_mode}', {args.engine} engine, explanation policy '{args.explanation_policy}'")
+    print(f"{'batch':>7}{'per-row tx/s':>15}{'batched tx/s':>15}{'speedup':>10}")
+    slowest = None
+    for size in args.sizes:
+        transactions = make_transactions(size, seed=size)
+        per_row = [predictor.predict(transaction)["verdict"] for transaction in transactions]
+        batched = [result["verdict"] for result in predictor.predict_batch(transactions)]
+        if per_row != batched:
+            sys.exit(f"Verdicts differ between per-row and batched scoring at batch size {size}")
+
+        row_seconds = best_of(args.rounds, lambda: [predictor.predict(transaction) for transaction in transactions])
+        batch_seconds = best_of(args.rounds, lambda: predictor.predict_batch(transactions))
+        speedup = row_seconds / batch_seconds
+        slowest = speedup if slowest is None else min(slowest, speedup)
+        print(f"{size:>7}{size / row_seconds:>15,.0f}{size / batch_seconds:>15,.0f}{speedup:>9.1f}x")
+
+    if slowest < args.min_speedup:
+        print(f"Batching is only {slowest:.1f}x faster (expected at least {args.min_speedup:.0f}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1000])
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds per side (the best one counts)")
+    parser.add_argument("--feature-mode", default="numpy", choices=["numpy", "pandas"])
+    parser.add_argument("--engine", default="compiled", choices=["compiled", "native"])
+    parser.add_argument("--explanation-policy", default="always")
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    main(parser.parse_args())
@@ -0,0 +1,101 @@
+"""
+Model load time and memory per worker process: joblib pickles vs the memory-mapped model bundle.
+
+N worker processes (like N uvicorn workers or process-pool inference workers) each load the same
+model version, score a warm-up batch so the model pages are actually touched, and report their
+load time and memory from /proc (Linux). They stay alive together while measuring, so pages shared
+through the bundle's mmap show up as Shared instead of Private, and PSS splits them between workers.
+
+    python benchmarks/bench_load.py --workers 4 --version v1
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SAVED_MODELS = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models")
+
+
+def memory_kb():
+    """RSS, PSS and private/shared resident memory of this process, in kB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+    }
+
+
+def worker(model_dir, model_format, explanation_policy, results, loaded, done):
+    warnings.filterwarnings("ignore")
+    # Library imports are the same for both formats: keep them out of the measurement
+    import numpy  # noqa: F401
+    import shap  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+    import xgboost  # noqa: F401
+    from backend.ml_engine.predictor import FraudPredictor
+    from benchmarks.bench_shadow import make_transactions
+
+    transactions = make_transactions(512)
+    before = memory_kb()
+    started = time.perf_counter()
+    predictor = FraudPredictor(model_dir=model_dir, model_format=model_format,
+                               explanation_policy=explanation_policy)
+    predictor.load_models()
+    load_seconds = time.perf_counter() - started
+    predictor.predict_batch(transactions)
+
+    loaded.wait()
+    after = memory_kb()
+    results.put({"load_s": load_seconds, **{f"{k}_delta": after[k] - before[k] for k in after}, **after})
+    done.wait()
+
+
+def measure(model_dir, model_format, explanation_policy, n_workers):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    loaded, done = ctx.Barrier(n_workers + 1), ctx.Event()
+    processes = [
+        ctx.Process(target=worker, args=(model_dir, model_format, explanation_policy, results, loaded, done))
+        for _ in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    # Every worker has loaded and scored before any of them measures
+    loaded.wait()
+    rows = [results.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    return rows
+
+
+def main(args):
+    model_dir = os.path.join(SAVED_MODELS, args.version)
+    print(f"{args.workers} workers, model {args.version}, explanation policy '{args.explanation_policy}'")
+    print(f"{'format':<8}{'load ms':>9}{'RSS +MB':>9}{'private +MB':>13}{'PSS +MB':>9}{'total PSS +MB':>15}")
+    for model_format in ("pickle", "bundle"):
+        rows = measure(model_dir, model_format, args.explanation_policy, args.workers)
+        mean = {key: sum(row[key] for row in rows) / len(rows) for key in rows[0]}
+        print(f"{model_format:<8}{mean['load_s'] * 1000:>9.1f}{mean['rss_delta'] / 1024:>9.1f}"
+              f"{mean['private_delta'] / 1024:>13.1f}{mean['pss_delta'] / 1024:>9.1f}"
+              f"{sum(row['pss_delta'] for row in rows) / 1024:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--version", default="v1")
+    parser.add_argument("--explanation-policy", default="always",
+                        help="'deferred' also skips building the SHAP explainer at load time")
+    main(parser.parse_args())
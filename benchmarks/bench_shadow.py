@@ -0,0 +1,143 @@
+"""
+Primary-path latency of /analyze-style scoring with and without shadow models.
+
+Requests arrive at a fixed rate (open loop, like real traffic), each scoring one transaction on
+the inference executor and handing it to the shadow scorer exactly like the /analyze endpoint
+does. The same load is run with no shadows and with one shadow model scoring a sample of the
+traffic (100% by default, the worst case); the primary latency percentiles should be the same
+within noise as long as the host is not saturated.
+
+    python benchmarks/bench_shadow.py --requests 3000 --rate 300 --sample-rate 1.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+warnings.filterwarnings("ignore")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from backend.app.db.base import Base  # noqa: E402
+from backend.app.services.inference import InferenceExecutor  # noqa: E402
+from backend.app.services.shadow import ShadowScorer  # noqa: E402
+from backend.ml_engine.predictor import FraudPredictor  # noqa: E402
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+TYPES = ["PAYMENT", "TRANSFER", "CASH_OUT", "DEBIT", "CASH_IN"]
+
+
+def make_transactions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.lognormal(6, 2, n)
+    balances = rng.lognormal(8, 1.5, n)
+    return [
+        {"amount": float(a), "oldbalanceOrg": float(b), "newbalanceOrig": float(max(b - a, 0.0)),
+         "oldbalanceDest": 0.0, "newbalanceDest": float(a), "type": TYPES[i % len(TYPES)]}
+        for i, (a, b) in enumerate(zip(amounts, balances))
+    ]
+
+
+def load_predictor(**kwargs):
+    predictor = FraudPredictor(model_dir=MODEL_DIR, **kwargs)
+    predictor.load_models()
+    return predictor
+
+
+async def run_load(predictor, scorer, transactions, rate, workers):
+    executor = InferenceExecutor(predictor, workers=workers, max_backlog=10 ** 6)
+    await executor.start()
+    latencies = []
+
+    async def request(i):
+        started = time.perf_counter()
+        result = await executor.run("predict", transactions[i])
+        if scorer:
+            scorer.submit([f"txn_{i}"], [transactions[i]], [result])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(len(transactions)):
+        # Arrivals are scheduled, not paced by responses
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request(i)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+    return np.array(latencies) * 1000, elapsed
+
+
+def summarize(name, latencies_ms, elapsed):
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {"scenario": name, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+            "throughput_rps": len(latencies_ms) / elapsed}
+
+
+async def main(args):
+    transactions = make_transactions(args.requests)
+    primary = load_predictor(explanation_policy=args.explanation_policy)
+    shadow = load_predictor(explanation_policy="deferred")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        # Warm-up (thread pools, SHAP, sqlite)
+        await run_load(primary, None, transactions[:200], args.rate, args.workers)
+
+        rows = []
+        for round_ in range(args.rounds):
+            primary.shadows.clear()
+            latencies, elapsed = await run_load(primary, None, transactions, args.rate, args.workers)
+            rows.append(summarize("primary only", latencies, elapsed))
+
+            primary.add_shadow("candidate", shadow)
+            scorer = ShadowScorer(lambda: primary, sample_rate=args.sample_rate, kind=args.shadow_executor,
+                                  session_factory=session_factory)
+            scorer.start()
+            if args.shadow_executor == "process":
+                # Start the worker and load its shadow copy outside the measured window
+                scorer.submit(["warmup"], transactions[:1], [{"risk_score": 0.0, "verdict": "ALLOW"}])
+                await scorer.queue.join()
+            latencies, elapsed = await run_load(primary, scorer, transactions, args.rate, args.workers)
+            rows.append(summarize(f"with shadow ({args.sample_rate:.0%} sampled)", latencies, elapsed))
+            # Not part of the measured window: let the shadow catch up before the next round
+            await scorer.stop()
+            rows[-1]["shadow_scored"] = scorer.scored
+            rows[-1]["shadow_dropped"] = scorer.dropped
+        await engine.dispose()
+
+    print(f"{args.requests} requests at {args.rate:.0f} req/s, {args.workers} inference workers, "
+          f"explanation policy '{args.explanation_policy}', {args.shadow_executor} shadow executor")
+    print(f"{'scenario':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+    for row in rows:
+        print(f"{row['scenario']:<28}{row['p50_ms']:>9.3f}{row['p95_ms']:>9.3f}{row['p99_ms']:>9.3f}"
+              f"{row['throughput_rps']:>9.0f}")
+    base = [row for row in rows if row["scenario"] == "primary only"]
+    shadowed = [row for row in rows if row["scenario"] != "primary only"]
+    for key in ("p50_ms", "p99_ms"):
+        delta = np.median([s[key] - b[key] for s, b in zip(shadowed, base)])
+        print(f"median {key[:3]} change with shadow: {delta:+.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--rate", type=float, default=300, help="arrivals per second")
+    parser.add_argument("--workers", type=int, default=4, help="inference executor threads")
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--explanation-policy", default="flagged")
+    parser.add_argument("--shadow-executor", choices=["thread", "process"], default="process")
+    asyncio.run(main(parser.parse_args()))
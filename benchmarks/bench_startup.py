@@ -0,0 +1,103 @@
+"""
+API cold start: import time of backend.app.main, app startup (model loading) and first-request latency.
+
+Every run is a fresh interpreter (like a new pod or uvicorn worker) against its own temporary
+SQLite database. Reported per run, then as medians:
+  import_ms         - `import backend.app.main`
+  heavy_modules     - ML libraries already imported at that point (should be none)
+  startup_ms        - the lifespan startup: loading the models, starting the background services
+  first_request_ms  - the first authenticated POST /api/v1/analyze/
+  second_request_ms - the next one, for comparison
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = r'''
+import asyncio, json, sys, time, warnings
+warnings.filterwarnings("ignore")
+
+started = time.perf_counter()
+from backend.app.main import app
+import_ms = (time.perf_counter() - started) * 1000
+heavy_modules = [m for m in ("pandas", "sklearn", "shap", "xgboost", "scipy") if m in sys.modules]
+
+from fastapi.testclient import TestClient
+from backend.app.db.base import Base
+from backend.app.db.session import engine
+from backend.seed_data import create_initial_data
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await create_initial_data()
+asyncio.run(init_db())
+
+transaction = {"amount": 600.0, "oldbalanceOrg": 1000.0, "newbalanceOrig": 400.0,
+               "oldbalanceDest": 0.0, "newbalanceDest": 0.0, "type": "PAYMENT"}
+started = time.perf_counter()
+with TestClient(app) as client:
+    startup_ms = (time.perf_counter() - started) * 1000
+    token = client.post("/api/v1/login/access-token",
+                        data={"username": "admin@aegisflow.com", "password": "admin123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    for _ in range(2):
+        started = time.perf_counter()
+        response = client.post("/api/v1/analyze/", json=transaction, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+
+print("RESULT " + json.dumps({
+    "import_ms": import_ms, "heavy_modules": heavy_modules, "startup_ms": startup_ms,
+    "first_request_ms": latencies[0], "second_request_ms": latencies[1],
+}))
+'''
+
+
+def run_once(extra_env):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'startup.db')}",
+            WRITE_BEHIND_SPILL_PATH=os.path.join(tmp, "write_behind", "transactions.jsonl"),
+            PYTHONPATH=REPO_ROOT,
+            **extra_env,
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=tmp, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    line = next(line for line in output.splitlines() if line.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main(args):
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    runs = []
+    print(f"{'run':<5}{'import ms':>11}{'startup ms':>12}{'1st req ms':>12}{'2nd req ms':>12}  heavy modules at import")
+    for i in range(args.runs):
+        result = run_once(extra_env)
+        runs.append(result)
+        print(f"{i + 1:<5}{result['import_ms']:>11.0f}{result['startup_ms']:>12.0f}"
+              f"{result['first_request_ms']:>12.1f}{result['second_request_ms']:>12.1f}  "
+              f"{', '.join(result['heavy_modules']) or '-'}")
+    medians = {key: statistics.median(run[key] for run in runs)
+               for key in ("import_ms", "startup_ms", "first_request_ms", "second_request_ms")}
+    print(f"{'med':<5}{medians['import_ms']:>11.0f}{medians['startup_ms']:>12.0f}"
+          f"{medians['first_request_ms']:>12.1f}{medians['second_request_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra settings for the API, e.g. --env EXPLANATION_POLICY=deferred")
+    main(parser.parse_args())
@@ -0,0 +1,378 @@
+"""
+Benchmark suite for the scoring hot path, with regression tracking against a stored baseline.
+
+Every stage is measured on its own and end to end, for one transaction and for a batch, warm
+(steady state, after warm-up calls) and cold (the first call on a freshly loaded predictor, a new
+write-behind buffer or database engine, or a restarted app):
+  features  - TransactionPreprocessor.transform_batch_array (the NumPy fast path serving uses)
+  predict   - FraudPredictor.predict_batch, scores only (explanations deferred)
+  explain   - SHAP explanations (cold: includes building the TreeExplainer)
+  persist   - WriteBehindBuffer.add, what /analyze pays to persist its rows
+  db_insert - bulk insert + commit of the scored rows, what the write-behind flush runs (COPY on PostgreSQL)
+  http      - POST /api/v1/analyze/ (one transaction) or /analyze/batch, in process through the ASGI app
+
+Results are written as JSON (--output). With --baseline, the run fails (exit status 1) when a
+stage's median is more than --threshold slower than in the baseline. Timings depend on the host:
+record the baseline on the machine that runs the comparison (--save-baseline).
+
+    python benchmarks/bench_suite.py --output results.json --baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --stages predict explain --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODEL_DIR = os.path.join(REPO_ROOT, "backend", "ml_engine", "saved_models", "v1")
+STAGES = ["features", "predict", "explain", "persist", "db_insert", "http"]
+# Medians this close to the baseline are never a regression, whatever the ratio (timer noise)
+NOISE_FLOOR_MS = 0.05
+
+
+def summarize(samples: List[float], rows: int) -> Dict[str, Any]:
+    """Statistics of per-call timings (seconds) for calls of `rows` transactions each."""
+    ms = np.array(samples) * 1000
+    median = float(np.median(ms))
+    return {
+        "calls": len(ms),
+        "median_ms": median,
+        "p95_ms": float(np.percentile(ms, 95)),
+        "mean_ms": float(ms.mean()),
+        "rows_per_s": rows / median * 1000 if median else float("inf"),
+    }
+
+
+def measure_warm(call: Callable[..., Any], min_time: float, min_calls: int = 5, warmup: int = 3,
+                 prepare: Optional[Callable[[], Any]] = None) -> List[float]:
+    """
+    Times repeated calls (after `warmup` untimed ones) for at least `min_time` seconds.
+    With `prepare`, every call gets a fresh prepare() result as its argument, built before its timer starts.
+    """
+    def timed_call() -> float:
+        if prepare is None:
+            started = time.perf_counter()
+            call()
+        else:
+            argument = prepare()
+            started = time.perf_counter()
+            call(argument)
+        return time.perf_counter() - started
+
+    for _ in range(warmup):
+        timed_call()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_calls or time.perf_counter() < deadline:
+        samples.append(timed_call())
+    return samples
+
+
+def measure_cold(make: Callable[[], Any], call: Callable[[Any], Any], runs: int,
+                 teardown: Optional[Callable[[Any], Any]] = None) -> List[float]:
+    """Times the first call on `runs` fresh objects (their setup is not timed)."""
+    samples = []
+    for _ in range(runs):
+        subject = make()
+        started = time.perf_counter()
+        call(subject)
+        samples.append(time.perf_counter() - started)
+        if teardown:
+            teardown(subject)
+    return samples
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[Dict[str, Any]]:
+    """Benchmarks whose median is more than `threshold` (e.g. 0.25 = 25%) slower than in the baseline."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        current, previous = result["median_ms"], reference["median_ms"]
+        if current > previous * (1 + threshold) and current - previous > NOISE_FLOOR_MS:
+            regressions.append({"benchmark": key, "baseline_ms": previous, "current_ms": current,
+                                "ratio": current / previous if previous else float("inf")})
+    return regressions
+
+
+class Suite:
+    def __init__(self, args, work_dir: str):
+        self.args = args
+        self.work_dir = work_dir
+        from benchmarks.bench_shadow import make_transactions
+        self.transactions = make_transactions(args.batch_size, seed=1)
+        self.sizes = {"1": self.transactions[:1], f"{args.batch_size}": self.transactions}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count()
+
+    def record(self, stage: str, size: str, state: str, samples: List[float]):
+        key = f"{stage}/{size}/{state}"
+        self.results[key] = summarize(samples, len(self.sizes[size]))
+        result = self.results[key]
+        print(f"{key:<28}{result['median_ms']:>11.3f}{result['p95_ms']:>11.3f}{result['rows_per_s']:>13,.0f}",
+              flush=True)
+
+    def run_stage(self, stage: str, warm: Callable[[List[dict]], Callable[..., Any]],
+                  cold: Callable[[List[dict]], List[float]],
+                  prepare: Optional[Callable[[List[dict]], Callable[[], Any]]] = None):
+        """`prepare(records)`, when given, builds the untimed argument of each warm call (see measure_warm)."""
+        for size, records in self.sizes.items():
+            self.record(stage, size, "warm", measure_warm(warm(records), self.args.min_time,
+                                                          prepare=prepare(records) if prepare else None))
+            self.record(stage, size, "cold", cold(records))
+
+    # Model stages
+    def load_predictor(self, **kwargs):
+        from backend.ml_engine.predictor import FraudPredictor
+        predictor = FraudPredictor(model_dir=MODEL_DIR, **kwargs)
+        predictor.load_models()
+        return predictor
+
+    def bench_features(self):
+        predictor = self.load_predictor(explanation_policy="deferred")
+        self.run_stage(
+            "features",
+            lambda records: lambda: predictor.preprocessor.transform_batch_array(records),
+            lambda records: measure_cold(lambda: self.load_predictor(explanation_policy="deferred"),
+                                         lambda p: p.preprocessor.transform_batch_array(records), self.args.cold_runs),
+        )
+
+    def bench_predict(self):
+        predictor = self.load_predictor(explanation_policy="deferred")
+        self.run_stage(
+            "predict",
+            lambda records: lambda: predictor.predict_batch(records),
+            lambda records: measure_cold(lambda: self.load_predictor(explanation_policy="deferred"),
+                                         lambda p: p.predict_batch(records), self.args.cold_runs),
+        )
+
+    def bench_explain(self):
+        predictor = self.load_predictor(explanation_policy="deferred")
+        self.run_stage(
+            "explain",
+            lambda records: lambda: predictor.explain_transactions(records),
+            lambda records: measure_cold(lambda: self.load_predictor(explanation_policy="deferred"),
+                                         lambda p: p.explain_transactions(records), self.args.cold_runs),
+        )
+
+    # Persistence stages
+    def scored_records(self, records: List[dict]):
+        """The Transaction rows /analyze builds for `records` (fresh IDs on every call)."""
+        from backend.app.api.endpoints.analyze import build_transaction_record
+        from backend.app.schemas.transaction import TransactionCreate
+        results = self.predictor_for_rows.predict_batch(records)
+        transactions = [TransactionCreate(**record).model_dump(exclude={"idempotency_key"}) for record in records]
+        # Deferred policy: no explanation columns to fill
+        unexplained = {"explanation": None, "top_feature": None}
+        return lambda: [build_transaction_record(f"bench_{next(self._ids)}", data, result, unexplained)
+                        for data, result in zip(transactions, results)]
+
+    def bench_persist(self):
+        from backend.app.services.persistence import WriteBehindBuffer
+        from backend.app.db.base import Base
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        loop = asyncio.new_event_loop()
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(self.work_dir, 'persist.db')}")
+        loop.run_until_complete(self._create_tables(engine))
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        buffers = []
+
+        def new_buffer():
+            buffer = WriteBehindBuffer(os.path.join(self.work_dir, "spill", f"{len(buffers)}.jsonl"),
+                                       max_batch=10 ** 9, flush_interval_ms=10 ** 9, session_factory=session_factory)
+            # The flusher task only runs while the loop does: add() is timed on its own
+            loop.run_until_complete(buffer.start())
+            buffers.append(buffer)
+            return buffer
+
+        def warm(records):
+            return new_buffer().add
+
+        def cold(records):
+            make_rows = self.scored_records(records)
+            return measure_cold(lambda: (new_buffer(), make_rows()), lambda subject: subject[0].add(subject[1]),
+                                self.args.cold_runs)
+
+        # Rows are built outside the timed call
+        self.run_stage("persist", warm, cold, prepare=self.scored_records)
+        for buffer in buffers:
+            loop.run_until_complete(buffer.close())
+        loop.run_until_complete(engine.dispose())
+        loop.close()
+
+    @staticmethod
+    async def _create_tables(engine):
+        from backend.app.db.base import Base
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    def bench_db_insert(self):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from backend.app.db.bulk import bulk_insert_transactions
+        from backend.app.services.persistence import transaction_to_row
+
+        loop = asyncio.new_event_loop()
+        url = f"sqlite+aiosqlite:///{os.path.join(self.work_dir, 'insert.db')}"
+        engines = []
+
+        def new_factory():
+            engine = create_async_engine(url)
+            engines.append(engine)
+            return async_sessionmaker(engine, expire_on_commit=False)
+
+        async def insert_rows(session_factory, rows):
+            async with session_factory() as session:
+                await bulk_insert_transactions(session, rows)
+                await session.commit()
+
+        setup = create_async_engine(url)
+        loop.run_until_complete(self._create_tables(setup))
+        loop.run_until_complete(setup.dispose())
+
+        def rows_of(make_records):
+            return lambda: [transaction_to_row(t) for t in make_records()]
+
+        def warm(records):
+            session_factory = new_factory()
+            return lambda rows: loop.run_until_complete(insert_rows(session_factory, rows))
+
+        def cold(records):
+            make_rows = rows_of(self.scored_records(records))
+            # A new engine: the first insert also opens its connection
+            return measure_cold(lambda: (new_factory(), make_rows()),
+                                lambda subject: loop.run_until_complete(insert_rows(*subject)), self.args.cold_runs)
+
+        self.run_stage("db_insert", warm, cold, prepare=lambda records: rows_of(self.scored_records(records)))
+        for engine in engines:
+            loop.run_until_complete(engine.dispose())
+        loop.close()
+
+    # End to end
+    def bench_http(self):
+        from fastapi.testclient import TestClient
+        from backend.app.db.session import engine
+        from backend.app.main import app
+        from backend.seed_data import create_initial_data
+
+        async def init_db():
+            await self._create_tables(engine)
+            await create_initial_data()
+        asyncio.run(init_db())
+
+        def start():
+            client = TestClient(app)
+            client.__enter__()
+            token = client.post("/api/v1/login/access-token",
+                                data={"username": "admin@aegisflow.com", "password": "admin123"}).json()["access_token"]
+            client.headers["Authorization"] = f"Bearer {token}"
+            return client
+
+        def post(client, records):
+            if len(records) == 1:
+                response = client.post("/api/v1/analyze/", json=records[0])
+            else:
+                response = client.post("/api/v1/analyze/batch", json=records)
+            response.raise_for_status()
+
+        def stop(client):
+            client.__exit__(None, None, None)
+
+        # One app at a time (they share the write-behind spill file): warm runs first, then restarts
+        client = start()
+        for size, records in self.sizes.items():
+            self.record("http", size, "warm", measure_warm(lambda: post(client, records), self.args.min_time))
+        stop(client)
+        for size, records in self.sizes.items():
+            self.record("http", size, "cold", measure_cold(start, lambda c: post(c, records), self.args.cold_runs,
+                                                           teardown=stop))
+
+    def run(self, stages: List[str]):
+        if {"persist", "db_insert"} & set(stages):
+            self.predictor_for_rows = self.load_predictor(explanation_policy="deferred")
+        print(f"{'benchmark':<28}{'median ms':>11}{'p95 ms':>11}{'rows/s':>13}")
+        for stage in stages:
+            getattr(self, f"bench_{stage}")()
+        return self.results
+
+
+def metadata(args) -> Dict[str, Any]:
+    import xgboost
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "xgboost": xgboost.__version__,
+        "batch_size": args.batch_size,
+        "min_time": args.min_time,
+        "cold_runs": args.cold_runs,
+    }
+
+
+def main(args) -> int:
+    warnings.filterwarnings("ignore")
+    with tempfile.TemporaryDirectory(prefix="aegisflow-bench-") as work_dir:
+        # The app reads its settings on import: point it at a scratch database first
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(work_dir, 'app.db')}"
+        os.environ["WRITE_BEHIND_SPILL_PATH"] = os.path.join(work_dir, "write_behind", "transactions.jsonl")
+        os.environ.setdefault("SHADOW_EXECUTOR", "thread")
+        results = Suite(args, work_dir).run(args.stages)
+
+    report = {"meta": metadata(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+        return 0
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.baseline}:")
+    for regression in regressions:
+        print(f"  {regression['benchmark']:<28}{regression['baseline_ms']:>10.3f} ms -> "
+              f"{regression['current_ms']:>10.3f} ms ({regression['ratio']:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds of warm calls per benchmark")
+    parser.add_argument("--cold-runs", type=int, default=5, help="fresh instances timed per cold benchmark")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="fail on regressions against this results file")
+    parser.add_argument("--threshold", type=float, default=0.3, help="allowed slowdown of a median (0.3 = 30%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also write the results as the new baseline")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,147 @@
+"""
+Load test against a running API: replays transactions to POST /api/v1/analyze/ at a target rate
+and reports latency percentiles and throughput.
+
+Requests are sent on a fixed schedule (open loop, like real traffic): a slow server does not slow
+the sender down, and latency is measured from each request's scheduled send time, so waiting for a
+free connection on the client counts too instead of being hidden (coordinated omission). The
+transactions come from CSV/Parquet files (e.g. written by backend/ml_engine/synthetic.py) or are
+generated on the fly. One process sends a few thousand requests per second; run several for more.
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --rps 200 --duration 30
+    python benchmarks/load_test.py --data data/synthetic --rps 100 --batch-size 50 --json load.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.ml_engine.datasets import iter_file_chunks  # noqa: E402
+from backend.ml_engine.synthetic import iter_chunks  # noqa: E402
+
+PAYLOAD_FIELDS = ["amount", "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest", "type", "nameOrig"]
+
+
+def payloads(chunks, batch_size=1):
+    """Request bodies from DataFrame chunks: one transaction each, or lists of batch_size for /analyze/batch."""
+    def transactions():
+        for chunk in chunks:
+            records = chunk[[c for c in PAYLOAD_FIELDS if c in chunk.columns]].to_dict("records")
+            times = chunk["transaction_time"].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+            for record, transaction_time in zip(records, times):
+                record["transaction_time"] = transaction_time
+                yield record
+
+    if batch_size == 1:
+        yield from transactions()
+        return
+    records = transactions()
+    while batch := list(itertools.islice(records, batch_size)):
+        yield batch
+
+
+async def run_load(client, bodies, rps, n_requests, path="/api/v1/analyze/", headers=None):
+    """Sends n_requests bodies at `rps` requests per second (open loop). Returns the summary."""
+    latencies, statuses = [], Counter()
+    send_lag = 0.0
+
+    async def send(body, scheduled):
+        try:
+            response = await client.post(path, json=body, headers=headers)
+            statuses[str(response.status_code)] += 1
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - scheduled)
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+
+    started = time.perf_counter()
+    tasks = []
+    for i, body in enumerate(itertools.islice(bodies, n_requests)):
+        scheduled = started + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            # The sender itself fell behind the schedule (the client, not the server, is the bottleneck)
+            send_lag = max(send_lag, -delay)
+        tasks.append(asyncio.create_task(send(body, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99, p_max = np.percentile(latencies_ms, [50, 95, 99, 100]) if len(latencies_ms) else [float("nan")] * 4
+    return {
+        "requests": len(tasks),
+        "ok": len(latencies),
+        "errors": {status: count for status, count in statuses.items() if status != "200"},
+        "target_rps": rps,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": p_max,
+        "max_send_lag_ms": send_lag * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+async def get_token(client, username, password):
+    response = await client.post("/api/v1/login/access-token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def main(args):
+    n_requests = args.requests or int(args.rps * args.duration)
+    n_transactions = (n_requests + args.warmup) * args.batch_size
+    if args.data:
+        chunks = iter_file_chunks(args.data, chunk_size=min(n_transactions, 100_000))
+    else:
+        chunks = iter_chunks(n_transactions, chunk_size=min(n_transactions, 100_000), seed=args.seed)
+    bodies = payloads(chunks, args.batch_size)
+    path = "/api/v1/analyze/" if args.batch_size == 1 else "/api/v1/analyze/batch"
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        headers = {"Authorization": f"Bearer {await get_token(client, args.user, args.password)}"}
+        if args.warmup:
+            await run_load(client, bodies, args.rps, args.warmup, path, headers)
+        result = await run_load(client, bodies, args.rps, n_requests, path, headers)
+
+    result["batch_size"] = args.batch_size
+    result["transactions_per_second"] = result["throughput_rps"] * args.batch_size
+    print(f"{result['requests']} requests to {path} at {args.rps:.0f} req/s "
+          f"({args.batch_size} transaction{'s' if args.batch_size > 1 else ''} each), {args.connections} connections")
+    print(f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'req/s':>9}{'txn/s':>9}  errors")
+    print(f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['max_ms']:>9.1f}"
+          f"{result['throughput_rps']:>9.0f}{result['transactions_per_second']:>9.0f}  {result['errors'] or '-'}")
+    if result["max_send_lag_ms"] > 100:
+        print(f"warning: the sender fell up to {result['max_send_lag_ms']:.0f} ms behind schedule, "
+              "the client may be the bottleneck")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=100, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds (unless --requests is given)")
+    parser.add_argument("--requests", type=int)
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent first and not measured")
+    parser.add_argument("--batch-size", type=int, default=1, help="transactions per request (>1: /analyze/batch)")
+    parser.add_argument("--data", nargs="+", metavar="PATH", help="CSV/Parquet files or directories to replay")
+    parser.add_argument("--seed", type=int, default=42, help="synthetic data seed (without --data)")
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--user", default="admin@aegisflow.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -10,6 +10,32 @@ import { generateTransactions, generateDashboardStats } from '@/lib/mockData';
 import { ShieldAlert, DollarSign, AlertTriangle, Zap } from 'lucide-react';
 import api from '@/lib/api';
 
+// Map backend transaction (listing row or stream event) to frontend model
+const toTransaction = (tx: any): Transaction => ({
+  id: tx.id,
+  timestamp: new Date(tx.timestamp),
+  amount: tx.amount,
+  currency: "USD",
+  merchant: "Unknown Merchant", // Placeholder as backend doesn't store this yet
+  merchantCategory: "General",
+  location: {
+    city: "Unknown",
+    country: "Unknown",
+    lat: 0,
+    lng: 0
+  },
+  riskScore: tx.risk_score * 100, // Frontend expects 0-100 probably? getRiskLevel checks < 40. Backend is 0-1. So * 100.
+  riskLevel: tx.risk_level === 'CRITICAL' ? 'fraud' : (tx.risk_level === 'HIGH' ? 'warning' : 'safe'),
+  status: tx.risk_level === 'CRITICAL' ? 'blocked' : 'approved',
+  userId: "user_1",
+  cardLast4: "0000",
+  ipAddress: "127.0.0.1",
+  deviceId: "device_1",
+  deviceType: "Desktop",
+  isNewDevice: false,
+  velocity: 1
+});
+
 const LiveMonitor = () => {
   const [transactions, setTransactions] = useState<Transaction[]>([]);
   const [stats, setStats] = useState(generateDashboardStats());
@@ -21,33 +47,11 @@ const LiveMonitor = () => {
     const fetchTransactions = async () => {
       try {
         const response = await api.get('/transactions');
-        const data = response.data;
+        // Newest page only; older pages are available via response.data.next_cursor
+        const data = response.data.items;
         
         // Map backend to frontend model
-        const mapped: Transaction[] = data.map((tx: any) => ({
-          id: tx.id,
-          timestamp: new Date(tx.timestamp),
-          amount: tx.amount,
-          currency: "USD",
-          merchant: "Unknown Merchant", // Placeholder as backend doesn't store this yet
-          merchantCategory: "General",
-          location: {
-            city: "Unknown",
-            country: "Unknown",
-            lat: 0,
-            lng: 0
-          },
-          riskScore: tx.risk_score * 100, // Frontend expects 0-100 probably? getRiskLevel checks < 40. Backend is 0-1. So * 100.
-          riskLevel: tx.risk_level === 'CRITICAL' ? 'fraud' : (tx.risk_level === 'HIGH' ? 'warning' : 'safe'),
-          status: tx.risk_level === 'CRITICAL' ? 'blocked' : 'approved',
-          userId: "user_1",
-          cardLast4: "0000",
-          ipAddress: "127.0.0.1",
-          deviceId: "device_1",
-          deviceType: "Desktop",
-          isNewDevice: false,
-          velocity: 1
-        }));
+        const mapped: Transaction[] = data.map(toTransaction);
         
         if (mapped.length > 0) {
             setTransactions(mapped);
@@ -62,9 +66,16 @@ const LiveMonitor = () => {
     };
     
     fetchTransactions();
-    // Poll every 5 seconds
-    const interval = setInterval(fetchTransactions, 5000);
-    return () => clearInterval(interval);
+
+    // Then let the server push newly scored transactions instead of polling.
+    // EventSource reconnects by itself and resumes from the last event it received.
+    const token = localStorage.getItem("token");
+    const source = new EventSource(`${api.defaults.baseURL}/transactions/stream?token=${encodeURIComponent(token ?? "")}`);
+    source.addEventListener("transaction", (event) => {
+      const tx = toTransaction(JSON.parse((event as MessageEvent).data));
+      setTransactions((current) => [tx, ...current.filter((t) => t.id !== tx.id)].slice(0, 100));
+    });
+    return () => source.close();
   }, []);
 
   const handleTransactionClick = (transaction: Transaction) => {
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.db.base import Base
+from backend.app.models.transaction import Transaction
+from backend.app.services.analytics import AnalyticsAggregator
+
+
+def scored(minute_of_day, amount, risk_score, risk_level, flagged=False):
+    hour, minute = divmod(minute_of_day, 60)
+    return Transaction(
+        id=f"txn_{minute_of_day}_{amount}", amount=amount, risk_score=risk_score, risk_level=risk_level,
+        is_flagged=flagged, timestamp=datetime(2024, 1, 1, hour, minute, 30)
+    )
+
+
+def test_rollups_survive_flushes_and_merge_with_pending_deltas(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        aggregator = AnalyticsAggregator(session_factory=async_sessionmaker(engine, expire_on_commit=False))
+
+        aggregator.record([scored(10, 50.0, 0.05, "LOW"), scored(20, 5000.0, 0.95, "CRITICAL", flagged=True)])
+        await aggregator.flush()
+        # Same hour again (merged into the stored row) plus a new hour
+        aggregator.record([scored(40, 500.0, 0.5, "HIGH")])
+        await aggregator.flush()
+        # Left unflushed: still visible to queries
+        aggregator.record([scored(70, 20.0, 1.0, "CRITICAL", flagged=True)])
+
+        summary = await aggregator.summarize(datetime(2024, 1, 1, 0, 0), datetime(2024, 1, 1, 6, 0))
+        await engine.dispose()
+        return summary
+
+    summary = asyncio.run(scenario())
+    totals = summary["totals"]
+    assert totals["total"] == 4
+    assert totals["by_verdict"] == {"ALLOW": 1, "REVIEW": 1, "DENY": 2}
+    assert totals["flagged"] == 2
+    assert totals["amount_sum"] == 5570.0
+
+    first, second = summary["hourly"]
+    assert (first["bucket_start"], first["total"], first["fraud_rate"]) == (datetime(2024, 1, 1, 0), 3, round(1 / 3, 6))
+    assert (second["bucket_start"], second["total"], second["fraud_rate"]) == (datetime(2024, 1, 1, 1), 1, 1.0)
+
+    assert summary["risk_score_histogram"]["counts"] == [1, 0, 0, 0, 0, 1, 0, 0, 0, 2]
+    # Buckets: [0,10) [10,100) [100,1k) [1k,10k) ...
+    assert summary["amount_histogram"]["counts"][:4] == [0, 2, 1, 1]
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.api.endpoints import analyze
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.db.base import Base
+from backend.app.models.transaction import Transaction
+from backend.app.schemas.transaction import TransactionCreate
+from backend.app.services.inference import InferenceExecutor
+from backend.ml_engine.predictor import FraudPredictor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+TRANSACTIONS = [
+    {"amount": 9839.64, "oldbalanceOrg": 170136.0, "newbalanceOrig": 160296.36, "oldbalanceDest": 0.0,
+     "newbalanceDest": 0.0, "type": "PAYMENT"},
+    {"amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0, "oldbalanceDest": 0.0,
+     "newbalanceDest": 0.0, "type": "TRANSFER"},
+    {"amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0, "oldbalanceDest": 21182.0,
+     "newbalanceDest": 0.0, "type": "CASH_OUT"},
+    {"amount": 229133.94, "oldbalanceOrg": 15325.0, "newbalanceOrig": 0.0, "oldbalanceDest": 5083.0,
+     "newbalanceDest": 51513.44, "type": "CASH_OUT"},
+    {"amount": 138.19, "oldbalanceOrg": 9988.69, "newbalanceOrig": 9850.5, "oldbalanceDest": 0.0,
+     "newbalanceDest": 138.19, "type": "CASH_IN"},
+]
+
+
+def load_predictor(**kwargs):
+    predictor = FraudPredictor(model_dir=MODEL_DIR, **kwargs)
+    predictor.load_models()
+    return predictor
+
+
+@pytest.mark.parametrize("feature_mode, engine", [("numpy", "compiled"), ("pandas", "native")])
+def test_batched_results_match_per_row_results(feature_mode, engine):
+    predictor = load_predictor(feature_mode=feature_mode, engine=engine)
+    batched = predictor.predict_batch(TRANSACTIONS)
+    per_row = [predictor.predict(transaction) for transaction in TRANSACTIONS]
+    assert [r["verdict"] for r in batched] == [r["verdict"] for r in per_row]
+    assert [r["anomaly_detected"] for r in batched] == [r["anomaly_detected"] for r in per_row]
+    for one, many in zip(per_row, batched):
+        assert many["risk_score"] == pytest.approx(one["risk_score"], abs=1e-6)
+        assert [f["feature"] for f in many["explanation"]] == [f["feature"] for f in one["explanation"]]
+        assert [f["impact"] for f in many["explanation"]] == pytest.approx([f["impact"] for f in one["explanation"]], abs=1e-5)
+    assert len({r["verdict"] for r in batched}) > 1
+    assert predictor.predict_batch([]) == []
+
+
+def test_batch_endpoint_scores_in_order_and_rejects_oversized_batches(tmp_path, monkeypatch):
+    predictor = load_predictor(explanation_policy="flagged")
+    executor = InferenceExecutor(predictor, kind="thread", workers=1)
+    for name, value in [("predictor", predictor), ("executor", executor), ("result_cache", None),
+                        ("write_buffer", None), ("explanation_worker", None), ("shadow_scorer", None),
+                        ("stream_hub", None), ("analytics", None)]:
+        monkeypatch.setattr(analyze, name, value)
+    monkeypatch.setattr(settings, "ANALYZE_BATCH_MAX_SIZE", len(TRANSACTIONS))
+    transactions = [TransactionCreate(**data) for data in TRANSACTIONS]
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def post(batch):
+            async with session_factory() as db:
+                return await analyze.analyze_transactions_batch(
+                    transactions=batch, response=Response(), idempotency_key=None, db=db,
+                    current_user=None, predictor_instance=predictor
+                )
+
+        results = await post(transactions)
+        with pytest.raises(HTTPException) as too_large:
+            await post(transactions + transactions[:1])
+        empty = await post([])
+        async with session_factory() as db:
+            stored = (await db.execute(select(Transaction).order_by(Transaction.id))).scalars().all()
+            count = await db.scalar(select(func.count()).select_from(Transaction))
+        await engine.dispose()
+        return results, too_large.value, empty, stored, count
+
+    results, too_large, empty, stored, count = asyncio.run(scenario())
+    executor.shutdown()
+
+    expected = load_predictor(explanation_policy="flagged").predict_batch(TRANSACTIONS)
+    assert [r["risk_score"] for r in results] == [r["risk_score"] for r in expected]
+    assert [r["verdict"] for r in results] == [r["verdict"] for r in expected]
+    # One row per transaction, ids in submission order
+    assert count == len(TRANSACTIONS) and [t.id for t in stored] == [r["transaction_id"] for r in results]
+    assert [t.amount for t in stored] == [data["amount"] for data in TRANSACTIONS]
+    assert too_large.status_code == 413 and empty == []
+
+
+def test_batch_errors_are_logged_and_counted(monkeypatch, caplog):
+    predictor = load_predictor()
+
+    class FailingExecutor:
+        async def run(self, method, *args, **kwargs):
+            raise RuntimeError("scoring failed")
+
+    for name, value in [("predictor", predictor), ("executor", FailingExecutor()), ("result_cache", None),
+                        ("write_buffer", None), ("explanation_worker", None), ("shadow_scorer", None),
+                        ("stream_hub", None), ("analytics", None)]:
+        monkeypatch.setattr(analyze, name, value)
+    errors_before = metrics.errors["analyze_batch"]
+
+    with caplog.at_level(logging.ERROR, logger=analyze.__name__), pytest.raises(HTTPException) as failed:
+        asyncio.run(analyze.analyze_transactions_batch(
+            transactions=[TransactionCreate(**TRANSACTIONS[0])], response=Response(), idempotency_key=None,
+            db=None, current_user=None, predictor_instance=predictor
+        ))
+
+    assert failed.value.status_code == 500
+    assert metrics.errors["analyze_batch"] == errors_before + 1
+    assert [record.exc_info[1].args for record in caplog.records] == [("scoring failed",)]
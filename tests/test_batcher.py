@@ -0,0 +1,69 @@
+import asyncio
+
+from backend.app.services.batcher import MicroBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_are_coalesced_and_routed_back():
+    calls = []
+
+    async def run_batch(records):
+        calls.append(len(records))
+        return [{"echo": record["n"]} for record in records]
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_wait_ms=50, max_batch=100)
+        results = await asyncio.gather(*[batcher.submit({"n": n}) for n in range(10)])
+        return batcher, results
+
+    batcher, results = run(scenario())
+    assert results == [{"echo": n} for n in range(10)]
+    assert calls == [10]
+    assert batcher.stats()["avg_batch_size"] == 10
+
+
+def test_full_group_is_dispatched_without_waiting():
+    calls = []
+
+    async def run_batch(records):
+        calls.append(len(records))
+        return records
+
+    async def scenario():
+        # A max_wait this long would time the test out if size-based dispatch did not kick in
+        batcher = MicroBatcher(run_batch, max_wait_ms=60_000, max_batch=4)
+        return await asyncio.wait_for(
+            asyncio.gather(*[batcher.submit({"n": n}) for n in range(8)]), timeout=5
+        )
+
+    assert len(run(scenario())) == 8
+    assert calls == [4, 4]
+
+
+def test_batch_failure_reaches_every_caller():
+    async def run_batch(records):
+        raise RuntimeError("backlog full")
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_wait_ms=1, max_batch=8)
+        return await asyncio.gather(*[batcher.submit({}) for _ in range(3)], return_exceptions=True)
+
+    results = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_close_flushes_waiting_requests():
+    async def run_batch(records):
+        return records
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_wait_ms=60_000, max_batch=100)
+        pending = asyncio.ensure_future(batcher.submit({"n": 1}))
+        await asyncio.sleep(0)
+        await batcher.close()
+        return await pending
+
+    assert run(scenario()) == {"n": 1}
@@ -0,0 +1,49 @@
+import time
+
+from benchmarks.bench_suite import compare, measure_cold, measure_warm, summarize
+
+
+def test_summarize_reports_milliseconds_and_throughput():
+    result = summarize([0.001, 0.002, 0.003], rows=10)
+    assert result["calls"] == 3 and result["median_ms"] == 2.0
+    assert result["rows_per_s"] == 5000.0
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {
+        "predict/1/warm": {"median_ms": 1.0},
+        "predict/256/warm": {"median_ms": 10.0},
+        "features/1/warm": {"median_ms": 0.01},
+    }
+    results = {
+        "predict/1/warm": {"median_ms": 1.5},
+        # Within the threshold
+        "predict/256/warm": {"median_ms": 12.0},
+        # Doubled, but below the timer noise floor
+        "features/1/warm": {"median_ms": 0.02},
+        # Not in the baseline yet
+        "http/1/warm": {"median_ms": 100.0},
+    }
+    regressions = compare(results, baseline, threshold=0.3)
+    assert [r["benchmark"] for r in regressions] == ["predict/1/warm"]
+    assert regressions[0]["ratio"] == 1.5
+
+
+def test_measure_cold_times_one_call_per_fresh_subject():
+    made, torn_down = [], []
+    samples = measure_cold(lambda: made.append(object()) or made[-1], lambda subject: None, runs=3,
+                           teardown=torn_down.append)
+    assert len(samples) == 3 and made == torn_down
+
+
+def test_measure_warm_builds_call_arguments_outside_the_timer():
+    prepared, called = [], []
+
+    def prepare():
+        time.sleep(0.01)
+        prepared.append(len(prepared))
+        return prepared[-1]
+
+    samples = measure_warm(called.append, min_time=0, min_calls=4, warmup=2, prepare=prepare)
+    assert called == prepared == list(range(6))
+    assert len(samples) == 4 and max(samples) < 0.01
@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pytest
+
+from backend.ml_engine.bundle import BUNDLE_FILE, ModelBundle, export_bundle
+from backend.ml_engine.features import TransactionPreprocessor
+from backend.ml_engine.predictor import FraudPredictor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+TRANSACTIONS = [
+    {"amount": amount, "oldbalanceOrg": balance, "newbalanceOrig": max(balance - amount, 0.0),
+     "oldbalanceDest": 0.0, "newbalanceDest": amount, "type": kind}
+    for amount, balance, kind in [
+        (10.0, 100.0, "PAYMENT"), (9000.0, 9000.0, "TRANSFER"), (250000.0, 0.0, "CASH_OUT"),
+        (35.5, 1200.0, "DEBIT"), (700.0, 50.0, "CASH_IN"),
+    ]
+]
+
+
+@pytest.fixture(scope="module")
+def exported_dir(tmp_path_factory):
+    """A copy of v1 with a freshly exported bundle."""
+    path = tmp_path_factory.mktemp("models") / "v1"
+    shutil.copytree(MODEL_DIR, path)
+    os.remove(path / BUNDLE_FILE)
+    preprocessor = TransactionPreprocessor()
+    preprocessor.load(str(path))
+    export_bundle(
+        str(path), joblib.load(path / "xgb_model.pkl"), joblib.load(path / "iso_forest.pkl"),
+        preprocessor.scaler, preprocessor.feature_columns
+    )
+    return str(path)
+
+
+def test_bundle_predictions_match_the_pickles(exported_dir):
+    from_pickles = FraudPredictor(exported_dir, model_format="pickle")
+    from_pickles.load_models()
+    from_bundle = FraudPredictor(exported_dir, model_format="bundle")
+    from_bundle.load_models()
+    assert from_bundle.bundle is not None and from_bundle.xgb_model is None
+    # Scores, verdicts and SHAP explanations are identical
+    assert from_bundle.predict_batch(TRANSACTIONS) == from_pickles.predict_batch(TRANSACTIONS)
+
+
+def test_bundle_arrays_are_read_only_views_of_the_file(exported_dir):
+    bundle = ModelBundle(os.path.join(exported_dir, BUNDLE_FILE))
+    forest = bundle.compiled_iso().forest
+    for array in (forest.feature, forest.threshold, forest.children, forest.value):
+        assert not array.flags.owndata and not array.flags.writeable
+    # XGBoost leaf values share the threshold array
+    xgb_forest = bundle.compiled_xgb().forest
+    assert xgb_forest.value is xgb_forest.threshold
+    scaler = bundle.scaler()
+    reference = joblib.load(os.path.join(exported_dir, "scaler.pkl"))
+    np.testing.assert_array_equal(scaler.mean_, reference.mean_)
+    np.testing.assert_array_equal(scaler.scale_, reference.scale_)
+    X = np.random.default_rng(0).lognormal(6, 2, (32, reference.n_features_in_))
+    np.testing.assert_array_equal(scaler.transform(X), reference.transform(X))
+
+
+def test_auto_format_and_lazy_explainer(exported_dir, tmp_path):
+    predictor = FraudPredictor(exported_dir, explanation_policy="deferred")
+    predictor.load_models()
+    assert predictor.bundle is not None and predictor.explainer is None
+    assert predictor.explain_transactions(TRANSACTIONS[:1])[0]
+    assert predictor.explainer is not None
+
+    # The native engine can't run from a bundle: auto falls back to the pickles
+    native = FraudPredictor(exported_dir, engine="native")
+    native.load_models()
+    assert native.bundle is None
+    with pytest.raises(ValueError):
+        FraudPredictor(exported_dir, engine="native", model_format="bundle")
+
+    not_a_bundle = tmp_path / BUNDLE_FILE
+    not_a_bundle.write_bytes(b"\x00" * 64)
+    with pytest.raises(ValueError):
+        ModelBundle(str(not_a_bundle))
@@ -0,0 +1,174 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from backend.app.core.cache import IdempotencyConflict, ResultCache, TTLCache, UserCache, _decode, _encode, _snapshot, fingerprint
+from backend.app.models.user import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl_seconds=10, clock=clock)
+    cache.set(1, "a")
+    assert cache.get(1) == "a"
+    clock.now = 10.0
+    assert cache.get(1) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_user_cache_round_trip_and_invalidation():
+    user = User(
+        id=7, email="analyst@aegisflow.com", hashed_password="x", full_name="Analyst",
+        role="analyst", is_active=True, created_at=datetime(2024, 1, 1)
+    )
+    inactive = User(id=8, email="gone@aegisflow.com", hashed_password="x", is_active=False)
+
+    async def scenario():
+        cache = UserCache(ttl_seconds=60)
+        await cache.set(user)
+        await cache.set(inactive)
+        cached = await cache.get(7)
+        await cache.invalidate(7)
+        return cached, await cache.get(7), await cache.get(8)
+
+    cached, after_invalidation, inactive_cached = asyncio.run(scenario())
+    assert cached is not user
+    assert (cached.id, cached.email, cached.role) == (7, "analyst@aegisflow.com", "analyst")
+    assert cached.hashed_password is None
+    assert after_invalidation is None
+    assert inactive_cached is None
+
+
+def test_result_cache_replays_and_rejects_a_reused_key():
+    cache = ResultCache(ttl_seconds=60)
+    calls = []
+
+    async def score():
+        calls.append(1)
+        return {"transaction_id": f"txn_{len(calls)}", "verdict": "ALLOW"}
+
+    payload = fingerprint({"amount": 10.0, "type": "PAYMENT"})
+    # Same content, different key order: same fingerprint
+    assert fingerprint({"type": "PAYMENT", "amount": 10.0}) == payload
+    key = cache.key(7, payload, "retry-1")
+
+    async def scenario():
+        first = await cache.get_or_compute(key, payload, score)
+        retry = await cache.get_or_compute(key, payload, score)
+        with pytest.raises(IdempotencyConflict):
+            await cache.get_or_compute(key, fingerprint({"amount": 99.0}), score)
+        # Without a key (content dedupe off) every submission is scored
+        uncached = await cache.get_or_compute(None, payload, score)
+        return first, retry, uncached
+
+    first, retry, uncached = asyncio.run(scenario())
+    assert first == ({"transaction_id": "txn_1", "verdict": "ALLOW"}, False)
+    assert retry == (first[0], True)
+    assert uncached[0]["transaction_id"] == "txn_2" and len(calls) == 2
+    assert cache.key(8, payload, "retry-1") != key
+    # Only explicit keys deduplicate unless content matching is switched on
+    assert cache.key(7, payload) is None
+    assert ResultCache(by_content=True).key(8, payload) != ResultCache(by_content=True).key(7, payload)
+    assert cache.stats()["replayed"] == 1 and cache.stats()["conflicts"] == 1
+
+
+def test_concurrent_duplicates_wait_for_the_first_submission():
+    cache = ResultCache(ttl_seconds=60)
+    calls = []
+
+    async def score():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise RuntimeError("model unavailable")
+        return {"transaction_id": f"txn_{len(calls)}"}
+
+    async def scenario():
+        key = cache.key(1, "abc", "retry-1")
+        attempts = await asyncio.gather(*[cache.get_or_compute(key, "abc", score) for _ in range(4)],
+                                        return_exceptions=True)
+        return attempts
+
+    failed, *retried = asyncio.run(scenario())
+    # The first attempt failed; one waiter then scored it and the others got that result
+    assert isinstance(failed, RuntimeError) and len(calls) == 2
+    assert [result for result, _ in retried] == [{"transaction_id": "txn_2"}] * 3
+    assert sorted(replayed for _, replayed in retried) == [False, True, True]
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_batches_only_score_what_was_not_seen_before():
+    cache = ResultCache(ttl_seconds=60)
+    scored = []
+
+    async def score(rows):
+        scored.append(rows)
+        return [{"row": row} for row in rows]
+
+    async def scenario():
+        await cache.get_or_compute_many([cache.key(1, "a", "k-a")], ["a"], score)
+        keys = [cache.key(1, "a", "k-a"), cache.key(1, "b", "k-b"), None, cache.key(1, "b", "k-b")]
+        return await cache.get_or_compute_many(keys, ["a", "b", "c", "b"], score)
+
+    results, replayed = asyncio.run(scenario())
+    # "a" is replayed from the first batch, the repeated "b" is scored once
+    assert scored == [[0], [1, 2]]
+    assert results == [{"row": 0}, {"row": 1}, {"row": 2}, {"row": 1}]
+    assert replayed == [True, False, False, True]
+
+
+def test_identical_payloads_without_a_key_are_distinct_transactions():
+    scored = []
+
+    async def score(rows):
+        scored.append(rows)
+        return [{"row": row} for row in rows]
+
+    async def scenario(cache):
+        # Three equal PAYMENTs in one batch, then a fourth one on its own
+        keys = [cache.key(1, "same") for _ in range(3)]
+        batch = await cache.get_or_compute_many(keys, ["same"] * 3, score)
+        single = await cache.get_or_compute_many([cache.key(1, "same")], ["same"], score)
+        return batch, single
+
+    batch, single = asyncio.run(scenario(ResultCache(ttl_seconds=60)))
+    assert batch == ([{"row": 0}, {"row": 1}, {"row": 2}], [False] * 3)
+    assert single == ([{"row": 0}], [False]) and scored == [[0, 1, 2], [0]]
+
+    # Matching by content is opt-in, and even then never collapses items of one batch
+    scored.clear()
+    batch, single = asyncio.run(scenario(ResultCache(ttl_seconds=60, by_content=True)))
+    assert batch[1] == [False] * 3 and scored == [[0, 1, 2]]
+    assert single[1] == [True]
+
+
+def test_redis_snapshots_leave_out_the_password_hash():
+    user = User(id=7, email="analyst@aegisflow.com", hashed_password="$2b$12$secret", role="analyst",
+                is_active=True, created_at=datetime(2024, 1, 1))
+    raw = _encode(_snapshot(user))
+    assert "hashed_password" not in raw and "secret" not in raw
+    # Entries written before are stripped when read back
+    legacy = json.dumps({"id": 7, "email": "analyst@aegisflow.com", "hashed_password": "$2b$12$secret", "is_active": True})
+    assert "hashed_password" not in _decode(legacy)
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.db.base import Base
+from backend.app.db.bulk import COPY_COLUMNS, bulk_insert_transactions, copy_records
+from backend.app.db.pool import InstrumentedAsyncQueuePool
+from backend.app.db.session import engine_options, pool_stats
+from backend.app.models.transaction import Transaction
+
+
+def make_rows(ids):
+    return [
+        {"id": f"txn_{i}", "amount": 10.0 * i, "type": "TRANSFER", "risk_score": 0.1, "risk_level": "LOW",
+         "is_flagged": False, "timestamp": datetime(2024, 1, 1, 12, 0, i)}
+        for i in ids
+    ]
+
+
+def test_engine_options_size_the_pool_and_cache_statements():
+    options = engine_options("postgresql+asyncpg://aegis:secret@db/fraud_detection")
+    assert options["echo"] is False and options["poolclass"] is InstrumentedAsyncQueuePool
+    assert options["pool_pre_ping"] and options["pool_size"] > 0
+    assert options["connect_args"]["prepared_statement_cache_size"] > 0
+    # Builds without connecting
+    engine = create_async_engine("postgresql+asyncpg://aegis:secret@db/fraud_detection", **options)
+    assert pool_stats(engine)["checkouts"] == 0
+
+    # No pool (and no asyncpg arguments) for an in-memory SQLite database
+    assert "poolclass" not in engine_options("sqlite+aiosqlite:///:memory:")
+    assert "connect_args" not in engine_options("sqlite+aiosqlite:///./fraud_detection.db")
+
+
+def test_pool_counts_checkouts_and_bulk_insert_falls_back_to_insert(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'bulk.db'}"
+
+    async def scenario():
+        engine = create_async_engine(url, **engine_options(url))
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_factory() as db:
+            await bulk_insert_transactions(db, make_rows(range(5)))
+            await db.commit()
+        # A replay skips the rows already stored
+        async with session_factory() as db:
+            await bulk_insert_transactions(db, make_rows(range(3, 8)), ignore_existing=True)
+            await db.commit()
+        async with session_factory() as db:
+            ids = (await db.execute(select(Transaction.id).order_by(Transaction.amount))).scalars().all()
+            count = (await db.execute(select(func.count()).select_from(Transaction))).scalar()
+        stats = pool_stats(engine)
+        await engine.dispose()
+        return ids, count, stats
+
+    ids, count, stats = asyncio.run(scenario())
+    assert count == 8 and ids == [f"txn_{i}" for i in range(8)]
+    assert stats["checkouts"] == 4 and stats["checked_out"] == 0 and stats["timeouts"] == 0
+
+
+def test_copy_records_follow_the_table_columns():
+    record, = copy_records(make_rows([2]))
+    assert len(record) == len(COPY_COLUMNS)
+    values = dict(zip(COPY_COLUMNS, record))
+    assert values["id"] == "txn_2" and values["amount"] == 20.0 and values["timestamp"] == datetime(2024, 1, 1, 12, 0, 2)
+    # Columns missing from the row are sent as NULL, or as their default when they have one
+    assert values["merchant_id"] is None and values["explanation"] is None
+    assert values["currency"] == "USD"
+
+
+def test_copy_and_insert_store_the_same_row(tmp_path):
+    # One row without currency, one with currency=None (an unset attribute, see transaction_to_row)
+    rows = make_rows([1, 2])
+    rows[1].update(currency=None, risk_level=None)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bulk.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            await bulk_insert_transactions(db, rows, use_copy=False)
+            await db.commit()
+            stored = (await db.execute(
+                select(*[Transaction.__table__.c[column] for column in COPY_COLUMNS]).order_by(Transaction.id)
+            )).all()
+        await engine.dispose()
+        return stored
+
+    stored = asyncio.run(scenario())
+    assert [tuple(row) for row in stored] == copy_records(rows)
+    assert stored[0].currency == stored[1].currency == "USD" and stored[1].risk_level == "LOW"
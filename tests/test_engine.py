@@ -0,0 +1,111 @@
+import copy
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+
+from backend.ml_engine.engine import CompiledEngine, CompiledIsolationForest, NativeEngine
+from backend.ml_engine.predictor import FraudPredictor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+
+@pytest.fixture(scope="module")
+def models():
+    xgb_model = joblib.load(os.path.join(MODEL_DIR, "xgb_model.pkl"))
+    iso_forest = joblib.load(os.path.join(MODEL_DIR, "iso_forest.pkl"))
+    return xgb_model, iso_forest
+
+
+@pytest.fixture(scope="module")
+def feature_matrix():
+    rng = np.random.default_rng(42)
+    X = (rng.normal(size=(5000, 11)) * 2).astype(np.float32)
+    X[:, 6:] = rng.integers(0, 2, size=(5000, 5))
+    # Missing values must follow each model's default direction
+    X[::37, 5] = np.nan
+    X[::91, 0] = np.nan
+    return X
+
+
+def test_compiled_xgboost_is_bit_for_bit(models, feature_matrix):
+    xgb_model, iso_forest = models
+    native, compiled = NativeEngine(xgb_model, iso_forest), CompiledEngine(xgb_model, iso_forest)
+
+    np.testing.assert_array_equal(
+        compiled.xgb.predict_margin(feature_matrix),
+        xgb_model.get_booster().inplace_predict(feature_matrix, predict_type="margin"),
+    )
+    np.testing.assert_array_equal(compiled.fraud_proba(feature_matrix), native.fraud_proba(feature_matrix))
+
+
+def test_compiled_isolation_forest_is_bit_for_bit(models, feature_matrix):
+    xgb_model, iso_forest = models
+    native, compiled = NativeEngine(xgb_model, iso_forest), CompiledEngine(xgb_model, iso_forest)
+
+    np.testing.assert_array_equal(
+        compiled.iso.decision_function(feature_matrix), iso_forest.decision_function(feature_matrix)
+    )
+    np.testing.assert_array_equal(compiled.anomalies(feature_matrix), native.anomalies(feature_matrix))
+
+
+def test_compiled_isolation_forest_does_not_need_sklearn_internals(models, feature_matrix):
+    _, iso_forest = models
+    expected = iso_forest.decision_function(feature_matrix)
+    public_only = copy.deepcopy(iso_forest)
+    for name in ("_decision_path_lengths", "_average_path_length_per_tree", "_max_samples"):
+        delattr(public_only, name)
+
+    compiled = CompiledIsolationForest.from_model(public_only)
+    np.testing.assert_array_equal(compiled.decision_function(feature_matrix), expected)
+
+
+def test_compiled_engine_scores_single_rows(models, feature_matrix):
+    xgb_model, iso_forest = models
+    native, compiled = NativeEngine(xgb_model, iso_forest), CompiledEngine(xgb_model, iso_forest)
+
+    for row in feature_matrix[:20]:
+        X = row.reshape(1, -1)
+        assert compiled.fraud_proba(X)[0] == native.fraud_proba(X)[0]
+        assert compiled.anomalies(X)[0] == native.anomalies(X)[0]
+
+
+def test_predictor_engines_agree():
+    data = {
+        "amount": 600.0, "oldbalanceOrg": 1000.0, "newbalanceOrig": 400.0,
+        "oldbalanceDest": 0.0, "newbalanceDest": 0.0,
+        "type": "PAYMENT", "transaction_time": "2024-01-15T12:00:00"
+    }
+    results = {}
+    for engine in ("native", "compiled"):
+        predictor = FraudPredictor(model_dir=MODEL_DIR, engine=engine)
+        predictor.load_models()
+        results[engine] = predictor.predict(data)
+
+    assert results["compiled"] == results["native"]
+
+
+def test_feature_name_warnings_are_silenced_only_around_native_scoring(models, feature_matrix):
+    xgb_model, iso_forest = models
+    filters = list(warnings.filters)
+    predictor = FraudPredictor(model_dir=MODEL_DIR, engine="native")
+    predictor.load_models()
+    # Loading models leaves the process-wide warning filters alone
+    assert warnings.filters == filters
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        NativeEngine(xgb_model, iso_forest).anomalies(feature_matrix[:10])
+        predictor.predict_batch([{"amount": 600.0, "oldbalanceOrg": 1000.0, "newbalanceOrig": 400.0,
+                                  "oldbalanceDest": 0.0, "newbalanceDest": 0.0, "type": "PAYMENT"}])
+        assert not [w for w in caught if "valid feature names" in str(w.message)]
+        # Everyone else still gets it
+        iso_forest.predict(feature_matrix[:10])
+    assert [w for w in caught if "valid feature names" in str(w.message)]
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        FraudPredictor(model_dir=MODEL_DIR, engine="gpu")
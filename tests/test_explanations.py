@@ -0,0 +1,221 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.api.endpoints import analyze
+from backend.app.api.endpoints.transactions import read_transaction_explanation, read_transactions
+from backend.app.db.base import Base
+from backend.app.db.explanations import EXPLANATION_DTYPE, FeatureCatalog, explanation_columns
+from backend.app.models.transaction import Transaction
+from backend.app.services.analytics import AnalyticsAggregator
+from backend.app.services.explanations import ExplanationWorker
+from backend.app.services.inference import InferenceExecutor
+from backend.app.services.persistence import _decode, _encode, transaction_to_row
+from backend.ml_engine.predictor import FraudPredictor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+START = datetime(2024, 1, 1, 10, 0)
+
+# The same account three times, at night (the hour is not the hour they are explained at)
+SCORED = [
+    {"amount": amount, "oldbalanceOrg": amount, "newbalanceOrig": 0.0, "oldbalanceDest": 0.0,
+     "newbalanceDest": 0.0, "type": kind, "transaction_time": datetime(2024, 3, 2, 3, minute), "nameOrig": "C1"}
+    for amount, kind, minute in [(181.0, "TRANSFER", 5), (9839.64, "CASH_OUT", 6), (42.0, "PAYMENT", 7)]
+]
+
+
+def scored_with(policy, **kwargs):
+    predictor = FraudPredictor(model_dir=MODEL_DIR, explanation_policy=policy, **kwargs)
+    predictor.load_models()
+    return predictor, predictor.predict_batch(SCORED)
+
+
+def explanation(*factors):
+    return [{"feature": feature, "impact": impact, "value": value} for feature, impact, value in factors]
+
+
+BALANCE_FIRST = explanation(("newbalanceOrig", 2.5, 0.0), ("amount", 1.25, 9000.5), ("type_TRANSFER", -0.5, 1.0))
+AMOUNT_FIRST = explanation(("amount", -3.0, 12.75), ("newbalanceOrig", 0.5, 100.0))
+
+
+async def open_db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+def test_explanations_pack_into_fixed_width_records_with_stable_feature_ids(tmp_path):
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        async with session_factory() as db:
+            columns = await explanation_columns(db, [BALANCE_FIRST, None, AMOUNT_FIRST])
+            # A second catalog (another worker) sees the same ids and registers nothing new
+            other = FeatureCatalog()
+            ids = dict(await other.resolve(db, ["amount", "newbalanceOrig"]))
+            names = await other.lookup(db)
+        await engine.dispose()
+        return columns, ids, names
+
+    (balance, unexplained, amount), ids, names = asyncio.run(scenario())
+    assert unexplained == {"explanation": None, "top_feature": None}
+    assert len(balance["explanation"]) == 3 * EXPLANATION_DTYPE.itemsize == 42
+    assert balance["top_feature"] == ids["newbalanceOrig"] and amount["top_feature"] == ids["amount"]
+    assert sorted(names.values()) == ["amount", "newbalanceOrig", "type_TRANSFER"]
+
+    # Packed bytes survive the write-behind spill file
+    row = transaction_to_row(Transaction(id="txn_1", amount=1.0, timestamp=START, **balance))
+    assert _decode(_encode(row))["explanation"] == balance["explanation"]
+
+
+def test_rows_are_listed_by_top_feature_and_explanations_decode(tmp_path):
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        async with session_factory() as db:
+            explanations = [BALANCE_FIRST if i % 3 else AMOUNT_FIRST for i in range(6)]
+            for i, values in enumerate(await explanation_columns(db, explanations)):
+                db.add(Transaction(id=f"txn_{i}", amount=10.0, risk_score=0.5, risk_level="HIGH",
+                                   timestamp=START + timedelta(minutes=i), **values))
+            await db.commit()
+
+            params = dict(limit=100, cursor=None, risk_level=None, is_flagged=None, merchant_id=None,
+                          start_time=None, end_time=None, current_user=None)
+            by_amount = await read_transactions(db=db, top_feature="amount", **params)
+            never_top = await read_transactions(db=db, top_feature="type_TRANSFER", **params)
+            unknown = await read_transactions(db=db, top_feature="no_such_feature", **params)
+            stored = await read_transaction_explanation("txn_1", db=db, current_user=None)
+        await engine.dispose()
+        return by_amount, never_top, unknown, stored
+
+    by_amount, never_top, unknown, stored = asyncio.run(scenario())
+    assert [t.id for t in by_amount["items"]] == ["txn_3", "txn_0"]
+    assert never_top["items"] == [] and unknown["items"] == []
+    assert stored["status"] == "ready" and stored["explanation"] == BALANCE_FIRST
+
+
+def test_feature_attribution_aggregates_hourly_rollups(tmp_path):
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        aggregator = AnalyticsAggregator(session_factory=session_factory)
+        async with session_factory() as db:
+            columns = await explanation_columns(db, [BALANCE_FIRST, AMOUNT_FIRST, None])
+        aggregator.record([
+            Transaction(id=f"txn_{i}", amount=10.0, risk_score=0.5, risk_level="HIGH", is_flagged=False,
+                        timestamp=START + timedelta(minutes=20 * i), **values)
+            for i, values in enumerate(columns)
+        ])
+        await aggregator.flush()
+        # Explained later (deferred policy) in the next hour, left unflushed
+        aggregator.record_explanations([(START + timedelta(hours=1, minutes=5), columns[0]["explanation"])])
+        attribution = await aggregator.feature_attribution(START, START + timedelta(hours=3))
+        summary = await aggregator.summarize(START, START + timedelta(hours=3))
+        await engine.dispose()
+        return attribution, summary
+
+    attribution, summary = asyncio.run(scenario())
+    assert attribution["explained"] == 3
+    features = {item["feature"]: item for item in attribution["features"]}
+    assert [item["feature"] for item in attribution["features"]][:2] == ["newbalanceOrig", "amount"]
+    assert features["newbalanceOrig"]["top_count"] == 2 and features["newbalanceOrig"]["count"] == 3
+    assert features["newbalanceOrig"]["top_share"] == round(2 / 3, 6)
+    assert features["amount"]["mean_impact"] == (1.25 - 3.0 + 1.25) / 3
+    assert features["type_TRANSFER"]["top_count"] == 0 and features["type_TRANSFER"]["mean_abs_impact"] == 0.5
+    first, second = attribution["hourly"]
+    assert first["top_features"] == {"newbalanceOrig": 1, "amount": 1} and second["explained"] == 1
+    # Late explanations do not count as scored transactions
+    assert summary["totals"]["total"] == 3
+
+
+def test_explanation_policies_and_later_explanations_of_the_scored_input():
+    _, always = scored_with("always")
+    assert all(r["explanation_status"] == "ready" and r["explanation"] for r in always)
+    assert not any("model_input" in r for r in always)
+
+    _, flagged = scored_with("flagged")
+    for result in flagged:
+        explained = result["verdict"] != "ALLOW"
+        assert result["explanation_status"] == ("ready" if explained else "skipped")
+        assert ("model_input" in result) != explained
+    assert all(r["explanation_status"] == "skipped" for r in scored_with("sampled", explanation_sample_rate=0.0)[1])
+    assert all(r["explanation_status"] == "ready" for r in scored_with("sampled", explanation_sample_rate=1.0)[1])
+
+    predictor, deferred = scored_with("deferred")
+    assert [r["risk_score"] for r in deferred] == [r["risk_score"] for r in always]
+    assert all(r["explanation_status"] == "deferred" and r["explanation"] == [] for r in deferred)
+    # Explained exactly as scored (transaction time, velocity state at scoring time)
+    model_inputs = [r["model_input"] for r in deferred]
+    assert predictor.explain_model_inputs(model_inputs) == [r["explanation"] for r in always]
+    with pytest.raises(ValueError):
+        predictor.explain_model_inputs([deferred[0]["model_input"][:-8]])
+
+
+def test_skipped_explanations_are_computed_on_demand_from_the_scored_input(tmp_path, monkeypatch):
+    predictor, results = scored_with("sampled", explanation_sample_rate=0.0)
+    executor = InferenceExecutor(predictor, kind="thread", workers=1)
+    monkeypatch.setattr(analyze, "executor", executor)
+    monkeypatch.setattr(analyze, "explanation_worker", None)
+    monkeypatch.setattr(analyze, "analytics", None)
+    monkeypatch.setattr(analyze, "write_buffer", None)
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        async with session_factory() as db:
+            for i, (data, result) in enumerate(zip(SCORED, results)):
+                db.add(analyze.build_transaction_record(f"txn_{i}", data, result,
+                                                        {"explanation": None, "top_feature": None}))
+            await db.commit()
+            explained = [await read_transaction_explanation(f"txn_{i}", db=db, current_user=None)
+                         for i in range(len(SCORED))]
+            # Stored: the next read decodes it
+            again = await read_transaction_explanation("txn_1", db=db, current_user=None)
+        async with session_factory() as db:
+            row = await db.get(Transaction, "txn_1")
+        await engine.dispose()
+        return explained, again, row
+
+    explained, again, row = asyncio.run(scenario())
+    executor.shutdown()
+
+    _, always = scored_with("always")
+    assert all(e["status"] == "ready" for e in explained)
+    assert [e["explanation"] for e in explained] == [r["explanation"] for r in always]
+    assert [(f["feature"], f["value"]) for f in again["explanation"]] == \
+        [(f["feature"], f["value"]) for f in always[1]["explanation"]]
+    assert row.explanation is not None and row.model_input is None
+
+
+def test_deferred_explanations_are_computed_from_the_scored_input(tmp_path):
+    predictor, results = scored_with("deferred")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        executor = InferenceExecutor(predictor, kind="thread", workers=1)
+        explained = []
+        worker = ExplanationWorker(lambda: executor, session_factory=session_factory, on_explained=explained.extend)
+        async with session_factory() as db:
+            records = [analyze.build_transaction_record(f"txn_{i}", data, result,
+                                                        {"explanation": None, "top_feature": None})
+                       for i, (data, result) in enumerate(zip(SCORED, results))]
+            db.add_all(records)
+            await db.commit()
+        worker.start()
+        for record in records:
+            assert worker.submit(record.id, record.model_input, record.timestamp)
+        await worker.stop()
+        async with session_factory() as db:
+            stored = [await read_transaction_explanation(record.id, db=db, current_user=None) for record in records]
+            rows = [await db.get(Transaction, record.id) for record in records]
+        executor.shutdown()
+        await engine.dispose()
+        return worker.stats(), explained, stored, rows
+
+    stats, explained, stored, rows = asyncio.run(scenario())
+    _, always = scored_with("always")
+    assert stats["completed"] == len(SCORED) and len(explained) == len(SCORED)
+    assert [[(f["feature"], f["value"]) for f in s["explanation"]] for s in stored] == \
+        [[(f["feature"], f["value"]) for f in r["explanation"]] for r in always]
+    assert all(row.model_input is None for row in rows)
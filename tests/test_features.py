@@ -0,0 +1,92 @@
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from backend.ml_engine.features import TransactionPreprocessor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+TRANSACTIONS = [
+    {
+        "amount": 600.0, "oldbalanceOrg": 1000.0, "newbalanceOrig": 400.0,
+        "oldbalanceDest": 0.0, "newbalanceDest": 0.0,
+        "type": "PAYMENT", "transaction_time": "2024-01-15T12:00:00"
+    },
+    {
+        "amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0,
+        "oldbalanceDest": 21182.0, "newbalanceDest": 0.0,
+        "type": "TRANSFER", "transaction_time": datetime(2024, 3, 2, 3, 45)
+    },
+    {
+        "amount": 9839.64, "oldbalanceOrg": 170136.0, "newbalanceOrig": 160296.36,
+        "oldbalanceDest": 0.0, "newbalanceDest": 0.0,
+        "type": "CASH_OUT", "transaction_time": datetime(2024, 3, 2, 23, 5, tzinfo=timezone.utc)
+    },
+    {
+        "amount": 1.5, "oldbalanceOrg": 0.0, "newbalanceOrig": 0.0,
+        "oldbalanceDest": 5.0, "newbalanceDest": 6.5,
+        "type": "CASH_IN", "transaction_time": "2024-06-30T07:59:59+05:30"
+    },
+    {
+        # No timestamp at all -> default hour
+        "amount": 42.0, "oldbalanceOrg": 100.0, "newbalanceOrig": 58.0,
+        "oldbalanceDest": 0.0, "newbalanceDest": 42.0, "type": "DEBIT"
+    },
+]
+
+
+@pytest.fixture
+def preprocessor():
+    preprocessor = TransactionPreprocessor()
+    preprocessor.load(MODEL_DIR)
+    return preprocessor
+
+
+@pytest.mark.parametrize("data", TRANSACTIONS)
+def test_numpy_path_matches_dataframe_path(preprocessor, data):
+    expected = preprocessor.transform(data).to_numpy(dtype=np.float64)
+    actual = preprocessor.transform_array(data)
+
+    assert actual.dtype == np.float32
+    assert actual.shape == (1, len(preprocessor.feature_columns))
+    np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6)
+
+
+def test_batch_numpy_path_matches_row_by_row(preprocessor):
+    expected = np.vstack([preprocessor.transform(data).to_numpy(dtype=np.float64) for data in TRANSACTIONS])
+    actual = preprocessor.transform_batch_array(TRANSACTIONS)
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6)
+
+
+def test_numpy_path_missing_time_is_nan_like_dataframe_path(preprocessor):
+    data = dict(TRANSACTIONS[0], transaction_time=None)
+    hour_col = preprocessor.feature_columns.index("hour_of_day")
+
+    assert np.isnan(preprocessor.transform(data).iloc[0, hour_col])
+    assert np.isnan(preprocessor.transform_array(data)[0, hour_col])
+
+
+def test_numpy_path_unfitted_scaler_leaves_values_raw():
+    preprocessor = TransactionPreprocessor()
+    data = TRANSACTIONS[1]
+
+    expected = preprocessor.transform(data).to_numpy(dtype=np.float64)
+    np.testing.assert_allclose(preprocessor.transform_array(data), expected, rtol=1e-6)
+
+
+def test_reusable_buffer(preprocessor):
+    buffer = np.full((8, len(preprocessor.feature_columns)), 99.0, dtype=np.float32)
+
+    first = preprocessor.transform_batch_array(TRANSACTIONS[:3], out=buffer)
+    assert np.shares_memory(first, buffer)
+    np.testing.assert_array_equal(first, preprocessor.transform_batch_array(TRANSACTIONS[:3]))
+
+    # A smaller follow-up batch must not leak one-hot flags from the previous one
+    second = preprocessor.transform_batch_array(TRANSACTIONS[3:4], out=buffer)
+    np.testing.assert_array_equal(second, preprocessor.transform_array(TRANSACTIONS[3]))
+
+    with pytest.raises(ValueError):
+        preprocessor.transform_batch_array(TRANSACTIONS, out=buffer[:2])
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), "..")
+HEAVY_MODULES = ("pandas", "sklearn", "shap", "xgboost", "scipy", "joblib")
+
+
+def imported_after(statement):
+    """Heavy modules present in sys.modules after running `statement` in a fresh interpreter."""
+    code = f"import sys\n{statement}\nprint(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=REPO_ROOT).stdout
+    return output.splitlines()[-1].split()
+
+
+def test_importing_the_api_does_not_import_the_ml_stack():
+    assert imported_after("import backend.app.main") == []
+
+
+def test_loading_a_model_imports_what_it_needs():
+    statement = (
+        "from backend.ml_engine.predictor import FraudPredictor\n"
+        "p = FraudPredictor('backend/ml_engine/saved_models/v1', model_format='pickle')\n"
+        "p.load_models()"
+    )
+    assert {"sklearn", "xgboost", "shap", "joblib"} <= set(imported_after(statement))
+
+
+def test_serving_from_a_bundle_needs_only_numpy():
+    statement = (
+        "from backend.ml_engine.predictor import FraudPredictor\n"
+        "p = FraudPredictor('backend/ml_engine/saved_models/v1', model_format='bundle', explanation_policy='deferred')\n"
+        "p.load_models()\n"
+        "p.predict_batch([{'amount': 10.0, 'oldbalanceOrg': 100.0, 'newbalanceOrig': 90.0,"
+        " 'oldbalanceDest': 0.0, 'newbalanceDest': 10.0, 'type': 'PAYMENT'}])"
+    )
+    assert imported_after(statement) == []
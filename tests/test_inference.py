@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend.app.api.endpoints import analyze
+from backend.app.services.inference import InferenceExecutor
+from backend.ml_engine.predictor import FraudPredictor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+TRANSACTIONS = [
+    {"amount": 9000.0, "oldbalanceOrg": 9000.0, "newbalanceOrig": 0.0,
+     "oldbalanceDest": 0.0, "newbalanceDest": 0.0, "type": "TRANSFER"},
+    {"amount": 42.0, "oldbalanceOrg": 100.0, "newbalanceOrig": 58.0,
+     "oldbalanceDest": 0.0, "newbalanceDest": 42.0, "type": "PAYMENT"},
+]
+
+
+class BlockingPredictor:
+    """Holds every call until released, so calls pile up in the executor."""
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict(self, data):
+        self.release.wait(5)
+        if data.get("fail"):
+            raise RuntimeError("model error")
+        return {"verdict": "ALLOW"}
+
+
+def test_backlog_beyond_the_limit_is_shed_with_503(monkeypatch):
+    predictor = BlockingPredictor()
+    executor = InferenceExecutor(predictor, kind="thread", workers=1, max_backlog=2)
+    monkeypatch.setattr(analyze, "executor", executor)
+
+    async def scenario():
+        accepted = [asyncio.ensure_future(analyze.run_inference("predict", {})) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as shed:
+            await analyze.run_inference("predict", {})
+        predictor.release.set()
+        return await asyncio.gather(*accepted), shed.value
+
+    try:
+        results, shed = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert shed.status_code == 503 and results == [{"verdict": "ALLOW"}] * 2
+    stats = executor.stats()
+    assert (stats["submitted"], stats["rejected"], stats["completed"], stats["failed"]) == (2, 1, 2, 0)
+
+
+def test_failed_calls_are_not_counted_as_completed():
+    predictor = BlockingPredictor()
+    predictor.release.set()
+    executor = InferenceExecutor(predictor, kind="thread", workers=1)
+
+    async def scenario():
+        await executor.run("predict", {})
+        with pytest.raises(RuntimeError):
+            await executor.run("predict", {"fail": True})
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    stats = executor.stats()
+    assert (stats["submitted"], stats["completed"], stats["failed"], stats["in_flight"]) == (2, 1, 1, 0)
+    # The average covers the successful call only
+    assert stats["avg_wait_ms"] == round(executor.total_wait * 1000, 3)
+
+
+def test_process_pool_workers_score_like_the_parent():
+    predictor = FraudPredictor(model_dir=MODEL_DIR, explanation_policy="flagged")
+    predictor.load_models()
+    executor = InferenceExecutor(
+        predictor, kind="process", workers=1,
+        predictor_kwargs={"model_dir": MODEL_DIR, "explanation_policy": "flagged"}
+    )
+
+    async def scenario():
+        await executor.start()
+        return await executor.run("predict_batch", TRANSACTIONS)
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert results == predictor.predict_batch(TRANSACTIONS)
+    # The warm-up pings are not counted
+    assert executor.stats()["submitted"] == 1 and executor.stats()["completed"] == 1
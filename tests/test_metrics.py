@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+from backend.app.core.metrics import Histogram, Metrics, metrics
+from backend.app.services.inference import InferenceExecutor
+from backend.ml_engine.predictor import FraudPredictor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+TRANSACTION = {
+    "amount": 9000.0, "oldbalanceOrg": 9000.0, "newbalanceOrig": 0.0,
+    "oldbalanceDest": 0.0, "newbalanceDest": 0.0, "type": "TRANSFER",
+}
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram([0.001, 0.01, 0.1])
+    for value in [0.0005, 0.001, 0.05, 3.0]:
+        histogram.observe(value)
+    # An observation equal to a bound counts in that bucket (le = "less or equal")
+    assert histogram.cumulative() == [("0.001", 2), ("0.01", 2), ("0.1", 3), ("+Inf", 4)]
+    assert histogram.count == 4 and abs(histogram.sum - 3.0515) < 1e-12
+
+
+def test_render_uses_the_prometheus_text_format():
+    registry = Metrics()
+    registry.observe_stage("xgboost", 0.0002)
+    registry.observe_batch("predict", 64)
+    registry.count_error("analyze")
+    text = registry.render([("aegisflow_model_info", "Model version being served.", {"version": 'v"2'}, 1)])
+    lines = text.splitlines()
+    assert "# TYPE aegisflow_stage_duration_seconds histogram" in lines
+    assert 'aegisflow_stage_duration_seconds_bucket{stage="xgboost",le="0.0001"} 0' in lines
+    assert 'aegisflow_stage_duration_seconds_bucket{stage="xgboost",le="0.00025"} 1' in lines
+    assert 'aegisflow_stage_duration_seconds_count{stage="xgboost"} 1' in lines
+    assert 'aegisflow_batch_size_bucket{kind="predict",le="32"} 0' in lines
+    assert 'aegisflow_batch_size_bucket{kind="predict",le="64"} 1' in lines
+    assert 'aegisflow_analyze_errors_total{endpoint="analyze"} 1' in lines
+    assert 'aegisflow_model_info{version="v\\"2"} 1' in lines
+    assert text.endswith("\n")
+
+
+def test_executor_reports_predictor_stage_timings():
+    predictor = FraudPredictor(MODEL_DIR, explanation_policy="always")
+    predictor.load_models()
+    executor = InferenceExecutor(predictor, kind="thread", workers=1)
+    metrics.reset()
+    try:
+        asyncio.run(executor.run("predict_batch", [TRANSACTION] * 3))
+    finally:
+        executor.shutdown()
+    assert {"queue_wait", "preprocess", "xgboost", "isolation_forest", "shap"} <= set(metrics.stages)
+    assert all(metrics.stages[stage].count == 1 for stage in ["preprocess", "xgboost", "shap"])
+    assert metrics.batch_sizes["predict"].sum == 3
+    metrics.reset()
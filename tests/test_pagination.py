@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.api.endpoints.transactions import decode_cursor, encode_cursor, read_transactions
+from backend.app.db.base import Base
+from backend.app.models.transaction import Transaction
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_rows():
+    rows = []
+    for i in range(10):
+        rows.append(Transaction(
+            id=f"txn_{i:02d}", amount=10.0 * (i + 1), type="PAYMENT",
+            # Pairs of rows share a timestamp so the id tie-breaker matters
+            timestamp=START + timedelta(seconds=i // 2),
+            risk_score=0.9 if i % 3 == 0 else 0.1,
+            risk_level="CRITICAL" if i % 3 == 0 else "LOW",
+            is_flagged=i % 3 == 0,
+            merchant_id="m_a" if i < 5 else "m_b",
+        ))
+    return rows
+
+
+def list_transactions(session, **filters):
+    params = dict(limit=100, cursor=None, risk_level=None, is_flagged=None,
+                  merchant_id=None, start_time=None, end_time=None, current_user=None)
+    params.update(filters)
+    return read_transactions(db=session, **params)
+
+
+def run_with_db(tmp_path, scenario):
+    async def wrapper():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_factory() as session:
+            session.add_all(make_rows())
+            await session.commit()
+            result = await scenario(session)
+        await engine.dispose()
+        return result
+    return asyncio.run(wrapper())
+
+
+def test_cursor_walk_returns_every_row_once_newest_first(tmp_path):
+    async def scenario(session):
+        seen, cursor = [], None
+        while True:
+            page = await list_transactions(session, limit=3, cursor=cursor)
+            seen.extend(t.id for t in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    assert run_with_db(tmp_path, scenario) == [f"txn_{i:02d}" for i in reversed(range(10))]
+
+
+def test_filters_combine_with_pagination(tmp_path):
+    async def scenario(session):
+        flagged = await list_transactions(session, is_flagged=True, limit=2)
+        rest = await list_transactions(session, is_flagged=True, limit=2, cursor=flagged["next_cursor"])
+        merchant = await list_transactions(session, merchant_id="m_a", risk_level="LOW")
+        window = await list_transactions(
+            session, start_time=START + timedelta(seconds=1), end_time=START + timedelta(seconds=3)
+        )
+        return flagged, rest, merchant, window
+
+    flagged, rest, merchant, window = run_with_db(tmp_path, scenario)
+    assert [t.id for t in flagged["items"]] == ["txn_09", "txn_06"]
+    assert [t.id for t in rest["items"]] == ["txn_03", "txn_00"]
+    assert rest["next_cursor"] is None
+    assert [t.id for t in merchant["items"]] == ["txn_04", "txn_02", "txn_01"]
+    assert [t.id for t in window["items"]] == ["txn_05", "txn_04", "txn_03", "txn_02"]
+
+
+def test_cursor_round_trip_and_rejection():
+    cursor = encode_cursor(START, "txn_01")
+    assert decode_cursor(cursor) == (START, "txn_01")
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.db.base import Base
+from backend.app.models.transaction import Transaction
+from backend.app.services.persistence import WriteBehindBuffer, WriteBufferFull, _encode, _try_lock, transaction_to_row
+
+
+def make_rows(prefix, n):
+    return [
+        Transaction(
+            id=f"{prefix}_{i}", amount=100.0 + i, type="TRANSFER",
+            risk_score=0.5, risk_level="HIGH", is_flagged=False, timestamp=datetime(2024, 1, 1, 12, 0, i)
+        )
+        for i in range(n)
+    ]
+
+
+async def open_db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def count_rows(session_factory):
+    async with session_factory() as db:
+        return (await db.execute(select(func.count()).select_from(Transaction))).scalar()
+
+
+def test_rows_are_bulk_inserted_on_flush_and_close(tmp_path):
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        buffer = WriteBehindBuffer(
+            str(tmp_path / "spill.jsonl"), max_batch=1000, flush_interval_ms=60_000, session_factory=session_factory
+        )
+        await buffer.start()
+        buffer.add(make_rows("a", 3))
+        assert await count_rows(session_factory) == 0
+        await buffer.flush()
+        assert await count_rows(session_factory) == 3
+
+        buffer.add(make_rows("b", 2))
+        await buffer.close()
+        total = await count_rows(session_factory)
+        async with session_factory() as db:
+            stored = await db.get(Transaction, "b_1")
+        await engine.dispose()
+        return buffer, total, stored
+
+    buffer, total, stored = asyncio.run(scenario())
+    assert total == 5
+    assert stored.timestamp == datetime(2024, 1, 1, 12, 0, 1)
+    assert buffer.stats()["flushed_rows"] == 5
+    assert os.listdir(tmp_path) == ["test.db"]
+
+
+def test_unflushed_rows_are_replayed_after_a_crash(tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        crashed = WriteBehindBuffer(spill, flush_interval_ms=60_000, session_factory=session_factory)
+        await crashed.start()
+        crashed.add(make_rows("a", 4))
+        # Simulate a crash: the flusher dies without draining (and the process's lock goes with it)
+        crashed._task.cancel()
+        crashed._spill.close()
+        crashed._owner_lock.close()
+
+        restarted = WriteBehindBuffer(spill, session_factory=session_factory)
+        await restarted.start()
+        await restarted.close()
+        total = await count_rows(session_factory)
+        await engine.dispose()
+        return restarted, total
+
+    restarted, total = asyncio.run(scenario())
+    assert total == 4
+    assert restarted.stats()["replayed_rows"] == 4
+
+
+def test_replay_skips_rows_that_were_already_committed(tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        first = WriteBehindBuffer(spill, flush_interval_ms=60_000, session_factory=session_factory)
+        await first.start()
+        first.add(make_rows("a", 2))
+        await first.flush()
+        # Crash between the commit and the segment cleanup: put the rows back in the spill file
+        first.add(make_rows("a", 2))
+        first._task.cancel()
+        first._spill.close()
+        first._owner_lock.close()
+
+        second = WriteBehindBuffer(spill, session_factory=session_factory)
+        await second.start()
+        await second.close()
+        total = await count_rows(session_factory)
+        await engine.dispose()
+        return total
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_rejected_rows_are_dead_lettered_instead_of_blocking_later_flushes(tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        buffer = WriteBehindBuffer(spill, flush_interval_ms=60_000, session_factory=session_factory)
+        await buffer.start()
+        buffer.add(make_rows("a", 1))
+        await buffer.flush()
+        # Two colliding ids among valid rows
+        buffer.add(make_rows("b", 3) + make_rows("a", 1) + make_rows("c", 4) + make_rows("b", 1))
+        await buffer.flush()
+        buffer.add(make_rows("d", 2))
+        await buffer.close()
+        total = await count_rows(session_factory)
+        await engine.dispose()
+        return buffer, total
+
+    buffer, total = asyncio.run(scenario())
+    assert total == 1 + 3 + 4 + 2
+    stats = buffer.stats()
+    assert stats["failed_flushes"] == 0 and stats["buffered"] == 0 and stats["dead_lettered_rows"] == 2
+    with open(buffer.dead_letter_path) as f:
+        dead = [json.loads(line) for line in f]
+    assert [item["row"]["id"] for item in dead] == ["a_0", "b_0"]
+    assert "UNIQUE" in dead[0]["error"]
+
+
+def test_buffer_is_capped_while_the_database_is_down(tmp_path):
+    async def scenario():
+        # No tables: every flush fails for reasons that have nothing to do with the rows
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        buffer = WriteBehindBuffer(
+            str(tmp_path / "spill.jsonl"), flush_interval_ms=60_000, max_buffered=5,
+            session_factory=async_sessionmaker(engine, expire_on_commit=False)
+        )
+        await buffer.start()
+        buffer.add(make_rows("a", 4))
+        await buffer.flush()
+        with pytest.raises(WriteBufferFull):
+            buffer.add(make_rows("b", 2))
+        buffer.add(make_rows("c", 1))
+        stats = buffer.stats()
+        buffer._task.cancel()
+        await engine.dispose()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["failed_flushes"] == 1 and stats["dead_lettered_rows"] == 0
+    assert stats["buffered"] == 5 and stats["rejected_adds"] == 1
+
+
+def test_each_process_spills_to_its_own_file_and_only_dead_ones_are_replayed(tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    # Another worker (pid 999999) with one unflushed row: running while it holds its lock
+    other_spill = str(tmp_path / "spill.999999.jsonl")
+    other_lock = _try_lock(str(tmp_path / "spill.999999.lock"))
+    with open(other_spill, "w") as f:
+        f.write(_encode(transaction_to_row(make_rows("other", 1)[0])) + "\n")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        buffer = WriteBehindBuffer(spill, flush_interval_ms=60_000, session_factory=session_factory)
+        await buffer.start()
+        buffer.add(make_rows("a", 2))
+        await buffer.flush()
+        await buffer.close()
+        while_running = await count_rows(session_factory)
+
+        # The other worker exits without flushing: the next start claims its files
+        other_lock.close()
+        restarted = WriteBehindBuffer(spill, session_factory=session_factory)
+        await restarted.start()
+        await restarted.close()
+        after_exit = await count_rows(session_factory)
+        await engine.dispose()
+        return buffer, while_running, after_exit
+
+    buffer, while_running, after_exit = asyncio.run(scenario())
+    assert buffer.spill_path == str(tmp_path / f"spill.{os.getpid()}.jsonl")
+    assert while_running == 2 and after_exit == 3
+    assert sorted(os.listdir(tmp_path)) == ["test.db"]
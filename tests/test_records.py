@@ -0,0 +1,139 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.api.endpoints import analyze
+from backend.app.core.cache import ResultCache
+from backend.app.db.base import Base
+from backend.app.models.transaction import Transaction
+from backend.app.schemas.transaction import TransactionCreate
+from backend.app.services.inference import InferenceExecutor
+from backend.ml_engine.features import TransactionPreprocessor
+from backend.ml_engine.predictor import FraudPredictor
+from backend.ml_engine.records import RECORD_DTYPE, decode_records, encode_records, records_to_dicts, validate_records
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+TRANSACTIONS = [
+    {
+        "amount": 600.0, "oldbalanceOrg": 1000.0, "newbalanceOrig": 400.0, "oldbalanceDest": 0.0,
+        "newbalanceDest": 0.0, "type": "PAYMENT", "transaction_time": "2024-06-30T07:59:59+05:30", "nameOrig": "C1"
+    },
+    {
+        "amount": 181.0, "oldbalanceOrg": 181.0, "newbalanceOrig": 0.0, "oldbalanceDest": 21182.0,
+        "newbalanceDest": 0.0, "type": "TRANSFER", "transaction_time": datetime(2024, 3, 2, 23, 5, tzinfo=timezone.utc),
+        "nameOrig": "C1"
+    },
+    {
+        # Naive times are local wall-clock times
+        "amount": 9839.64, "oldbalanceOrg": 170136.0, "newbalanceOrig": 160296.36, "oldbalanceDest": 0.0,
+        "newbalanceDest": 0.0, "type": "CASH_OUT", "transaction_time": datetime(2024, 3, 2, 3, 45), "nameOrig": "C2"
+    },
+    {
+        "amount": 42.0, "oldbalanceOrg": 100.0, "newbalanceOrig": 58.0, "oldbalanceDest": 0.0,
+        "newbalanceDest": 42.0, "type": "DEBIT", "transaction_time": None, "nameOrig": None
+    },
+]
+
+
+def test_records_decode_into_the_same_feature_rows_as_json_payloads():
+    body = encode_records(TRANSACTIONS)
+    assert len(body) == len(TRANSACTIONS) * RECORD_DTYPE.itemsize
+    records = decode_records(body)
+    # As the JSON endpoints see the same transactions
+    payloads = [TransactionCreate(**data).model_dump(exclude={"idempotency_key"}) for data in TRANSACTIONS]
+
+    loaded = TransactionPreprocessor()
+    loaded.load(MODEL_DIR)
+    windows = {"1h": 3600.0}
+    for from_dicts, from_records in [(loaded, loaded), (TransactionPreprocessor(velocity_windows=windows),
+                                                        TransactionPreprocessor(velocity_windows=windows))]:
+        expected = from_dicts.transform_batch_array(payloads)
+        actual = from_records.transform_records_array(records)
+        np.testing.assert_array_equal(actual, expected)
+    # The repeat account picked up velocity, the anonymous one did not
+    assert actual[1, -2] == 1 and actual[3, -2] == 0
+
+    decoded = records_to_dicts(records)
+    assert [set(data) for data in decoded] == [set(payload) for payload in payloads]
+    for data, payload in zip(decoded, payloads):
+        assert {k: v for k, v in data.items() if k != "transaction_time"} == \
+            {k: v for k, v in payload.items() if k != "transaction_time"}
+    assert decoded[0]["transaction_time"] == payloads[0]["transaction_time"] and decoded[3]["transaction_time"] is None
+
+
+def test_invalid_records_are_reported_per_field():
+    records = np.zeros(3, dtype=RECORD_DTYPE)
+    records["amount"] = [10.0, 0.0, np.nan]
+    records["oldbalanceDest"][2] = -1.0
+    records["type"][0] = 5
+    records["transaction_time"] = [np.nan, 0.0, np.inf]
+
+    assert validate_records(records) == [
+        (0, "type", "Type code should be below 5"),
+        (1, "amount", "Input should be greater than 0"),
+        (2, "amount", "Input should be greater than 0"),
+        (2, "oldbalanceDest", "Input should be greater than or equal to 0"),
+        (2, "transaction_time", "Input should be a finite number or NaN"),
+    ]
+    assert validate_records(decode_records(encode_records(TRANSACTIONS))) == []
+    with pytest.raises(ValueError):
+        decode_records(b"\x00" * (RECORD_DTYPE.itemsize + 1))
+
+
+def test_records_endpoint_scores_stores_and_replays(tmp_path, monkeypatch):
+    predictor = FraudPredictor(model_dir=MODEL_DIR, explanation_policy="deferred")
+    predictor.load_models()
+    executor = InferenceExecutor(predictor, kind="thread", workers=1)
+    monkeypatch.setattr(analyze, "predictor", predictor)
+    monkeypatch.setattr(analyze, "executor", executor)
+    monkeypatch.setattr(analyze, "result_cache", ResultCache(max_size=100, ttl_seconds=60))
+    body = encode_records(TRANSACTIONS)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def post(body, content_type=analyze.RECORDS_MEDIA_TYPE, idempotency_key=None):
+            response = Response()
+            async with session_factory() as db:
+                results = await analyze.analyze_transaction_records(
+                    body=body, response=response, content_type=content_type, idempotency_key=idempotency_key,
+                    db=db, current_user=None, predictor_instance=predictor
+                )
+            return results, response.headers.get("Idempotent-Replayed")
+
+        first = await post(body, idempotency_key="gateway-1")
+        retry = await post(body, idempotency_key="gateway-1")
+        # Equal transactions without a key are distinct transactions, not retries
+        repeated = await post(encode_records([TRANSACTIONS[0]] * 3))
+        errors = []
+        for bad in [dict(body=body, content_type="application/json"), dict(body=body[:-1])]:
+            with pytest.raises(HTTPException) as error:
+                await post(**bad)
+            errors.append(error.value.status_code)
+        async with session_factory() as db:
+            stored = await db.scalar(select(func.count()).select_from(Transaction))
+        await engine.dispose()
+        return first, retry, repeated, errors, stored
+
+    (results, replayed), (retried, replayed_again), repeated, errors, stored = asyncio.run(scenario())
+    executor.shutdown()
+
+    expected = FraudPredictor(model_dir=MODEL_DIR, explanation_policy="deferred")
+    expected.load_models()
+    assert [r["risk_score"] for r in results] == [r["risk_score"] for r in expected.predict_batch(TRANSACTIONS)]
+    assert all(r["explanation_status"] == "deferred" for r in results) and replayed is None
+    assert [r["transaction_id"] for r in retried] == [r["transaction_id"] for r in results]
+    assert replayed_again == "0,1,2,3"
+    assert len({r["transaction_id"] for r in repeated[0]}) == 3 and repeated[1] is None
+    assert stored == len(TRANSACTIONS) + 3
+    assert errors == [415, 422]
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.services.models import ModelManager, ModelReloadInProgress
+from backend.ml_engine import trainer
+from backend.ml_engine.datasets import iter_file_chunks
+from backend.ml_engine.loader import MANIFEST_FILE, ModelRegistry
+from backend.ml_engine.predictor import FraudPredictor
+
+V1_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+
+def make_registry(tmp_path, n_versions=2):
+    for i in range(1, n_versions + 1):
+        shutil.copytree(V1_DIR, tmp_path / f"v{i}")
+    return ModelRegistry(str(tmp_path))
+
+
+def test_versions_need_a_manifest_and_sort_numerically(tmp_path):
+    registry = make_registry(tmp_path)
+    shutil.copytree(V1_DIR, tmp_path / "v10")
+    # Still being written: no manifest yet
+    os.makedirs(tmp_path / "v11")
+    assert registry.versions() == ["v1", "v2", "v10"]
+    assert registry.resolve() == "v10"
+    assert registry.create_version() == "v12"
+    with pytest.raises(ValueError):
+        registry.resolve("v11")
+    with pytest.raises(ValueError):
+        registry.resolve("../v1")
+
+
+def test_write_manifest_and_verify(tmp_path):
+    registry = make_registry(tmp_path, n_versions=1)
+    version = registry.create_version()
+    for name in ("scaler.pkl", "xgb_model.pkl", "iso_forest.pkl"):
+        shutil.copy(os.path.join(V1_DIR, name), tmp_path / version / name)
+    manifest = registry.write_manifest(version, trainer={"n_samples": 10})
+    assert registry.manifest(version) == manifest
+    assert registry.latest() == version
+    registry.verify(version)
+
+    with open(tmp_path / version / "iso_forest.pkl", "ab") as f:
+        f.write(b"tampered")
+    with pytest.raises(ValueError):
+        registry.verify(version)
+
+
+def test_reload_swaps_atomically_and_retires_the_old_executor(tmp_path):
+    registry = make_registry(tmp_path)
+    served = []
+
+    async def scenario():
+        manager = ModelManager(
+            registry,
+            predictor_kwargs={},
+            executor_kwargs={"kind": "thread", "workers": 1},
+            on_swap=lambda predictor, executor: served.append((predictor, executor))
+        )
+        assert await manager.activate("v1") == "v1"
+        old_executor = manager.executor
+
+        assert manager.reload_in_background() == "v2"
+        with pytest.raises(ModelReloadInProgress):
+            manager.reload_in_background("v1")
+        with pytest.raises(ValueError):
+            manager.reload_in_background("v9")
+        # The old version keeps serving while the new one loads
+        result = await old_executor.run("predict_batch", [{
+            "amount": 10.0, "oldbalanceOrg": 100.0, "newbalanceOrig": 90.0,
+            "oldbalanceDest": 0.0, "newbalanceDest": 10.0, "type": "PAYMENT"
+        }])
+        assert len(result) == 1
+
+        while manager.reload_status["state"] == "loading":
+            await asyncio.sleep(0.01)
+        await manager.close()
+        return manager, old_executor
+
+    manager, old_executor = asyncio.run(scenario())
+    assert manager.reload_status["state"] == "ready"
+    assert manager.status()["active_version"] == "v2"
+    assert [p.model_dir for p, _ in served] == [registry.path("v1"), registry.path("v2")]
+    assert served[-1] == (manager.predictor, manager.executor)
+    assert old_executor.pool._shutdown
+
+
+def test_failed_reload_keeps_serving_the_current_version(tmp_path):
+    registry = make_registry(tmp_path)
+    os.remove(tmp_path / "v2" / "xgb_model.pkl")
+
+    async def scenario():
+        manager = ModelManager(registry, {}, {"kind": "thread", "workers": 1}, on_swap=lambda p, e: None)
+        await manager.activate("v1")
+        with pytest.raises(Exception):
+            await manager.activate("v2")
+        await manager.close()
+        return manager
+
+    manager = asyncio.run(scenario())
+    assert manager.active_version == "v1"
+    assert manager.reload_status["state"] == "failed"
+
+
+def test_velocity_state_follows_the_swap_including_late_old_model_calls(tmp_path):
+    history_csv = tmp_path / "history.csv"
+    trainer.generate_synthetic_data(6000, with_accounts=True).to_csv(history_csv, index=False)
+    first = trainer.train_models_streaming(
+        lambda: iter_file_chunks([str(history_csv)], chunk_size=1000), source="history.csv",
+        velocity=True, nthread=1, model_root=str(tmp_path)
+    )
+    registry = ModelRegistry(str(tmp_path))
+    second = registry.create_version()
+    shutil.copytree(registry.path(first), tmp_path / second, dirs_exist_ok=True)
+
+    start = datetime(2024, 1, 1, 12)
+    burst = [{"amount": 10.0, "oldbalanceOrg": 100.0, "newbalanceOrig": 90.0, "oldbalanceDest": 0.0,
+              "newbalanceDest": 10.0, "type": "TRANSFER", "nameOrig": "C_burst",
+              "transaction_time": start + timedelta(minutes=i)} for i in range(3)]
+
+    async def scenario():
+        manager = ModelManager(registry, {}, {"kind": "thread", "workers": 1}, on_swap=lambda p, e: None)
+        await manager.activate(first)
+        old = manager.predictor
+        old.predict_batch(burst[:1])
+        await manager.activate(second)
+        # Still running on the old models when the swap happened
+        old.predict_batch(burst[1:2])
+        result = manager.predictor.predict_batch(burst[2:])
+        await manager.close()
+        return old, manager.predictor, result
+
+    old, new, result = asyncio.run(scenario())
+
+    reference = FraudPredictor(model_dir=registry.path(first))
+    reference.load_models()
+    assert result[0]["risk_score"] == reference.predict_batch(burst)[2]["risk_score"]
+    assert new.preprocessor.velocity is old.preprocessor.velocity
@@ -0,0 +1,251 @@
+import asyncio
+import csv
+import glob
+import io
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.api.endpoints import transactions
+from backend.app.api.endpoints.transactions import export_csv
+from backend.app.core.config import settings
+from backend.app.core.ids import id_time, new_transaction_id, new_transaction_ids
+from backend.app.db.base import Base
+from backend.app.db.explanations import explanation_columns
+from backend.app.db.partitions import add_months, ensure_partitions, partition_name
+from backend.app.models.transaction import Transaction
+from backend.app.services import retention
+from backend.app.services.retention import PENDING_SUFFIX, RetentionJob, iter_archive, iter_table_rows
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+def test_transaction_ids_are_unique_and_time_ordered():
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.extend(new_transaction_ids(500))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    single = [new_transaction_id() for _ in range(1000)]
+    # Many per millisecond, from several threads, and still no collision
+    assert len(set(ids + single)) == 3000
+    assert single == sorted(single) and all(len(i) == 30 and i.startswith("txn_") for i in single)
+    assert abs(id_time(single[0]) - datetime.now(timezone.utc)) < timedelta(seconds=5)
+
+
+def test_month_arithmetic_and_partition_names():
+    assert add_months(datetime(2025, 11, 1), 3) == datetime(2026, 2, 1)
+    assert add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+    assert partition_name(datetime(2026, 3, 1)) == "transactions_y2026m03"
+
+
+async def open_db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retention.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    # Rows spread over July to October, a few per day
+    async with session_factory() as db:
+        day = datetime(2026, 7, 1)
+        while day < NOW:
+            for minute in range(3):
+                moment = day + timedelta(minutes=minute)
+                db.add(Transaction(id=f"txn_{moment:%Y%m%d%H%M}", amount=1.0 + minute, type="PAYMENT",
+                                   risk_score=0.1, risk_level="LOW", is_flagged=False, timestamp=moment))
+            day += timedelta(days=1)
+        await db.commit()
+    return engine, session_factory
+
+
+async def all_rows(session_factory, archive_path):
+    archived = [row for batch in iter_archive(archive_path) for row in batch]
+    hot = [row async for batch in iter_table_rows(session_factory, chunk_size=50) for row in batch]
+    return archived, hot
+
+
+def test_old_months_move_to_parquet_and_stay_exportable(tmp_path):
+    archive_path = str(tmp_path / "archive")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        before = [row async for batch in iter_table_rows(session_factory, chunk_size=50) for row in batch]
+        job = RetentionJob(archive_path, hot_days=40, chunk_size=25, session_factory=session_factory, clock=lambda: NOW)
+        # SQLite has no partitions to maintain
+        async with session_factory() as db:
+            assert await ensure_partitions(await db.connection(), 3) == []
+        archived_rows = await job.run_once()
+        again = await job.run_once()
+        archived, hot = await all_rows(session_factory, archive_path)
+        async with session_factory() as db:
+            oldest = (await db.execute(select(func.min(Transaction.timestamp)))).scalar()
+        september = [row for batch in iter_archive(archive_path, datetime(2026, 8, 31, 0, 1), datetime(2026, 9, 2))
+                     for row in batch]
+        await engine.dispose()
+        return before, archived_rows, again, archived, hot, oldest, september, job.stats()
+
+    before, archived_rows, again, archived, hot, oldest, september, stats = asyncio.run(scenario())
+    # 40 days before Oct 18 is in September: July and August (31 days each) are archived
+    assert archived_rows == 62 * 3 and again == 0
+    assert sorted(os.listdir(os.path.join(archive_path, "transactions"))) == ["month=2026-07", "month=2026-08"]
+    assert oldest == datetime(2026, 9, 1)
+    # Nothing lost or duplicated, still in (timestamp, id) order
+    assert archived + hot == before
+    assert [row["id"] for row in september] == ["txn_202608310001", "txn_202608310002"]
+    assert stats["archived_months"] == 2 and stats["runs"] == 2
+
+
+def test_interrupted_archive_runs_are_settled(tmp_path):
+    archive_path = str(tmp_path / "archive")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        job = RetentionJob(archive_path, hot_days=40, session_factory=session_factory, clock=lambda: NOW)
+        await job.archive_month(datetime(2026, 7, 1))
+        july = glob.glob(os.path.join(archive_path, "transactions", "month=2026-07", "*.parquet"))[0]
+        # Stopped after the delete committed: the part is kept
+        os.replace(july, july + PENDING_SUFFIX)
+        # Stopped before the delete: August is still in the table, its part is dropped
+        august_dir = os.path.join(archive_path, "transactions", "month=2026-08")
+        os.makedirs(august_dir)
+        async with session_factory() as db:
+            first_august = (await db.execute(select(Transaction).order_by(Transaction.timestamp))).scalars().first()
+        await asyncio.to_thread(_write_pending, os.path.join(august_dir, "part-00000.parquet" + PENDING_SUFFIX), first_august.id)
+        await job.run_once()
+        archived, hot = await all_rows(session_factory, archive_path)
+        await engine.dispose()
+        return archived, hot
+
+    archived, hot = asyncio.run(scenario())
+    assert not glob.glob(os.path.join(archive_path, "**", "*" + PENDING_SUFFIX), recursive=True)
+    assert len(archived) == 62 * 3 and len({row["id"] for row in archived}) == 62 * 3
+    assert hot[0]["timestamp"] == datetime(2026, 9, 1)
+
+
+def test_rows_written_while_a_month_is_archived_are_kept(tmp_path, monkeypatch):
+    archive_path = str(tmp_path / "archive")
+    july = datetime(2026, 7, 1)
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+
+        async def read_then_write_late_row(*args, **kwargs):
+            async for chunk in iter_table_rows(*args, **kwargs):
+                yield chunk
+            # E.g. replayed from a write-behind spill file after the month was read
+            async with session_factory() as db:
+                db.add(Transaction(id="txn_late", amount=1.0, type="PAYMENT", risk_score=0.1, risk_level="LOW",
+                                   is_flagged=False, timestamp=datetime(2026, 7, 15, 12)))
+                await db.commit()
+
+        job = RetentionJob(archive_path, hot_days=40, chunk_size=25, session_factory=session_factory, clock=lambda: NOW)
+        monkeypatch.setattr(retention, "iter_table_rows", read_then_write_late_row)
+        first = await job.archive_month(july)
+        monkeypatch.setattr(retention, "iter_table_rows", iter_table_rows)
+        async with session_factory() as db:
+            kept = (await db.execute(select(Transaction.id).where(Transaction.timestamp < datetime(2026, 8, 1)))).scalars().all()
+        # The next run archives it
+        second = await job.archive_month(july)
+        archived, hot = await all_rows(session_factory, archive_path)
+        await engine.dispose()
+        return first, kept, second, archived, hot
+
+    first, kept, second, archived, hot = asyncio.run(scenario())
+    assert first == 31 * 3 and kept == ["txn_late"] and second == 1
+    assert len(glob.glob(os.path.join(archive_path, "transactions", "month=2026-07", "part-*.parquet"))) == 2
+    assert sorted(row["id"] for row in archived)[-1] == "txn_late" and len(archived) == 31 * 3 + 1
+    assert hot[0]["timestamp"] == datetime(2026, 8, 1)
+
+
+def test_export_streams_archived_and_live_rows_in_both_formats(tmp_path, monkeypatch):
+    archive_path = str(tmp_path / "archive")
+    monkeypatch.setattr(settings, "RETENTION_ARCHIVE_PATH", archive_path)
+    explanation = [{"feature": "amount", "impact": 1.5, "value": 2.0}]
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        monkeypatch.setattr(transactions, "SessionLocal", session_factory)
+        async with session_factory() as db:
+            # An archived and a live row with an explanation, and a live one not explained yet
+            values, = await explanation_columns(db, [explanation])
+            for row_id in ["txn_202608310001", "txn_202609010001"]:
+                row = await db.get(Transaction, row_id)
+                row.explanation, row.top_feature = values["explanation"], values["top_feature"]
+            (await db.get(Transaction, "txn_202609010002")).model_input = b"\x00" * 16
+            await db.commit()
+        await RetentionJob(archive_path, hot_days=40, session_factory=session_factory, clock=lambda: NOW).run_once()
+        archived, _ = await all_rows(session_factory, archive_path)
+        bodies = {}
+        for format in ["ndjson", "csv"]:
+            response = await transactions.export_transactions(start_time=datetime(2026, 8, 31), end_time=datetime(2026, 9, 2),
+                                                              format=format, current_user=None)
+            bodies[format] = "".join([chunk async for chunk in response.body_iterator])
+        await engine.dispose()
+        return archived, bodies
+
+    archived, bodies = asyncio.run(scenario())
+    # August 31 comes from the archive, September 1 from the database
+    assert archived[-1]["id"] == "txn_202608310002"
+    expected = [f"txn_2026083100{m:02d}" for m in range(3)] + [f"txn_2026090100{m:02d}" for m in range(3)]
+    exported = [json.loads(line) for line in bodies["ndjson"].splitlines()]
+    assert [row["id"] for row in exported] == expected
+    assert all("model_input" not in row for row in exported)
+    rows = list(csv.DictReader(io.StringIO(bodies["csv"])))
+    assert [row["id"] for row in rows] == expected and "model_input" not in rows[0]
+    assert [row["timestamp"] for row in rows] == [row["timestamp"] for row in exported]
+    for row in [1, 4]:
+        assert exported[row]["explanation"] == explanation and exported[row]["top_feature"] == "amount"
+        assert json.loads(rows[row]["explanation"]) == explanation and rows[row]["top_feature"] == "amount"
+    assert exported[0]["explanation"] is None and rows[0]["explanation"] == ""
+
+
+def test_unreadable_or_empty_pending_parts_are_discarded(tmp_path):
+    archive_path = str(tmp_path / "archive")
+
+    async def scenario():
+        engine, session_factory = await open_db(tmp_path)
+        job = RetentionJob(archive_path, hot_days=40, session_factory=session_factory, clock=lambda: NOW)
+        july_dir = os.path.join(archive_path, "transactions", "month=2026-07")
+        august_dir = os.path.join(archive_path, "transactions", "month=2026-08")
+        os.makedirs(july_dir)
+        os.makedirs(august_dir)
+        # Stopped while the part was being written: no footer
+        full = os.path.join(tmp_path, "full.parquet")
+        await asyncio.to_thread(_write_pending, full, "txn_202607010000")
+        with open(full, "rb") as source, open(os.path.join(july_dir, "part-00000.parquet" + PENDING_SUFFIX), "wb") as part:
+            part.write(source.read()[:-12])
+        await asyncio.to_thread(_write_pending, os.path.join(august_dir, "part-00000.parquet" + PENDING_SUFFIX), None)
+        archived_rows = await job.run_once()
+        archived, hot = await all_rows(session_factory, archive_path)
+        await engine.dispose()
+        return archived_rows, archived, hot
+
+    archived_rows, archived, hot = asyncio.run(scenario())
+    assert not glob.glob(os.path.join(archive_path, "**", "*" + PENDING_SUFFIX), recursive=True)
+    assert archived_rows == 62 * 3 and len({row["id"] for row in archived}) == 62 * 3
+    assert hot[0]["timestamp"] == datetime(2026, 9, 1)
+
+
+def _write_pending(path, first_id):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    # first_id None: a part without rows
+    pq.write_table(pa.table({"id": pa.array([first_id] if first_id else [], pa.string())}), path)
+
+
+def test_csv_export_streams_a_header_and_rows():
+    async def rows():
+        yield [{"id": "txn_1", "amount": 5.0, "timestamp": datetime(2026, 1, 1, 9, 30)}]
+        yield [{"id": "txn_2", "amount": 7.5, "timestamp": datetime(2026, 1, 2)}]
+
+    async def collect():
+        return "".join([chunk async for chunk in export_csv(rows())])
+
+    lines = asyncio.run(collect()).splitlines()
+    header = lines[0].split(",")
+    assert header[0] == "id" and "timestamp" in header and len(lines) == 3
+    assert lines[1].split(",")[header.index("timestamp")] == "2026-01-01T09:30:00"
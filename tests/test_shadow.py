@@ -0,0 +1,160 @@
+import asyncio
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.db.base import Base
+from backend.app.models.shadow import ShadowScore
+from backend.app.services.models import ModelManager
+from backend.app.services import shadow as shadow_module
+from backend.app.services.shadow import ShadowScorer
+from backend.ml_engine import trainer
+from backend.ml_engine.datasets import iter_file_chunks
+from backend.ml_engine.loader import ModelRegistry
+from backend.ml_engine.predictor import FraudPredictor
+
+V1_DIR = os.path.join(os.path.dirname(__file__), "..", "backend", "ml_engine", "saved_models", "v1")
+
+TRANSACTION = {
+    "amount": 10.0, "oldbalanceOrg": 100.0, "newbalanceOrig": 90.0,
+    "oldbalanceDest": 0.0, "newbalanceDest": 10.0, "type": "PAYMENT"
+}
+
+
+def loaded_predictor(**kwargs):
+    predictor = FraudPredictor(model_dir=V1_DIR, **kwargs)
+    predictor.load_models()
+    return predictor
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+def test_shadow_scores_and_disagreements_are_recorded(tmp_path, kind):
+    primary = loaded_predictor()
+    primary.add_shadow("v2", loaded_predictor(explanation_policy="deferred"))
+    expected = primary.predict_batch([TRANSACTION])[0]
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        scorer = ShadowScorer(lambda: primary, sample_rate=1.0, kind=kind, batch_interval_ms=10,
+                              session_factory=session_factory)
+        scorer.start()
+
+        # The second primary verdict is made up so the shadow disagrees with it
+        queued = scorer.submit(
+            ["txn_1", "txn_2"], [TRANSACTION, TRANSACTION],
+            [expected, {"risk_score": 1.0, "verdict": "DENY"}]
+        )
+        await scorer.stop()
+
+        async with session_factory() as session:
+            rows = (await session.execute(select(ShadowScore).order_by(ShadowScore.id))).scalars().all()
+        now = datetime.now()
+        summary = await scorer.summarize(now - timedelta(hours=1), now + timedelta(hours=1))
+        await engine.dispose()
+        return queued, rows, summary, scorer.stats()
+
+    queued, rows, summary, stats = asyncio.run(scenario())
+    assert queued == 2
+    assert [(row.transaction_id, row.model_version, row.disagrees) for row in rows] == [
+        ("txn_1", "v2", False), ("txn_2", "v2", expected["verdict"] != "DENY")
+    ]
+    assert rows[0].risk_score == expected["risk_score"]
+    assert rows[0].score_delta == 0.0
+    assert summary[0]["scored"] == 2
+    assert summary[0]["disagreements"] == stats["disagreements"] == 1
+    assert stats["shadow_versions"] == ["v2"]
+
+
+@pytest.fixture(scope="module")
+def velocity_model_dir(tmp_path_factory):
+    root = tmp_path_factory.mktemp("velocity_models")
+    history_csv = root / "history.csv"
+    trainer.generate_synthetic_data(6000, with_accounts=True).to_csv(history_csv, index=False)
+    version = trainer.train_models_streaming(
+        lambda: iter_file_chunks([str(history_csv)], chunk_size=1000), source="history.csv",
+        velocity=True, nthread=1, model_root=str(root)
+    )
+    return ModelRegistry(str(root)).path(version)
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+def test_velocity_shadow_sees_every_transaction_but_scores_only_the_sample(tmp_path, kind, velocity_model_dir, monkeypatch):
+    # One account firing transfers a minute apart, submitted one request at a time
+    start = datetime(2024, 1, 1, 12)
+    burst = [dict(TRANSACTION, type="TRANSFER", nameOrig="C_burst", transaction_time=start + timedelta(minutes=i))
+             for i in range(6)]
+    sampled = {"txn_3", "txn_5"}
+    primary = loaded_predictor()
+    velocity_shadow = FraudPredictor(model_dir=velocity_model_dir, explanation_policy="deferred")
+    velocity_shadow.load_models()
+    primary.add_shadow("v2", velocity_shadow)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        scorer = ShadowScorer(lambda: primary, sample_rate=0.5, kind=kind, batch_interval_ms=10,
+                              session_factory=session_factory)
+        scorer.start()
+        for i, data in enumerate(burst, start=1):
+            transaction_id = f"txn_{i}"
+            monkeypatch.setattr(shadow_module.random, "random", lambda: 0.0 if transaction_id in sampled else 1.0)
+            scorer.submit([transaction_id], [data], primary.predict_batch([data]))
+        await scorer.stop()
+        async with session_factory() as session:
+            rows = (await session.execute(select(ShadowScore).order_by(ShadowScore.id))).scalars().all()
+        await engine.dispose()
+        return rows
+
+    rows = asyncio.run(scenario())
+
+    # Same scores as a velocity model that saw the whole burst, not just the sampled rows
+    reference = FraudPredictor(model_dir=velocity_model_dir, explanation_policy="deferred")
+    reference.load_models()
+    expected = {f"txn_{i}": result["risk_score"] for i, result in enumerate(reference.predict_batch(burst), start=1)}
+    assert {row.transaction_id: row.risk_score for row in rows} == {txn: expected[txn] for txn in sampled}
+
+    sample_only = FraudPredictor(model_dir=velocity_model_dir, explanation_policy="deferred")
+    sample_only.load_models()
+    biased = sample_only.predict_batch([burst[2], burst[4]])
+    assert [result["risk_score"] for result in biased] != [expected["txn_3"], expected["txn_5"]]
+
+
+def test_nothing_is_queued_without_shadows_or_outside_the_sample():
+    primary = loaded_predictor()
+    scorer = ShadowScorer(lambda: primary, sample_rate=1.0)
+    assert scorer.submit(["txn_1"], [TRANSACTION], [{"risk_score": 0.0, "verdict": "ALLOW"}]) == 0
+
+    primary.add_shadow("v2", loaded_predictor(explanation_policy="deferred"))
+    scorer.sample_rate = 0.0
+    assert scorer.submit(["txn_1"], [TRANSACTION], [{"risk_score": 0.0, "verdict": "ALLOW"}]) == 0
+    scorer.pool.shutdown()
+
+
+def test_model_manager_attaches_shadow_versions(tmp_path):
+    for version in ("v1", "v2"):
+        shutil.copytree(V1_DIR, tmp_path / version)
+    registry = ModelRegistry(str(tmp_path))
+
+    async def scenario():
+        manager = ModelManager(
+            registry, {}, {"kind": "thread", "workers": 1}, on_swap=lambda p, e: None,
+            # The served version and unknown versions are skipped
+            shadow_versions=["v1", "v2", "v9"]
+        )
+        await manager.activate("v1")
+        await manager.close()
+        return manager
+
+    manager = asyncio.run(scenario())
+    assert list(manager.predictor.shadows) == ["v2"]
+    assert manager.predictor.shadows["v2"].explanation_policy == "deferred"
+    assert manager.status()["shadow_versions"] == ["v2"]
@@ -0,0 +1,47 @@
+import asyncio
+
+from backend.app.services.stream import LAGGED, TransactionHub
+
+
+def event(n):
+    return {"id": f"txn_{n}", "timestamp": "2024-01-01T12:00:00"}
+
+
+def test_every_subscriber_receives_published_events():
+    async def scenario():
+        hub = TransactionHub(subscriber_queue_size=10)
+        first, second = hub.subscribe(), hub.subscribe()
+        hub.publish([event(1), event(2)])
+        return [await sub.get() for sub in (first, first, second, second)], hub.stats()
+
+    received, stats = asyncio.run(scenario())
+    assert [e["id"] for e in received] == ["txn_1", "txn_2", "txn_1", "txn_2"]
+    assert stats["delivered"] == 4
+
+
+def test_slow_subscriber_is_cut_off_without_affecting_others():
+    async def scenario():
+        hub = TransactionHub(subscriber_queue_size=2)
+        slow, fast = hub.subscribe(), hub.subscribe()
+        hub.publish([event(1), event(2)])
+        drained = [await fast.get(), await fast.get()]
+        hub.publish([event(3)])
+        return await slow.get(), slow.queue.qsize(), drained, await fast.get(), hub
+
+    lagged, left_over, drained, latest, hub = asyncio.run(scenario())
+    assert lagged is LAGGED
+    assert left_over == 0
+    assert [e["id"] for e in drained + [latest]] == ["txn_1", "txn_2", "txn_3"]
+    assert hub.stats()["subscribers"] == 1
+    assert hub.stats()["lagged"] == 1
+
+
+def test_unsubscribed_clients_get_nothing():
+    async def scenario():
+        hub = TransactionHub()
+        sub = hub.subscribe()
+        hub.unsubscribe(sub)
+        hub.publish([event(1)])
+        return sub.queue.qsize()
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,62 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from backend.ml_engine.datasets import iter_file_chunks
+from backend.ml_engine.synthetic import COLUMNS, SyntheticConfig, generate_chunk, iter_chunks, write_dataset
+from benchmarks.load_test import payloads, run_load
+
+CONFIG = SyntheticConfig(n_accounts=2000, burst_rate=0.002)
+
+
+def test_chunks_are_reproducible_and_continue_in_time():
+    chunks = list(iter_chunks(25_000, chunk_size=10_000, seed=7, config=CONFIG))
+    assert [len(chunk) for chunk in chunks] == [10_000, 10_000, 5_000]
+    # Any chunk can be generated on its own (in another worker) and comes out the same
+    pd.testing.assert_frame_equal(chunks[1], generate_chunk(1, 10_000, 10_000, seed=7, config=CONFIG))
+    # The chunk size is part of the seeding: another split is another dataset
+    resplit = pd.concat(iter_chunks(25_000, chunk_size=5_000, seed=7, config=CONFIG), ignore_index=True)
+    assert not resplit["amount"].equals(pd.concat(chunks, ignore_index=True)["amount"])
+    df = pd.concat(chunks, ignore_index=True)
+    assert list(df.columns) == COLUMNS
+    assert df["transaction_time"].is_monotonic_increasing
+    assert (df["amount"] > 0).all()
+    assert (df[["oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest"]] >= 0).all().all()
+    assert 0.001 < df["isFraud"].mean() < 0.05
+    # Accounts come back (heavily skewed), and bursts are runs of TRANSFERs from one account
+    assert df["nameOrig"].nunique() < len(df) / 5
+    runs = df["nameOrig"].ne(df["nameOrig"].shift()).cumsum()
+    run_lengths = df.groupby(runs)["nameOrig"].transform("size")
+    bursts = df[(run_lengths >= 3) & (df["type"] == "TRANSFER")]
+    assert len(bursts) and bursts["isFraud"].any()
+
+
+def test_written_dataset_streams_back_for_training(tmp_path):
+    paths = write_dataset(str(tmp_path / "synthetic"), 12_000, chunk_size=5_000, fmt="csv", config=CONFIG)
+    assert len(paths) == 3
+    df = pd.concat(iter_file_chunks([str(tmp_path / "synthetic")], chunk_size=4_000), ignore_index=True)
+    expected = pd.concat(iter_chunks(12_000, chunk_size=5_000, config=CONFIG), ignore_index=True)
+    assert len(df) == 12_000
+    np.testing.assert_allclose(df["amount"], expected["amount"])
+    assert (df["nameOrig"] == expected["nameOrig"]).all()
+
+
+def test_load_test_reports_latency_and_errors():
+    async def handler(request):
+        await asyncio.sleep(0.005)
+        return httpx.Response(503 if b"TRANSFER" in request.content else 200, json={})
+
+    transactions = generate_chunk(0, 60, 60, config=CONFIG)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://api") as client:
+            return await run_load(client, payloads([transactions]), rps=200, n_requests=60)
+
+    result = asyncio.run(scenario())
+    transfers = int((transactions["type"] == "TRANSFER").sum())
+    assert result["requests"] == 60 and result["ok"] == 60 - transfers
+    assert result["errors"] == ({"503": transfers} if transfers else {})
+    assert 5 <= result["p50_ms"] <= result["p99_ms"]
+    assert result["elapsed_s"] >= 59 / 200
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.db.base import Base
+from backend.app.models.transaction import Transaction
+from backend.ml_engine import trainer
+from backend.ml_engine.datasets import iter_file_chunks, iter_table_chunks, prefetch
+from backend.ml_engine.features import TransactionPreprocessor
+from backend.ml_engine.loader import ModelRegistry
+from backend.ml_engine.predictor import FraudPredictor
+from backend.ml_engine.velocity import VELOCITY_WINDOWS
+
+
+@pytest.fixture(scope="module")
+def history_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp("history") / "history.csv"
+    trainer.generate_synthetic_data(6000, with_accounts=True).to_csv(path, index=False)
+    return str(path)
+
+
+def test_streaming_training_publishes_a_servable_version(history_csv, tmp_path):
+    version = trainer.train_models_streaming(
+        lambda: iter_file_chunks([history_csv], chunk_size=1000), source="history.csv",
+        velocity=True, nthread=1, model_root=str(tmp_path)
+    )
+    registry = ModelRegistry(str(tmp_path))
+    manifest = registry.manifest(version)
+    assert manifest["trainer"]["n_samples"] == 6000 and manifest["trainer"]["rows_per_second"] > 0
+    assert manifest["metrics"]["xgb_accuracy"] > 0.9
+
+    predictor = FraudPredictor(registry.path(version))
+    predictor.load_models()
+    assert predictor.bundle is not None and predictor.preprocessor.velocity is not None
+    # The incrementally fitted scaler matches a fit on all the (non held-out) training rows at once
+    df = pd.read_csv(history_csv, parse_dates=["transaction_time"])
+    X, _ = trainer._engineer(df, TransactionPreprocessor(velocity_windows=VELOCITY_WINDOWS))
+    train = X[~trainer._holdout_mask(0, len(X), 0.05)]
+    np.testing.assert_allclose(predictor.preprocessor.scaler.mean_, train[predictor.preprocessor.numerical_cols].mean())
+
+
+def test_velocity_columns_match_the_serving_features(history_csv):
+    df = pd.read_csv(history_csv, nrows=2000, parse_dates=["transaction_time"])
+    df.loc[3, "nameOrig"] = np.nan
+    streamed = TransactionPreprocessor(velocity_windows=VELOCITY_WINDOWS)
+    X, _ = trainer._engineer(df.copy(), streamed)
+    serving = TransactionPreprocessor(velocity_windows=VELOCITY_WINDOWS)
+    expected = serving.velocity_features(df[["amount", "transaction_time", "nameOrig"]].to_dict("records"))
+    np.testing.assert_array_equal(X[streamed.velocity.feature_names].to_numpy(), expected)
+
+
+def test_table_chunks_page_through_the_history_in_order(tmp_path):
+    database_url = f"sqlite+aiosqlite:///{tmp_path / 'history.db'}"
+    start = datetime(2024, 1, 1)
+
+    async def populate():
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            session.add_all([
+                Transaction(id=f"txn_{i}", amount=10.0 * i, type="TRANSFER", oldbalanceOrg=None,
+                            timestamp=start + timedelta(minutes=i // 2), is_flagged=i % 3 == 0)
+                for i in range(7)
+            ])
+            await session.commit()
+        await engine.dispose()
+
+    asyncio.run(populate())
+    chunks = list(iter_table_chunks(database_url, chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    df = pd.concat(chunks, ignore_index=True)
+    assert df["amount"].tolist() == [10.0 * i for i in range(7)]
+    assert df["isFraud"].tolist() == [int(i % 3 == 0) for i in range(7)]
+    assert df["oldbalanceOrg"].eq(0.0).all()
+
+
+def test_prefetch_reraises_source_errors():
+    def failing():
+        yield 1
+        raise ValueError("corrupt chunk")
+
+    chunks = prefetch(failing())
+    assert next(chunks) == 1
+    with pytest.raises(ValueError, match="corrupt chunk"):
+        next(chunks)
@@ -0,0 +1,86 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend.ml_engine.features import TransactionPreprocessor
+from backend.ml_engine.velocity import VelocityStore
+
+WINDOWS = {"1m": 60.0, "1h": 3600.0}
+
+
+def test_features_describe_history_before_each_transaction():
+    store = VelocityStore(WINDOWS)
+    features = store.features(["a", "a", "b", "a"], [0.0, 60.0, 60.0, 60.0], [10.0, 20.0, 5.0, 1.0])
+
+    # First sighting of a key has no history
+    assert features[0].tolist() == [0.0, 0.0, 0.0, 0.0]
+    # One transaction a minute ago, decayed with the window as time constant
+    np.testing.assert_allclose(features[1], [math.exp(-1), math.exp(-1 / 60), 10 * math.exp(-1), 10 * math.exp(-1 / 60)])
+    # Keys are independent
+    assert features[2].tolist() == [0.0, 0.0, 0.0, 0.0]
+    # Same instant: nothing decays between the second and third transaction of "a"
+    np.testing.assert_allclose(features[3, :2], features[1, :2] + 1)
+    np.testing.assert_allclose(features[3, 2:], features[1, 2:] + 20)
+
+
+def test_read_only_lookups_do_not_change_state():
+    store = VelocityStore(WINDOWS)
+    store.features(["a"], [0.0], [10.0])
+    peek = store.features(["a", "unknown"], [0.0, 0.0], [99.0, 99.0], observe=False)
+    assert peek[0].tolist() == [1.0, 1.0, 10.0, 10.0]
+    assert peek[1].tolist() == [0.0] * 4
+    assert len(store) == 1
+    assert store.features(["a"], [0.0], [0.0])[0].tolist() == [1.0, 1.0, 10.0, 10.0]
+
+
+def test_least_recently_seen_key_is_evicted():
+    store = VelocityStore(WINDOWS, max_keys=2)
+    store.features(["a", "b", "a", "c"], [0.0, 1.0, 2.0, 3.0], [1.0] * 4)
+    assert len(store) == 2
+    assert store.stats()["evictions"] == 1
+    # "b" was evicted, so it starts from scratch; "a" kept its history
+    after = store.features(["b", "a"], [4.0, 4.0], [1.0, 1.0], observe=False)
+    assert after[0].tolist() == [0.0] * 4
+    assert after[1, 0] > 1.0
+
+
+def test_snapshot_round_trip():
+    store = VelocityStore(WINDOWS)
+    store.features(["a", "b", "a"], [0.0, 1.0, 2.0], [1.0, 2.0, 3.0])
+    restored = VelocityStore(WINDOWS)
+    restored.load_bytes(store.to_bytes())
+    probe = (["a", "b"], [10.0, 10.0], [0.0, 0.0])
+    np.testing.assert_array_equal(
+        store.features(*probe, observe=False), restored.features(*probe, observe=False)
+    )
+    with pytest.raises(ValueError):
+        VelocityStore({"5m": 300.0}).load_bytes(store.to_bytes())
+
+
+def test_preprocessor_paths_agree_and_config_is_saved(tmp_path):
+    start = datetime(2024, 1, 1, 10, 0)
+    records = [
+        {"amount": 100.0 * (i + 1), "oldbalanceOrg": 1000.0, "newbalanceOrig": 900.0, "oldbalanceDest": 0.0,
+         "newbalanceDest": 100.0, "type": "TRANSFER", "transaction_time": start + timedelta(seconds=20 * i),
+         "nameOrig": "C1" if i % 2 == 0 else None}
+        for i in range(5)
+    ]
+    fast = TransactionPreprocessor(velocity_windows=WINDOWS)
+    slow = TransactionPreprocessor(velocity_windows=WINDOWS)
+    X_fast = fast.transform_batch_array(records)
+    X_slow = slow.transform_batch(records)
+
+    assert list(X_slow.columns) == fast.feature_columns
+    assert fast.feature_columns[-4:] == ["velocity_count_1m", "velocity_count_1h", "velocity_amount_1m", "velocity_amount_1h"]
+    np.testing.assert_allclose(X_fast, X_slow.to_numpy(dtype=np.float64), rtol=1e-6)
+    # Rows without an account get no velocity
+    assert X_fast[1, -4:].tolist() == [0.0] * 4
+
+    fast.scaler.fit(X_slow[fast.numerical_cols])
+    fast.save(str(tmp_path))
+    loaded = TransactionPreprocessor()
+    loaded.load(str(tmp_path))
+    assert loaded.feature_columns == fast.feature_columns
+    assert loaded.velocity_key == "nameOrig"